@@ -0,0 +1,174 @@
+"""Scan-log analytics: a year of scans through visitor_analytics.
+
+A synthetic source hands LogAnalytics a year of scans (PER_DAY a day,
+about 3M rows) as NumPy pages, generated on demand the way LogSource
+pages get_logs.php, so only the analytics are timed.  Reports the first
+run (every day computed and cached) in rows per second with the peak
+RSS, then a second run that loads the cached days and computes only
+today.  A per-scan Python loop over the first COMPARE_DAYS days checks
+the vectorized numbers and shows the difference in speed.  Last, a
+week is read end to end through the stub server's /get_logs.php.
+
+    python benchmarks/bench_analytics.py [days] [scans per day]
+"""
+
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import visitor_analytics as va
+from stub_server import StubServer, VisitorStore
+
+PER_DAY = 8000
+VISITORS = 200_000
+HOSTS = [f"Host {i}" for i in range(40)]
+PURPOSES = ["Meeting", "Interview", "Delivery", "Maintenance", "Tour", "Audit"]
+COMPARE_DAYS = 14
+
+
+class SyntheticSource:
+    """``range`` and ``day_chunks`` like LogSource, over generated scans."""
+
+    def __init__(self, first, last, per_day, page_size=va.LOGS_PAGE):
+        self.first, self.last = first, last
+        self.per_day = per_day
+        self.page_size = page_size
+        self.rows = 0
+        rng = np.random.default_rng(1)
+        self.hosts = np.array(HOSTS, dtype=object)[rng.integers(0, len(HOSTS), VISITORS)]
+        self.purposes = np.array(PURPOSES, dtype=object)[rng.integers(0, len(PURPOSES), VISITORS)]
+
+    def range(self):
+        return self.first, self.last
+
+    def scans(self, day):
+        """The day's scans in time order: (visitor_id, kind, t)."""
+        rng = np.random.default_rng(day.toordinal())
+        visits = self.per_day // 2
+        vid = rng.integers(1, VISITORS, visits)
+        entered = rng.normal(11 * 3600, 2.5 * 3600, visits).clip(0, va.DAY_SECONDS - 1).astype(np.int64)
+        fate = rng.random(visits)
+        stay = rng.exponential(90 * 60, visits).astype(np.int64)
+        other = np.where(rng.random(visits) < 0.5, 2, 3)  # Expired or Invalid
+        second = np.where(fate < 0.85, va.EXITED, other)
+        second_t = np.where(fate < 0.85, entered + stay, entered + 300)
+        keep = second_t < va.DAY_SECONDS  # stays past midnight exit tomorrow (or never)
+        vid = np.r_[vid, vid[keep]]
+        kind = np.r_[np.full(visits, va.VALID), second[keep]].astype(np.int8)
+        t = np.r_[entered, second_t[keep]]
+        unknown = rng.random(len(vid)) < 0.01
+        vid[unknown] = -1
+        order = np.argsort(t, kind="stable")
+        return vid[order], kind[order], t[order]
+
+    def day_chunks(self, day):
+        vid, kind, t = self.scans(day)
+        self.rows += len(vid)
+        for start in range(0, len(vid), self.page_size):
+            page = slice(start, start + self.page_size)
+            known = np.maximum(vid[page], 0)
+            yield {'visitor_id': vid[page], 'kind': kind[page], 't': t[page],
+                   'host': np.where(vid[page] >= 0, self.hosts[known], None),
+                   'purpose': np.where(vid[page] >= 0, self.purposes[known], None)}
+
+
+def python_days(source, days):
+    """Per-scan loop: (occupancy at the end of every bin, exits, dwell minutes) over ``days``."""
+    since = {}
+    occupancy, exits, minutes = [], 0, 0.0
+    for day in days:
+        base = va.day_start(day)
+        since = {v: s for v, s in since.items() if s >= base - va.STALE_STAY_HOURS * 3600}
+        inside = start = len(since)
+        bins = [None] * va.BINS_PER_DAY
+        vids, kinds, times = source.scans(day)
+        for v, k, t in zip(vids.tolist(), kinds.tolist(), times.tolist()):
+            if v >= 0 and k == va.VALID and v not in since:
+                since[v] = base + t
+                inside += 1
+            elif v >= 0 and k == va.EXITED and v in since:
+                minutes += (base + t - since.pop(v)) / 60
+                exits += 1
+                inside -= 1
+            bins[min(t // (va.BIN_MINUTES * 60), va.BINS_PER_DAY - 1)] = inside
+        level = start
+        for i, value in enumerate(bins):
+            level = value if value is not None else level
+            bins[i] = level
+        occupancy += bins
+    return occupancy, exits, minutes
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 365
+    per_day = int(sys.argv[2]) if len(sys.argv) > 2 else PER_DAY
+    today = date.today()
+    first = today - timedelta(days=days - 1)
+    cache_dir = tempfile.mkdtemp(prefix="qrgate-analytics-")
+    try:
+        print(f"{days} days x ~{per_day} scans, {VISITORS} visitors, pages of {va.LOGS_PAGE}")
+        source = SyntheticSource(first, today, per_day)
+        rss = peak_rss_mb()
+        started = time.perf_counter()
+        analytics = va.LogAnalytics(source, cache_dir=cache_dir, source_name="bench")
+        analytics.update(today)
+        elapsed = time.perf_counter() - started
+        print(f"  first run:  {elapsed:6.2f} s for {source.rows} scans ({source.rows / elapsed / 1e6:.2f}M rows/s), "
+              f"{analytics.computed} days computed; peak RSS {peak_rss_mb():.0f} MB (was {rss:.0f} MB)")
+
+        rows = source.rows
+        started = time.perf_counter()
+        cached = va.LogAnalytics(source, cache_dir=cache_dir, source_name="bench")
+        cached.update(today)
+        elapsed = time.perf_counter() - started
+        print(f"  cached run: {elapsed:6.2f} s, {cached.computed} days computed ({source.rows - rows} scans read)")
+
+        started = time.perf_counter()
+        cached.occupancy(first, today)
+        cached.heatmap(first, today)
+        cached.dwell("host", first, today)
+        print(f"  queries over the whole range: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        compare = [first + timedelta(days=i) for i in range(min(COMPARE_DAYS, days))]
+        started = time.perf_counter()
+        occupancy, exits, minutes = python_days(source, compare)
+        python_s = time.perf_counter() - started
+        fresh = va.LogAnalytics(SyntheticSource(compare[0], compare[-1], per_day), cache_dir=None)
+        started = time.perf_counter()
+        fresh.update(compare[-1])
+        numpy_s = time.perf_counter() - started
+        stats = fresh.span(compare[0], compare[-1])
+        same_occupancy = occupancy == np.concatenate([s.occupancy for s in stats]).tolist()
+        _, counts, mean = fresh.dwell("host", compare[0], compare[-1])
+        same_dwell = int(counts.sum()) == exits and abs(float((mean * counts.sum(axis=1)).sum()) - minutes) < 1e-3 * minutes
+        print(f"  {len(compare)} days, per-scan Python loop {python_s * 1000:.0f} ms vs NumPy {numpy_s * 1000:.0f} ms "
+              f"({python_s / numpy_s:.1f}x); occupancy {'matches' if same_occupancy else 'DIFFERS'}, "
+              f"dwell {'matches' if same_dwell else 'DIFFERS'}")
+
+        store = VisitorStore()
+        store.seed(3000)
+        scans = store.seed_logs(7, 2000)
+        with StubServer(visitors=store) as server:
+            started = time.perf_counter()
+            remote = va.LogAnalytics(va.LogSource(server.base_url + "/get_logs.php"), cache_dir=None)
+            remote.update()
+            elapsed = time.perf_counter() - started
+        print(f"  get_logs.php end to end: {scans} scans over {len(remote.days)} days in {elapsed * 1000:.0f} ms")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Finding changes the delta feed missed: full reload vs. range digests.
+
+Some visitors are changed "quietly" on the stub (no updated_at bump, no
+tombstone), so delta sync cannot see them.  Before range digests the
+only way to notice was to fetch every row again and compare; the old
+calculate_data_hash (MD5 of (visitor_id, last_scan) pairs) would not
+even have noticed most of them, as it ignored every other column.
+VisitorEngine.verify compares digests root first and re-reads only the
+leaves that differ.  Reports time, bytes and requests for a clean check
+and for a few drifted rows, and checks the replica matches afterwards.
+
+    python benchmarks/bench_digest.py [visitors] [drifted rows]
+"""
+
+import hashlib
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubServer, VisitorStore
+from visitor_engine import VisitorEngine
+
+
+def old_hash(records):
+    """The dashboard's old change check, for comparison."""
+    return hashlib.md5(str([(r.get('visitor_id'), r.get('last_scan')) for r in records]).encode()).hexdigest()
+
+
+def full_reload(url):
+    engine = VisitorEngine(url, log=lambda message: None)
+    started = time.perf_counter()
+    engine.load_all()
+    return engine, (time.perf_counter() - started) * 1000, engine.metrics.counters
+
+
+def timed_verify(engine):
+    before = dict(engine.metrics.counters)
+    started = time.perf_counter()
+    diff = engine.verify()
+    elapsed = (time.perf_counter() - started) * 1000
+    counters = engine.metrics.counters
+    return diff, elapsed, {key: counters.get(key, 0) - before.get(key, 0) for key in counters}
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    drifted = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    store = VisitorStore()
+    store.seed(count)
+    rng = random.Random(2)
+
+    with StubServer(visitors=store) as server:
+        url = server.base_url + "/get_visitors.php"
+        engine, load_ms, _ = full_reload(url)
+        print(f"{count} visitors held; {drifted} changed without updated_at, 1 deleted without a tombstone")
+
+        diff, ms, counters = timed_verify(engine)
+        print(f"  clean check:  {ms:7.1f} ms, {counters.get('digest_requests', 0)} request, "
+              f"{counters.get('digest_bytes', 0)} B; differs: {bool(diff)}")
+
+        ids = rng.sample(range(1, count + 1), drifted + 1)
+        old_before = old_hash([engine.rows.by_id[str(vid)] for vid in ids[:drifted]])
+        store.touch(ids[:drifted], quiet=True, host="Moved", expiry_at="2030-01-01 00:00:00")
+        store.delete(ids[drifted:], quiet=True)
+        engine.refresh()
+        missed = sum(engine.rows.by_id[str(vid)].get('host') != "Moved" for vid in ids[:drifted])
+        print(f"  delta poll afterwards: {missed} of {drifted} changes missed")
+
+        reloaded, reload_ms, reload_counters = full_reload(url)
+        old_after = old_hash([reloaded.rows.by_id[str(vid)] for vid in ids[:drifted]])
+        print(f"  full reload:  {reload_ms:7.1f} ms, {reload_counters['feed_requests']} requests, "
+              f"{reload_counters['feed_bytes'] / 1024:7.0f} KB; the old hash of the edited rows "
+              f"{'changed' if old_after != old_before else 'did not change'}")
+
+        diff, ms, counters = timed_verify(engine)
+        print(f"  digest check: {ms:7.1f} ms, {counters.get('digest_requests', 0)} digest + "
+              f"{counters.get('feed_requests', 0)} row requests, "
+              f"{(counters.get('digest_bytes', 0) + counters.get('feed_bytes', 0)) / 1024:5.1f} KB, "
+              f"{counters.get('verify_leaves_differing', 0)} leaves re-read; "
+              f"{len(diff.changed)} changed, {len(diff.removed)} removed")
+        same = {vid: r.fields for vid, r in engine.rows.by_id.items()} == \
+               {vid: r.fields for vid, r in reloaded.rows.by_id.items()}
+        print(f"  replica {'matches' if same else 'DIFFERS FROM'} the full reload; "
+              f"next check differs: {bool(engine.verify())}")
+
+        started = time.perf_counter()
+        for record in engine.rows.rows()[:10_000]:
+            engine.digests.put(int(record.visitor_id), record.digest ^ 1)
+        print(f"  keeping the digests: {(time.perf_counter() - started) * 100:.2f} us per changed row")
+
+
+if __name__ == "__main__":
+    main()
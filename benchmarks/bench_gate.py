@@ -0,0 +1,144 @@
+"""Gate scan throughput: check.php per scan vs. gate_aggregator.py.
+
+Simulated scanners (one keep-alive session each, all scanning as fast as
+they get answers) send check.php requests first straight to the stub
+server, then to a GateAggregator in front of it.  The stub adds
+WAN_LATENCY to every scan request (the gate-to-server network the
+aggregator takes out of the scan path), and charges ``round_trip`` per
+SQL statement and ``connect_cost`` per check.php request, standing in
+for MySQL on another machine; check.php makes three
+statements on a new connection per scan, check_batch.php makes one or
+two per scan plus BEGIN/COMMIT per batch.
+
+Reports scans per second, decision latency (request sent to answer
+received) and the database work, and checks that every scan the
+aggregator answered ended up in ``logs``.  The scanners run in separate
+processes, but on a machine with few cores they still compete with the
+aggregator for CPU, so raise the scanner count with care.
+
+    python benchmarks/bench_gate.py [scanners] [seconds] [visitors]
+"""
+
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gate_aggregator import GateAggregator, serve
+from stub_server import StubHandler, StubServer, VisitorStore
+
+WAN_LATENCY = 0.040  # gate to hosted server and back
+ROUND_TRIP = 0.0005  # 0.5 ms per statement, MySQL on the LAN
+CONNECT_COST = 0.003  # TCP connect and login for a non-persistent mysqli
+UNKNOWN_SHARE = 0.02  # scans of codes that are not registered
+
+
+def run_scanners(url, codes, threads, deadline, seed):
+    """One process's scanner threads; (latencies in ms, statuses) once ``deadline`` (time.time) passes."""
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def scanner(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        mine = []
+        seen = {}
+        while time.time() < deadline:
+            qr = rng.choice(codes) if rng.random() > UNKNOWN_SHARE else f"unknown-{rng.getrandbits(32):x}"
+            started = time.perf_counter()
+            status = session.get(url, params={"qr": qr}, timeout=30).json()["status"]
+            mine.append((time.perf_counter() - started) * 1000)
+            seen[status] = seen.get(status, 0) + 1
+        with lock:
+            latencies.extend(mine)
+            for status, n in seen.items():
+                statuses[status] = statuses.get(status, 0) + n
+
+    pool = [threading.Thread(target=scanner, args=(seed * 1000 + i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return latencies, statuses
+
+
+def scan_load(url, codes, scanners, seconds):
+    """Run ``scanners`` scanners against ``url`` for ``seconds``, spread over processes
+    so the load generator is not what limits the server under test."""
+    processes = min(scanners, os.cpu_count() or 1)
+    deadline = time.time() + seconds + 1  # +1: process start-up
+    latencies = []
+    statuses = {}
+    with ProcessPoolExecutor(processes) as pool:
+        jobs = [pool.submit(run_scanners, url, codes, scanners // processes + (i < scanners % processes), deadline, i)
+                for i in range(processes)]
+        for job in jobs:
+            mine, seen = job.result()
+            latencies.extend(mine)
+            for status, n in seen.items():
+                statuses[status] = statuses.get(status, 0) + n
+    return sorted(latencies), statuses
+
+
+def report(label, latencies, statuses, seconds, store, statements, transactions):
+    scans = len(latencies)
+    print(f"  {label}: {scans / seconds:7.0f} scans/s, p50 {statistics.median(latencies):5.1f} ms, "
+          f"p99 {latencies[int(scans * 0.99) - 1]:5.1f} ms; "
+          f"{(store.statements - statements) / scans:.2f} statements/scan, "
+          f"{store.transactions - transactions} DB requests")
+    print(f"      {', '.join(f'{status} {n}' for status, n in sorted(statuses.items()))}")
+
+
+def main():
+    scanners = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 20_000
+    store = VisitorStore()
+    store.seed(count)
+    # Today's visitors: valid passes, not scanned yet
+    expiry = (datetime.now() + timedelta(hours=8)).strftime("%Y-%m-%d %H:%M:%S")
+    today = range(count - 1999, count + 1)
+    store.touch(today, expiry_at=expiry, last_status=None, last_scan=None, entry_scan=None, exit_time=None)
+    with store.lock:
+        codes = [row[0] for row in store.db.execute(
+            "SELECT qr_code FROM visitors WHERE visitor_id > ?", (count - 2000,))]
+    store.round_trip, store.connect_cost = ROUND_TRIP, CONNECT_COST
+
+    handler = type("RemoteStubHandler", (StubHandler,), {"scan_latency": WAN_LATENCY})
+
+    with StubServer(handler, visitors=store) as server:
+        print(f"{scanners} scanners for {seconds:.0f} s each, {count} visitors; {WAN_LATENCY * 1000:.0f} ms to the "
+              f"server, {ROUND_TRIP * 1000:.1f} ms per statement, {CONNECT_COST * 1000:.0f} ms per connection")
+
+        statements, transactions = store.statements, store.transactions
+        latencies, statuses = scan_load(server.base_url + "/check.php", codes, scanners, seconds)
+        report("check.php  ", latencies, statuses, seconds, store, statements, transactions)
+
+        aggregator = GateAggregator(server.base_url + "/get_visitors.php", gate="bench",
+                                    log=lambda message: None).start()
+        gate = serve(aggregator, "127.0.0.1", 0)
+        threading.Thread(target=gate.serve_forever, daemon=True).start()
+        host, port = gate.server_address[:2]
+        logs_before = store.log_count()
+        statements, transactions = store.statements, store.transactions
+        latencies, statuses = scan_load(f"http://{host}:{port}/check.php", codes, scanners, seconds)
+        while aggregator.pending:
+            aggregator.flush()
+        report("aggregator ", latencies, statuses, seconds, store, statements, transactions)
+        logged = store.log_count() - logs_before
+        print(f"      {logged} logs rows written in {aggregator.batches} batches "
+              f"({'all' if logged == len(latencies) else 'MISSING ' + str(len(latencies) - logged)} scans)")
+        gate.shutdown()
+
+
+if __name__ == "__main__":
+    main()
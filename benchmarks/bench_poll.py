@@ -0,0 +1,78 @@
+"""Per-poll bytes and latency: one-off requests.get vs. VisitorFeed.
+
+"Before" is how the dashboard used to poll: a fresh requests.get (new TCP
+connection) and a full JSON body every time.  "After" is VisitorFeed: one
+keep-alive Session and conditional requests, so an unchanged answer is a
+bodyless 304.  Both ask the stub server the same queries while nothing
+changes between polls, the common case for a 15 s poll.
+
+    python benchmarks/bench_poll.py [polls] [visitors]
+"""
+
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubServer, VisitorStore
+from visitor_engine import FEED_FIELDS, PAGE_SIZE, VisitorFeed
+
+
+def response_bytes(response):
+    return len(response.content) + sum(len(k) + len(v) + 4 for k, v in response.headers.items())
+
+
+def old_poll(url, params):
+    response = requests.get(url, params=params, timeout=15, verify=False)
+    response.json()
+    return response_bytes(response)
+
+
+def measure(poll, polls):
+    poll()  # first request primes the ETag / connection
+    total_bytes = 0
+    started = time.perf_counter()
+    for _ in range(polls):
+        total_bytes += poll()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return elapsed_ms / polls, total_bytes / polls
+
+
+def main():
+    polls = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    store = VisitorStore()
+    store.seed(count)
+
+    with StubServer(visitors=store) as server:
+        url = server.base_url + "/get_visitors.php"
+        feed = VisitorFeed(url, log=lambda message: None)
+        feed.snapshot()  # hands out the delta cursor
+        cursor = feed.sync_cursor
+
+        queries = [
+            ("newest page (full listing)", {'limit': PAGE_SIZE, 'fields': FEED_FIELDS}),
+            ("delta since cursor", {'since': cursor['updated_at'], 'since_id': cursor['visitor_id'],
+                                    'limit': 1000, 'fields': FEED_FIELDS}),
+        ]
+        print(f"{count} visitors, {polls} polls each, nothing changing between polls")
+        print(f"  {'query':28} {'before':>22} {'after':>22}")
+        for name, params in queries:
+            before_ms, before_bytes = measure(lambda: old_poll(url, params), polls)
+
+            def new_poll():
+                feed.fetch(params, conditional=True)
+                return feed.last_response_bytes
+
+            after_ms, after_bytes = measure(new_poll, polls)
+            print(f"  {name:28} {before_ms:7.2f} ms {before_bytes:9.0f} B {after_ms:7.2f} ms {after_bytes:9.0f} B")
+
+        ms, _ = measure(lambda: feed.snapshot().fetch_bytes, polls)
+        print(f"  VisitorFeed.snapshot() idle poll, end to end: {ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
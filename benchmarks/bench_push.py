@@ -0,0 +1,98 @@
+"""Scan-to-screen latency: 15 s polling vs. the events.php push stream.
+
+A "scan" is a ``VisitorStore.touch`` on the stub server.  With polling, a
+scan waits on average half the poll interval before it is even fetched;
+with VisitorStream the changed row arrives as soon as the server sees it.
+This measures the push path end to end (touch -> delta FetchSnapshot
+handed to the callback) and the bytes an idle stream costs per minute.
+
+    python benchmarks/bench_push.py [scans] [visitors]
+"""
+
+import os
+import queue
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubHandler, StubServer, VisitorStore
+from visitor_engine import VisitorEngine, VisitorStream, events_url
+
+POLL_INTERVAL = 15  # the dashboard's UPDATE_INTERVAL
+
+
+class CountingStream(VisitorStream):
+    """VisitorStream that counts the body bytes it reads."""
+
+    bytes_read = 0
+
+    def listen(self):
+        get = self.session.get
+
+        def counting_get(*args, **kwargs):
+            response = get(*args, **kwargs)
+            iter_content = response.iter_content
+
+            def counted(*a, **kw):
+                for chunk in iter_content(*a, **kw):
+                    self.bytes_read += len(chunk)
+                    yield chunk
+
+            response.iter_content = counted
+            return response
+
+        self.session.get = counting_get
+        try:
+            super().listen()
+        finally:
+            self.session.get = get
+
+
+def main():
+    scans = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    store = VisitorStore()
+    store.seed(count)
+    handler = type("FastPingHandler", (StubHandler,), {"ping_seconds": 1})
+
+    with StubServer(handler, visitors=store) as server:
+        url = server.base_url + "/get_visitors.php"
+        engine = VisitorEngine(url, log=lambda message: None)
+        engine.load_all()
+        pushed = queue.Queue()
+        stream = CountingStream(events_url(url), on_snapshot=pushed.put, on_resync=lambda: None,
+                                log=lambda message: None).start()
+        while not stream.connected:
+            time.sleep(0.01)
+
+        latencies = []
+        for i in range(scans):
+            vid = 1 + i % count
+            started = time.perf_counter()
+            store.touch([vid], last_status="Inside")
+            while True:
+                snapshot = pushed.get(timeout=5)
+                if any(v.visitor_id == str(vid) for v in snapshot.visitors):
+                    break
+            engine.apply(snapshot)
+            latencies.append((time.perf_counter() - started) * 1000)
+            assert engine.rows.by_id[str(vid)].get('last_status') == "Inside"
+
+        latencies.sort()
+        print(f"{count} visitors, {scans} scans, one at a time")
+        print(f"  poll every {POLL_INTERVAL} s: ~{POLL_INTERVAL * 500:.0f} ms mean, "
+              f"{POLL_INTERVAL * 1000:.0f} ms worst before the fetch even starts")
+        print(f"  push:  {statistics.mean(latencies):.1f} ms mean, "
+              f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f} ms, worst {latencies[-1]:.1f} ms "
+              f"(scan to replica updated)")
+
+        idle_from = stream.bytes_read
+        time.sleep(5)
+        print(f"  idle stream (1 s pings here, 15 s in events.php): "
+              f"{(stream.bytes_read - idle_from) / 5:.0f} B/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Thumbnails per second: local qr_encoder vs. the remote qrserver.com path.
+
+The remote path is exercised exactly as the dashboard runs it
+(requests.get + PIL decode + LANCZOS resize) but against the local stub
+server, so the numbers measure our own overhead rather than the internet.
+
+    python benchmarks/bench_qr.py [count]
+"""
+
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dashboard
+from stub_server import StubServer
+
+
+def rate(fn, codes):
+    started = time.perf_counter()
+    for code in codes:
+        fn(code)
+    elapsed = time.perf_counter() - started
+    return len(codes) / elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    codes = [uuid.uuid4().hex[:16] for _ in range(count)]
+
+    with StubServer() as server:
+        dashboard.QR_API_URL = server.base_url + "/v1/create-qr-code/?size=80x80&data={}"
+        remote = rate(dashboard.fetch_remote_thumbnail, codes)
+    local = rate(dashboard.render_local_thumbnail, codes)
+
+    print(f"{count} thumbnails ({dashboard.QR_SIZE}x{dashboard.QR_SIZE})")
+    print(f"  remote (stub server): {remote:8.1f} /s")
+    print(f"  local qr_encoder:     {local:8.1f} /s  ({local / remote:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
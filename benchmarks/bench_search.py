@@ -0,0 +1,84 @@
+"""Search cost per keystroke: linear scan vs. SearchIndex.
+
+Types a few queries one character at a time over a synthetic visitor list
+and reports the slowest keystroke for the old scan (an f-string haystack
+built per visitor per keystroke) and for SearchIndex.  A frame is ~16 ms.
+
+    python benchmarks/bench_search.py [rows]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from visitor_engine import RowDiff
+from visitor_record import VisitorRecord
+from visitor_search import SearchIndex
+
+FIRST = ["john", "maria", "jose", "ana", "mark", "liza", "paolo", "grace", "ramon", "ella", "kevin", "joy"]
+LAST = ["santos", "reyes", "cruz", "bautista", "garcia", "mendoza", "torres", "ramos", "flores", "villanueva"]
+PURPOSES = ["Meeting", "Delivery", "Interview", "Maintenance", "Thesis defense", "Enrollment"]
+HOSTS = ["Dr. Lim", "Ms. Tan", "HR Department", "Registrar", "Engr. Dela Cruz", "IT Office"]
+QUERIES = ["maria santos", "registrar", "cruz12", "@example"]
+
+
+def make_records(count):
+    rng = random.Random(count)
+    records = {}
+    for i in range(count):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        record = VisitorRecord({
+            'visitor_id': str(i),
+            'full_name': f"{first.title()} {last.title()}",
+            'email': f"{first}.{last}{i}@example.com",
+            'purpose': rng.choice(PURPOSES),
+            'host': rng.choice(HOSTS),
+        })
+        records[record.visitor_id] = record
+    return records
+
+
+def linear(records, query):
+    return [v for v in records.values()
+            if query in f"{v.get('full_name', '')} {v.get('email', '')} {v.get('purpose', '')} {v.get('host', '')}".lower()]
+
+
+def worst_keystroke_ms(search, query):
+    worst = 0.0
+    for n in range(1, len(query) + 1):
+        started = time.perf_counter()
+        search(query[:n])
+        worst = max(worst, (time.perf_counter() - started) * 1000)
+    return worst
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    records = make_records(count)
+
+    index = SearchIndex()
+    started = time.perf_counter()
+    index.apply(RowDiff(set(records), set(), set(), False), records)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    changed = set(list(records)[:50])
+    started = time.perf_counter()
+    index.apply(RowDiff(set(), set(), changed, False), records)
+    patch_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{count} visitors: index build {build_ms:.0f} ms, patch 50 changed rows {patch_ms:.2f} ms")
+    rows = list(records.values())
+    print(f"  {'query':16} {'linear':>10} {'indexed':>10}   (slowest keystroke)")
+    for query in QUERIES:
+        index.last = None
+        old = worst_keystroke_ms(lambda q: linear(records, q), query)
+        new = worst_keystroke_ms(lambda q: index.search(q, rows), query)
+        assert index.search(query, rows) == linear(records, query)
+        print(f"  {query!r:16} {old:8.1f} ms {new:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
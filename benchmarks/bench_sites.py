@@ -0,0 +1,108 @@
+"""Several sites: polling them one after another vs. side by side on a SitePool.
+
+Stub servers stand in for buildings whose get_visitors.php answers after
+different delays (LATENCIES), plus one that hangs far past its site's
+timeout.  Before, covering them took one dashboard per site or a loop
+over the sites, so a round of polls took the sum of the delays and the
+hung site held up every site after it.  SitePool gives each site its own
+job: each site's snapshot arrives after that site's own delay, and the
+hung one fails on its own timeout while the others are already applied.
+Last, the cost of merging the sites' rows into one view on the Tk thread.
+
+    python benchmarks/bench_sites.py [visitors per site] [rounds]
+"""
+
+import os
+import sys
+import time
+from contextlib import ExitStack
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubHandler, StubServer, VisitorStore
+from visitor_sites import Site, SitePool, Source, merge_rows
+
+LATENCIES = [0.05, 0.15, 0.3]  # seconds per get_visitors.php answer, one site each
+HUNG_LATENCY = 3.0
+HUNG_TIMEOUT = 1.0
+
+
+def start_site(stack, name, visitors, latency, timeout=15):
+    store = VisitorStore()
+    store.seed(visitors)
+    handler = type(f"{name}Handler", (StubHandler,), {"feed_latency": latency})
+    server = stack.enter_context(StubServer(handler, visitors=store))
+    site = Site(Source(name, server.base_url + "/get_visitors.php", timeout), log=lambda message: None)
+    return site, store
+
+
+def poll_round(pool, sites, concurrent):
+    """Poll every site once; returns {site name: (ms until its snapshot was in, error)}."""
+    started = time.perf_counter()
+    arrived = {}
+
+    def poll(site):
+        snapshot = site.engine.feed.snapshot()
+        site.scheduler.record(snapshot)
+        if not snapshot.error:
+            site.engine.apply(snapshot)
+        arrived[site.name] = ((time.perf_counter() - started) * 1000, snapshot.error)
+
+    if concurrent:
+        futures = [pool.submit(site, poll) for site in sites]
+        for future in futures:
+            future.result()
+    else:
+        for site in sites:
+            poll(site)
+    return arrived
+
+
+def report(label, arrived, healthy):
+    slowest = max(arrived[name][0] for name in healthy)
+    total = max(ms for ms, _ in arrived.values())
+    print(f"    {label}: healthy sites in {slowest:5.0f} ms, round over after {total:5.0f} ms;  "
+          +"  ".join(f"{name} {ms:.0f}{' (failed)' if error else ''}" for name, (ms, error) in arrived.items()))
+
+
+def main():
+    visitors = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    with ExitStack() as stack:
+        started = [start_site(stack, f"S{i + 1}", visitors, latency) for i, latency in enumerate(LATENCIES)]
+        sites = [site for site, _ in started]
+        hung, _ = start_site(stack, "Hung", 10, HUNG_LATENCY, timeout=HUNG_TIMEOUT)
+        healthy = [site.name for site in sites]
+        print(f"{len(sites)} sites x {visitors} visitors, get_visitors.php delays "
+              f"{', '.join(f'{latency * 1000:.0f} ms' for latency in LATENCIES)}; "
+              f"plus one hanging {HUNG_LATENCY:.0f} s with a {HUNG_TIMEOUT:.0f} s timeout")
+
+        pool = SitePool([hung] + sites)
+        for concurrent in (False, True):
+            print("  side by side (SitePool):" if concurrent else "  one by one (before):")
+            for site in sites:
+                site.engine.feed.sync_cursor = None
+            report("first page", poll_round(pool, sites, concurrent), healthy)
+            for i in range(rounds):
+                for site, store in started:
+                    store.touch([i + 1], last_status="Inside")
+                report("delta poll", poll_round(pool, [hung] + sites, concurrent), healthy)
+        print(f"  hung site: {hung.health} after {hung.scheduler.failures} failures "
+              f"(next try in {hung.scheduler.next_delay():.0f} s)")
+
+        rows = [site.engine.rows.rows() for site in sites]
+        started_at = time.perf_counter()
+        for _ in range(10):
+            merged = merge_rows(rows)
+        merge_ms = (time.perf_counter() - started_at) * 100
+        started_at = time.perf_counter()
+        for _ in range(10):
+            merge_rows([site.engine.search.search("host", site.engine.rows.rows()) for site in sites])
+        search_ms = (time.perf_counter() - started_at) * 100
+        print(f"  merged view of {len(merged)} rows: {merge_ms:.1f} ms to merge, "
+              f"{search_ms:.1f} ms to search every site and merge")
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Time to first rows on startup: first fetch vs. the local SQLite replica.
+
+"Before" is a fresh VisitorEngine waiting for its first snapshot from the
+stub server (on localhost, so the best case; over the Internet add the
+round trip, or the whole 15 s timeout when offline).  "After" restores
+the engine from a LocalReplica written by an earlier session the way the
+dashboard does: the newest rows first (what the first paint needs), the
+rest in batches, then one delta poll to catch up.  No network is needed
+until that poll.
+
+    python benchmarks/bench_startup.py [visitors]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubServer, VisitorStore
+from visitor_engine import FetchSnapshot, VisitorEngine
+from visitor_replica import LocalReplica
+
+FIRST_ROWS = 500  # dashboard.REPLICA_FIRST_ROWS
+BATCH = 1000  # dashboard.REPLICA_BATCH
+
+
+def quiet(message):
+    pass
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    store = VisitorStore()
+    store.seed(count)
+    path = os.path.join(tempfile.mkdtemp(), "replica.sqlite3")
+
+    with StubServer(visitors=store) as server:
+        url = server.base_url + "/get_visitors.php"
+
+        # An earlier session that scrolled through everything
+        engine = VisitorEngine(url, log=quiet, store=LocalReplica(path, url))
+        engine.load_all()
+        engine.store.flush()
+        store.touch(range(1, 51), last_status="Inside")  # changed while the dashboard was closed
+
+        started = time.perf_counter()
+        engine = VisitorEngine(url, log=quiet)
+        engine.apply(engine.feed.snapshot())
+        fetch_ms = (time.perf_counter() - started) * 1000
+        fetched = len(engine.rows.by_id)
+
+        started = time.perf_counter()
+        engine = VisitorEngine(url, log=quiet, store=LocalReplica(path, url))
+        engine.restore(FIRST_ROWS)
+        first_ms = (time.perf_counter() - started) * 1000
+        floor = int(engine.rows.order[-1])
+        while True:
+            records = engine.store.load(BATCH, before_id=floor)
+            if not records:
+                break
+            engine.apply(FetchSnapshot(records, delta=True, restored=True))
+            floor = int(records[-1].visitor_id)
+        restore_ms = (time.perf_counter() - started) * 1000
+        restored = len(engine.rows.by_id)
+        started = time.perf_counter()
+        snapshot = engine.feed.snapshot()
+        diff = engine.apply(snapshot)
+        catch_up_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{count} visitors in the replica file ({os.path.getsize(path) / 1e6:.1f} MB)")
+    print(f"  first fetch:  {fetch_ms:7.0f} ms to {fetched} rows (newest page; needs the server)")
+    print(f"  replica:      {first_ms:7.0f} ms to the newest {FIRST_ROWS} rows (offline-capable)")
+    print(f"                {restore_ms:7.0f} ms to all {restored} rows, in batches of {BATCH}")
+    print(f"  catch-up:     {catch_up_ms:7.0f} ms, delta of {len(snapshot.visitors)} rows, {len(diff.changed)} changed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Status evaluation cost: strptime on every call vs. VisitorRecord.
+
+A refresh asks for every visitor's status several times (statistics,
+filter, each bound row).  The old dashboard parsed expiry_at with strptime
+on each of those calls; VisitorRecord parses once per fetch and caches the
+status until the expiry passes.
+
+    python benchmarks/bench_status.py [rows ...]
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from visitor_record import VisitorRecord
+
+PASSES = 3  # statistics + filter + table, per refresh
+
+
+def strptime_status(visitor):
+    """The dashboard's get_visitor_status() before VisitorRecord."""
+    last_status = str(visitor.get('last_status') or "").strip().lower()
+    last_scan = visitor.get('last_scan')
+    try:
+        is_expired = datetime.strptime(visitor.get('expiry_at', ''), '%Y-%m-%d %H:%M:%S') < datetime.now()
+    except Exception:
+        is_expired = False
+    scanned = last_scan and last_scan not in ["None", "", None]
+
+    if last_status == "invalid":
+        return "Invalid"
+    if last_status in ['exited', 'exit', 'left', 'out', 'exited_by']:
+        return "Exited"
+    if last_status == "inside":
+        if is_expired:
+            return "Expired"
+        if scanned:
+            return "Inside"
+    if last_status == "expired" or is_expired:
+        return "Expired"
+    if scanned:
+        return "Inside"
+    return "Valid"
+
+
+def make_rows(count):
+    rng = random.Random(count)
+    now = datetime.now()
+    rows = []
+    for i in range(count):
+        expiry = now + timedelta(hours=rng.randint(-48, 48))
+        scanned = rng.random() < 0.5
+        rows.append({
+            'visitor_id': str(i),
+            'full_name': f"Visitor {i}",
+            'last_status': rng.choice(["", "inside", "exited", "invalid", None]),
+            'last_scan': (now - timedelta(minutes=rng.randint(1, 600))).strftime('%Y-%m-%d %H:%M:%S') if scanned else None,
+            'expiry_at': expiry.strftime('%Y-%m-%d %H:%M:%S'),
+        })
+    return rows
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1000
+
+
+def bench(count):
+    rows = make_rows(count)
+
+    def baseline():
+        for _ in range(PASSES):
+            for row in rows:
+                strptime_status(row)
+
+    records = []
+
+    def parse():
+        records[:] = [VisitorRecord(dict(row)) for row in rows]
+
+    def cached():
+        now = datetime.now()
+        for _ in range(PASSES):
+            for record in records:
+                record.status_at(now)
+
+    old_ms = timed(baseline)
+    parse_ms = timed(parse)
+    new_ms = timed(cached)
+
+    mismatches = sum(strptime_status(row) != record.status for row, record in zip(rows, records))
+    print(f"{count} rows, {PASSES} status passes per refresh")
+    print(f"  strptime per call:      {old_ms:9.1f} ms")
+    print(f"  VisitorRecord parse:    {parse_ms:9.1f} ms  (once per fetch, worker thread)")
+    print(f"  VisitorRecord status:   {new_ms:9.1f} ms  (UI thread, {old_ms / max(new_ms, 1e-6):.0f}x)")
+    if mismatches:
+        print(f"  WARNING: {mismatches} statuses differ from the baseline")
+
+
+def main():
+    counts = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+    for count in counts:
+        bench(count)
+
+
+if __name__ == "__main__":
+    main()
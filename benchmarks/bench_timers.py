@@ -0,0 +1,88 @@
+"""Idle cost of time-driven statuses: periodic recount vs. the transition heap.
+
+Statuses change with the clock (a pass expires, an Inside duration reaches
+its next minute) even when no data arrives.  The dashboard used to wake
+every 20 s and, once any pass had expired since the last count, recount
+every visitor; StatusCounts now keeps a heap of transition instants and
+re-derives only the visitors that are due.  This replays an hour of wall
+clock over a synthetic table and reports the CPU spent and the number of
+wakeups for each.
+
+    python benchmarks/bench_timers.py [visitors]
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from visitor_record import StatusCounts, VisitorRecord
+
+OLD_TICK = timedelta(seconds=20)  # the old DURATION_REFRESH_MS
+HOUR = timedelta(hours=1)
+
+
+def make_records(count, now):
+    rng = random.Random(count)
+    records = {}
+    for i in range(count):
+        expiry = now + timedelta(seconds=rng.randint(-86400, 86400))
+        scanned = rng.random() < 0.5
+        record = VisitorRecord({
+            'visitor_id': str(i),
+            'last_status': "inside" if scanned else "",
+            'last_scan': (now - timedelta(minutes=rng.randint(1, 600))).strftime('%Y-%m-%d %H:%M:%S') if scanned else None,
+            'expiry_at': expiry.strftime('%Y-%m-%d %H:%M:%S'),
+        }, now)
+        records[record.visitor_id] = record
+    return records
+
+
+def periodic(records, start):
+    """Every tick: recount everything if any counted status may have expired."""
+    counts = StatusCounts()
+    counts.reset(records.values(), start)
+    next_change = min((r.status_until for r in records.values() if r.status_until), default=None)
+    wakeups = 0
+    started = time.process_time()
+    now = start
+    while now < start + HOUR:
+        now += OLD_TICK
+        wakeups += 1
+        if next_change is not None and now > next_change:
+            counts.reset(records.values(), now)
+            next_change = min((r.status_until for r in records.values() if r.status_until), default=None)
+    return (time.process_time() - started) * 1000, wakeups, counts.counts
+
+
+def scheduled(records, start):
+    """Wake only at the next transition instant and re-derive the visitors that are due."""
+    counts = StatusCounts()
+    counts.reset(records.values(), start)
+    wakeups = 0
+    flipped = 0
+    started = time.process_time()
+    while counts.next_change is not None and counts.next_change < start + HOUR:
+        now = counts.next_change + timedelta(microseconds=1)
+        wakeups += 1
+        flipped += len(counts.refresh(records, now))
+    return (time.process_time() - started) * 1000, wakeups, counts.counts, flipped
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    start = datetime.now().replace(microsecond=0)
+    old_ms, old_wakeups, old_counts = periodic(make_records(count, start), start)
+    new_ms, new_wakeups, new_counts, flipped = scheduled(make_records(count, start), start)
+    assert old_counts == new_counts, (old_counts, new_counts)
+
+    print(f"{count} visitors, one hour of wall clock, {flipped} passes expiring")
+    print(f"  recount every 20 s:  {old_ms:8.1f} ms CPU, {old_wakeups} wakeups")
+    print(f"  transition heap:     {new_ms:8.1f} ms CPU, {new_wakeups} wakeups (one per distinct expiry instant)")
+
+
+if __name__ == "__main__":
+    main()
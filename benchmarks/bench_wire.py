@@ -0,0 +1,96 @@
+"""Feed payload size and decode time: row dicts vs. the columnar layout.
+
+Encodes the same visitors both ways (as get_visitors.php does), plain and
+gzipped, and times decoding back into row dicts with the stdlib json and,
+if installed, orjson.  Then fetches them over the stub server the old way
+(plain JSON, response.json()) and through VisitorFeed (negotiated).
+
+    python benchmarks/bench_wire.py [visitors]
+"""
+
+import gzip
+import json
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubServer, VisitorStore, columnar
+from visitor_engine import FEED_ACCEPT, FEED_FIELDS, VisitorFeed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+REPEAT = 5
+LINK_MBPS = 10
+
+
+def best_ms(fn):
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def to_rows(data):
+    if "rows" in data:
+        columns = data["columns"]
+        return [dict(zip(columns, row)) for row in data["rows"]]
+    return data["data"]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    store = VisitorStore()
+    store.seed(count)
+    payload = store.feed({"fields": [FEED_FIELDS]})
+
+    layouts = {
+        "row dicts": json.dumps(payload).encode(),
+        "columnar": json.dumps(columnar(payload)).encode(),
+    }
+    loaders = [("json", json.loads)] + ([("orjson", orjson.loads)] if orjson else [])
+
+    print(f"{count} visitors")
+    print(f"  {'layout':10} {'bytes':>10} {'gzipped':>10}   decode to row dicts (gunzip included)")
+    for name, body in layouts.items():
+        packed = gzip.compress(body, 6)
+        timings = "  ".join(f"{loader} {best_ms(lambda: to_rows(loads(gzip.decompress(packed)))):6.1f} ms"
+                            for loader, loads in loaders)
+        print(f"  {name:10} {len(body):10} {len(packed):10}   {timings}")
+
+    with StubServer(visitors=store) as server:
+        url = server.base_url + "/get_visitors.php"
+        params = {"fields": FEED_FIELDS}
+
+        def old():
+            response = requests.get(url, params=params, timeout=30,
+                                    headers={"Accept": "application/json", "Accept-Encoding": "identity"})
+            response.json()
+            return len(response.content)
+
+        feed = VisitorFeed(url, log=lambda message: None)
+
+        def new():
+            payload, error = feed.fetch(params)
+            assert error is None and len(payload["data"]) == count
+            return feed.last_response_bytes
+
+        print(f"  over the stub server (best of {REPEAT}; dashboard sends Accept: {FEED_ACCEPT.split(',')[0]}):")
+        old_bytes, new_bytes = old(), new()
+        print(f"    plain JSON, response.json():  {best_ms(old):7.1f} ms  {old_bytes:9} B")
+        print(f"    VisitorFeed (negotiated):     {best_ms(new):7.1f} ms  {new_bytes:9} B")
+        # Loopback hides transfer time; this is what the bytes cost on a real uplink
+        print(f"    transfer alone at {LINK_MBPS} Mbit/s: {old_bytes * 8 / LINK_MBPS / 1e3:.0f} ms"
+              f" vs {new_bytes * 8 / LINK_MBPS / 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
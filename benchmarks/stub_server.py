@@ -0,0 +1,690 @@
+"""Local stand-in for the services the dashboard talks to.
+
+Serves a qrserver.com-compatible ``/v1/create-qr-code/`` endpoint and a
+``/get_visitors.php`` feed backed by an in-memory SQLite copy of the
+``visitors`` table (same columns and delta-sync protocol as the PHP
+endpoint), plus the ``/events.php`` push stream, the scan endpoints
+(``/check.php``, ``/check_batch.php``), ``/get_logs.php`` and
+``/digests.php``, on 127.0.0.1, so benchmarks never depend on the network.
+
+Run on its own it serves a seeded table to a real dashboard:
+
+    python benchmarks/stub_server.py [--visitors N] [--change-rate N] [--port P] [--feed-latency S]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qr_encoder
+
+
+def qr_png(data, size=80):
+    """A PNG of ``data`` at roughly the size api.qrserver.com returns."""
+    return qr_encoder.thumbnail_png(data, size, border=4)
+
+
+VISITOR_COLUMNS = [
+    "visitor_id", "full_name", "email", "phone", "purpose", "host", "notes", "qr_code",
+    "expiry_at", "last_status", "last_scan", "entry_scan", "exit_time", "created_at", "updated_at",
+]
+
+
+# migrations/005_visitor_digests.sql: the digested columns, and its triggers in SQLite
+# dialect (row_digest and xor are registered as functions)
+DIGEST_COLUMNS = ["visitor_id", "full_name", "email", "phone", "purpose", "host", "qr_code", "expiry_at",
+                  "last_status", "last_scan", "entry_scan", "exit_time", "created_at"]
+LEAF_IDS = 64
+
+
+def row_digest(*values):
+    """MySQL's CRC32(CONCAT_WS(CHAR(31), visitor_id, IFNULL(full_name, ''), ...))."""
+    return zlib.crc32("\x1f".join("" if v is None else str(v) for v in values).encode("utf-8"))
+
+
+def digest_of(row):
+    return f"row_digest({', '.join(f'{row}.{c}' for c in DIGEST_COLUMNS)})"
+
+
+DIGEST_SCHEMA = f"""
+    CREATE TABLE visitor_digests (leaf INTEGER PRIMARY KEY, row_count INTEGER, digest INTEGER);
+    CREATE TRIGGER visitors_after_insert_digest AFTER INSERT ON visitors BEGIN
+        INSERT INTO visitor_digests VALUES (NEW.visitor_id / {LEAF_IDS}, 1, {digest_of("NEW")})
+        ON CONFLICT (leaf) DO UPDATE SET row_count = row_count + 1, digest = xor(digest, excluded.digest);
+    END;
+    CREATE TRIGGER visitors_after_update_digest AFTER UPDATE ON visitors BEGIN
+        UPDATE visitor_digests SET digest = xor(digest, xor({digest_of("OLD")}, {digest_of("NEW")}))
+        WHERE leaf = NEW.visitor_id / {LEAF_IDS};
+    END;
+    CREATE TRIGGER visitors_after_delete_digest AFTER DELETE ON visitors BEGIN
+        UPDATE visitor_digests SET row_count = row_count - 1, digest = xor(digest, {digest_of("OLD")})
+        WHERE leaf = OLD.visitor_id / {LEAF_IDS};
+    END;
+"""
+
+
+# get_visitors.php's derived-status expression, in SQLite dialect
+STATUS_SQL = """CASE
+    WHEN LOWER(COALESCE(last_status, '')) = 'invalid' THEN 'Invalid'
+    WHEN LOWER(COALESCE(last_status, '')) IN ('exited', 'exit', 'left', 'out', 'exited_by') THEN 'Exited'
+    WHEN expiry_at < datetime('now', 'localtime') OR LOWER(COALESCE(last_status, '')) = 'expired' THEN 'Expired'
+    WHEN last_scan IS NOT NULL THEN 'Inside'
+    ELSE 'Valid'
+END"""
+
+
+class VisitorStore:
+    """SQLite stand-in for the MySQL ``visitors`` table and get_visitors.php."""
+
+    round_trip = 0.0  # seconds added per SQL statement, standing in for MySQL across the network
+    connect_cost = 0.0  # seconds for a new MySQL connection (one per check.php request)
+
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:", check_same_thread=False)
+        self.db.create_function("row_digest", len(DIGEST_COLUMNS), row_digest, deterministic=True)
+        self.db.create_function("xor", 2, lambda a, b: a ^ b, deterministic=True)
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.events = []  # (event_id, visitor_id), the visitor_events table
+        self.clock = datetime(2026, 1, 1)
+        self.db.executescript("""
+            CREATE TABLE visitors (
+                visitor_id INTEGER PRIMARY KEY, full_name TEXT, email TEXT, phone TEXT,
+                purpose TEXT, host TEXT, notes TEXT, qr_code TEXT, expiry_at TEXT,
+                last_status TEXT, last_scan TEXT, entry_scan TEXT, exit_time TEXT,
+                created_at TEXT, updated_at TEXT
+            );
+            CREATE INDEX idx_visitors_updated_at ON visitors (updated_at, visitor_id);
+            CREATE INDEX idx_visitors_qr_code ON visitors (qr_code);
+            CREATE TABLE visitor_tombstones (visitor_id INTEGER PRIMARY KEY, deleted_at TEXT);
+            CREATE TABLE logs (
+                log_id INTEGER PRIMARY KEY, visitor_id INTEGER, qr_code TEXT, status TEXT,
+                scan_id TEXT UNIQUE, scanned_at TEXT, gate TEXT,
+                logged_at TEXT DEFAULT (datetime('now', 'localtime'))
+            );
+        """ + DIGEST_SCHEMA)
+        self.statements = 0  # SQL round trips the PHP endpoints would have made
+        self.transactions = 0
+
+    def tick(self):
+        """Next updated_at value; strictly increasing like TIMESTAMP(3) on a busy server."""
+        self.clock += timedelta(milliseconds=1)
+        return self.clock.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+    def seed(self, count, seed=1):
+        rng = random.Random(seed)
+        now = datetime.now()
+        rows = []
+        for i in range(1, count + 1):
+            created = now - timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+            expiry = created + timedelta(days=1)
+            status = rng.choice([None, "Inside", "Exited", "Expired", "Invalid"])
+            scan = (created + timedelta(minutes=rng.randint(1, 600))).strftime("%Y-%m-%d %H:%M:%S") if status else None
+            exit_time = (created + timedelta(minutes=rng.randint(601, 900))).strftime("%Y-%m-%d %H:%M:%S") \
+                if status == "Exited" else None
+            rows.append((
+                i, f"Visitor {i}", f"visitor{i}@example.com", f"0917{i:07d}",
+                rng.choice(["Meeting", "Delivery", "Interview", "Maintenance"]),
+                rng.choice(["Admin", "Registrar", "IT Office", "Library"]), "",
+                f"{rng.getrandbits(64):016x}", expiry.strftime("%Y-%m-%d %H:%M:%S"),
+                status, scan, scan, exit_time, created.strftime("%Y-%m-%d %H:%M:%S"), self.tick(),
+            ))
+        with self.lock:
+            self.db.executemany(f"INSERT INTO visitors VALUES ({','.join('?' * len(VISITOR_COLUMNS))})", rows)
+
+    def touch(self, visitor_ids, quiet=False, **fields):
+        """Update some visitors, bumping updated_at the way MySQL's ON UPDATE does.
+
+        ``quiet`` leaves updated_at and the events alone: a change the delta
+        feed never sees, like a restored backup or a hand edit that set
+        updated_at back.
+        """
+        with self.lock:
+            for vid in visitor_ids:
+                sets = [f"{k} = ?" for k in fields] + ([] if quiet else ["updated_at = ?"])
+                self.db.execute(f"UPDATE visitors SET {', '.join(sets)} WHERE visitor_id = ?",
+                                [*fields.values(), *([] if quiet else [self.tick()]), vid])
+                if not quiet:
+                    self.log_event(vid)
+            self.changed.notify_all()
+
+    def delete(self, visitor_ids, quiet=False):
+        """Delete some visitors; ``quiet`` leaves no tombstone or event (as if the tombstones were purged)."""
+        with self.lock:
+            for vid in visitor_ids:
+                self.db.execute("DELETE FROM visitors WHERE visitor_id = ?", (vid,))
+                if not quiet:
+                    self.db.execute("INSERT OR REPLACE INTO visitor_tombstones VALUES (?, ?)", (vid, self.tick()))
+                    self.log_event(vid)
+            self.changed.notify_all()
+
+    def log_event(self, vid):
+        """What the visitor_events triggers do; call with the lock held."""
+        self.events.append((len(self.events) + 1, vid))
+
+    def wait_events(self, last_id, timeout):
+        """Events after ``last_id``, waiting up to ``timeout`` seconds for one."""
+        with self.changed:
+            self.changed.wait_for(lambda: len(self.events) > last_id, timeout)
+            return self.events[last_id:last_id + 500]
+
+    def round_trips(self, statements, connect=False):
+        """Count (and, with ``round_trip`` set, wait for) SQL statements sent to the database."""
+        with self.lock:
+            self.statements += statements
+            self.transactions += 1
+        delay = statements * self.round_trip + (self.connect_cost if connect else 0)
+        if delay:
+            time.sleep(delay)
+
+    def update_visitor(self, vid, sets, args):
+        """UPDATE visitors, bumping updated_at and logging the event; call with the lock held."""
+        self.db.execute(f"UPDATE visitors SET {sets}, updated_at = ? WHERE visitor_id = ?", [*args, self.tick(), vid])
+        self.log_event(vid)
+
+    def check(self, qr):
+        """check.php for one scan: (http status, response), three statements on a new connection."""
+        if qr == "":
+            return 400, {"status": "Invalid", "msg": "QR code parameter missing"}
+        self.round_trips(3, connect=True)
+        now = datetime.now()
+        at = now.strftime("%Y-%m-%d %H:%M:%S")
+        with self.lock:
+            row = self.db.execute("SELECT visitor_id, full_name, email, phone, purpose, host, expiry_at, last_status "
+                                  "FROM visitors WHERE qr_code = ? LIMIT 1", (qr,)).fetchone()
+            if row is None:
+                self.db.execute("INSERT INTO logs (qr_code, status) VALUES (?, 'Invalid')", (qr,))
+                return 200, {"status": "Invalid", "msg": "QR code not found"}
+            vid, name, email, phone, purpose, host, expiry_at, last_status = row
+            if (expiry_at or "") < at:
+                self.db.execute("INSERT INTO logs (visitor_id, qr_code, status) VALUES (?, ?, 'Expired')", (vid, qr))
+                self.update_visitor(vid, "last_status = 'Expired', last_scan = ?", [at])
+                result = {"status": "Expired", "msg": "QR code has expired", "visitor_id": str(vid)}
+            elif last_status == "Exited":
+                self.db.execute("INSERT INTO logs (visitor_id, qr_code, status) VALUES (?, ?, 'Invalid')", (vid, qr))
+                result = {"status": "AlreadyExited", "msg": "Visitor has already exited. Re-entry is not allowed.",
+                          "visitor_id": str(vid), "visitor_name": name}
+            else:
+                self.db.execute("INSERT INTO logs (visitor_id, qr_code, status) VALUES (?, ?, 'Valid')", (vid, qr))
+                self.update_visitor(vid, "last_status = 'Inside', last_scan = ?, entry_scan = COALESCE(entry_scan, ?)",
+                                    [at, at])
+                result = {"status": "Inside", "visitor_id": str(vid), "visitor_name": name, "email": email,
+                          "phone": phone, "purpose": purpose, "host": host, "expires_at": expiry_at,
+                          "current_time": at}
+            self.changed.notify_all()
+        return 200, result
+
+    def apply_scans(self, scans, gate):
+        """check_batch.php: log a batch of scans in one transaction; (applied, duplicates)."""
+        applied = duplicates = 0
+        statements = 2  # BEGIN, COMMIT
+        with self.lock:
+            for scan in scans:
+                vid, at, status = scan.get("visitor_id"), scan["scanned_at"], scan["status"]
+                statements += 1
+                inserted = self.db.execute(
+                    "INSERT OR IGNORE INTO logs (scan_id, visitor_id, qr_code, status, scanned_at, gate) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (scan["scan_id"], vid, scan.get("qr"), status, at, gate)).rowcount
+                if not inserted:
+                    duplicates += 1
+                    continue
+                applied += 1
+                if vid is None or status == "Invalid":
+                    continue
+                statements += 1
+                current = self.db.execute("SELECT last_scan FROM visitors WHERE visitor_id = ?", (vid,)).fetchone()
+                if current is None or (current[0] and current[0] > at):
+                    continue  # a newer scan already reached the server
+                if status == "Valid":
+                    self.update_visitor(vid, "last_status = 'Inside', last_scan = ?, "
+                                        "entry_scan = COALESCE(entry_scan, ?)", [at, at])
+                elif status == "Expired":
+                    self.update_visitor(vid, "last_status = 'Expired', last_scan = ?", [at])
+                elif status == "Exited":
+                    self.update_visitor(vid, "exit_time = ?, last_status = 'Exited', last_scan = ?", [at, at])
+            self.changed.notify_all()
+        self.round_trips(statements)
+        return applied, duplicates
+
+    def seed_logs(self, days, per_day, seed=1, until=None):
+        """Scans for the ``days`` days before ``until`` (today): entries, exits, and some noise."""
+        rng = random.Random(seed)
+        until = until or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        with self.lock:
+            count = self.db.execute("SELECT COUNT(*) FROM visitors").fetchone()[0]
+        rows = []
+        for d in range(days, 0, -1):
+            midnight = until - timedelta(days=d)
+            for _ in range(per_day // 2):
+                vid = rng.randint(1, count)
+                # Arrivals peak in the morning and after lunch
+                hour = rng.choice([7, 8, 8, 9, 9, 10, 11, 13, 13, 14, 15, 16])
+                entered = midnight + timedelta(hours=hour, seconds=rng.randrange(3600))
+                rows.append((vid, "Valid", entered))
+                kind = rng.random()
+                if kind < 0.85:
+                    rows.append((vid, "Exited", entered + timedelta(minutes=rng.expovariate(1 / 90))))
+                elif kind < 0.95:
+                    rows.append((vid, rng.choice(["Invalid", "Expired"]), entered + timedelta(minutes=5)))
+        rows.sort(key=lambda row: row[2])
+        with self.lock:
+            self.db.executemany("INSERT INTO logs (visitor_id, status, scanned_at, logged_at) VALUES (?, ?, ?, ?)",
+                                [(vid, status, f"{at:%Y-%m-%d %H:%M:%S}", f"{at:%Y-%m-%d %H:%M:%S}")
+                                 for vid, status, at in rows])
+        return len(rows)
+
+    def logs(self, params):
+        """get_logs.php: the scan log as column arrays (see the PHP endpoint)."""
+        def param(name, default=""):
+            return params.get(name, [default])[0]
+
+        event_at = "COALESCE(l.scanned_at, l.logged_at)"
+        with self.lock:
+            if param("range"):
+                first, last = self.db.execute(f"SELECT MIN({event_at}), MAX({event_at}) FROM logs l").fetchone()
+                return {"ok": True, "first": first, "last": last}
+            start = param("from")
+            limit = max(1, min(100000, int(param("limit", "50000"))))
+            rows = self.db.execute(f"""
+                SELECT l.log_id, l.visitor_id,
+                       CASE l.status WHEN 'Valid' THEN 1 WHEN 'Expired' THEN 2 WHEN 'Invalid' THEN 3
+                                     WHEN 'Exited' THEN 4 ELSE 0 END,
+                       CAST(strftime('%s', {event_at}) AS INTEGER) - CAST(strftime('%s', ?) AS INTEGER) AS t,
+                       v.host, v.purpose
+                FROM logs l LEFT JOIN visitors v ON v.visitor_id = l.visitor_id
+                WHERE {event_at} >= ? AND {event_at} < ?
+                ORDER BY {event_at}, l.log_id""", (start, start, param("to"))).fetchall()
+        after = (int(param("after_t", "-1")), int(param("after_id", "0")))
+        rows = [row for row in rows if (row[3], row[0]) > after][:limit + 1]
+        more = len(rows) > limit
+        rows = rows[:limit]
+        columns = list(zip(*rows)) or [()] * 6
+        result = {"ok": True, "more": more}
+        for name, values in zip(["log_id", "visitor_id", "kind", "t", "host", "purpose"], columns):
+            result[name] = list(values)
+        return result
+
+    def digests(self, params):
+        """digests.php: leaf digests combined into buckets of ``size`` ids (0: one bucket)."""
+        size = int(params.get("size", ["0"])[0])
+        first = int(params.get("from_id", ["0"])[0]) // LEAF_IDS
+        end = params.get("to_id", [None])[0]
+        if size < 0 or size % LEAF_IDS:
+            return {"ok": False, "msg": f"size must be 0 or a multiple of {LEAF_IDS}"}
+        sql = "SELECT leaf, row_count, digest FROM visitor_digests WHERE row_count > 0 AND leaf >= ?"
+        args = [first]
+        if end is not None:
+            sql += " AND leaf < ?"
+            args.append(int(end) // LEAF_IDS)
+        buckets = {}
+        with self.lock:
+            rows = self.db.execute(sql + " ORDER BY leaf", args).fetchall()
+        # No BIT_XOR aggregate in SQLite: combine the leaves here
+        for leaf, count, digest in rows:
+            b = leaf * LEAF_IDS // size if size else 0
+            entry = buckets.setdefault(b, [b, 0, 0])
+            entry[1] += count
+            entry[2] ^= digest
+        return {"ok": True, "size": size, "buckets": list(buckets.values())}
+
+    def log_count(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+
+    def rows(self, visitor_ids, columns):
+        with self.lock:
+            rows = self.db.execute(f"SELECT {', '.join(columns)} FROM visitors WHERE visitor_id IN "
+                                   f"({','.join('?' * len(visitor_ids))})", visitor_ids).fetchall()
+        return [dict(zip(columns, row), visitor_id=str(row[0])) for row in rows]
+
+    def feed(self, params):
+        """The get_visitors.php response for these query parameters."""
+        def param(name, default=""):
+            return params.get(name, [default])[0]
+
+        since = param("since")
+        since_id = int(param("since_id", "0"))
+        limit = max(1, min(5000, int(param("limit")))) if param("limit") else (1000 if since else 0)
+        before_id = int(param("before_id", "0"))
+        status = param("status")
+        q = param("q").strip()
+        ids = [int(i) for i in param("ids").split(",") if i.strip().isdigit()][:500]
+        created_from = param("created_from")
+        created_to = param("created_to")
+
+        columns = VISITOR_COLUMNS
+        if param("fields"):
+            wanted = {"visitor_id", "updated_at", *param("fields").split(",")}
+            columns = [c for c in VISITOR_COLUMNS if c in wanted]
+
+        where, args = [], []
+        if since:
+            where.append("(updated_at > ? OR (updated_at = ? AND visitor_id > ?))")
+            args += [since, since, since_id]
+            order = "updated_at, visitor_id"
+        else:
+            if before_id > 0:
+                where.append("visitor_id < ?")
+                args.append(before_id)
+            if status in ("Valid", "Expired", "Inside", "Exited", "Invalid"):
+                where.append(f"({STATUS_SQL}) = ?")
+                args.append(status)
+            if q:
+                where.append("(full_name LIKE ? OR email LIKE ? OR purpose LIKE ? OR host LIKE ?)")
+                args += [f"%{q}%"] * 4
+            if ids:
+                where.append(f"visitor_id IN ({','.join('?' * len(ids))})")
+                args += ids
+            if created_from:
+                where.append("created_at >= ?")
+                args.append(created_from)
+            if created_to:
+                where.append("created_at < date(?, '+1 day')")
+                args.append(created_to)
+            order = "visitor_id DESC"
+
+        sql = f"SELECT {', '.join(columns)} FROM visitors"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order}"
+        if limit:
+            sql += f" LIMIT {limit + 1}"
+
+        with self.lock:
+            cursor = {"updated_at": since or "1970-01-01 00:00:00.000", "visitor_id": since_id}
+            if not since:
+                top = self.db.execute("SELECT updated_at, visitor_id FROM visitors "
+                                      "ORDER BY updated_at DESC, visitor_id DESC LIMIT 1").fetchone()
+                if top:
+                    cursor = {"updated_at": top[0], "visitor_id": top[1]}
+            rows = self.db.execute(sql, args).fetchall()
+            tombstones = []
+            if since:
+                tombstones = [r[0] for r in self.db.execute(
+                    "SELECT visitor_id FROM visitor_tombstones WHERE deleted_at >= ?", (since,))]
+
+        more = bool(limit) and len(rows) > limit
+        rows = rows[:limit] if more else rows
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        data = []
+        for row in rows:
+            visitor = dict(zip(columns, row))
+            visitor["visitor_id"] = str(visitor["visitor_id"])  # mysqli returns strings
+            if "expiry_at" in visitor:
+                visitor["is_expired"] = (visitor["expiry_at"] or "") < now
+            data.append(visitor)
+        if since and data:
+            cursor = {"updated_at": data[-1]["updated_at"], "visitor_id": int(data[-1]["visitor_id"])}
+        return {"ok": True, "data": data, "cursor": cursor, "more": more, "tombstones": tombstones}
+
+
+COLUMNAR_TYPE = "application/vnd.qrgate.columnar+json"
+
+
+def columnar(payload):
+    """get_visitors.php's columnar layout: column names once, then value arrays."""
+    payload = dict(payload)
+    data = payload.pop("data")
+    payload["columns"] = list(data[0]) if data else []
+    payload["rows"] = [list(row.values()) for row in data]
+    return payload
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the production web server
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+    visitors = VisitorStore()
+    stream_seconds = 55  # events.php's STREAM_SECONDS
+    ping_seconds = 15
+    retry_ms = 2000  # events.php's retry:
+    scan_latency = 0.0  # seconds added to check.php and check_batch.php: the network between gate and server
+    feed_latency = 0.0  # seconds added to get_visitors.php: a distant or overloaded site
+
+    def send_json(self, payload):
+        """Send a feed response with get_visitors.php's negotiation, ETag and gzip."""
+        content_type = "application/json"
+        if COLUMNAR_TYPE in self.headers.get("Accept", ""):
+            payload = columnar(payload)
+            content_type = COLUMNAR_TYPE
+        body = json.dumps(payload).encode("utf-8")
+        compress = len(body) > 1024 and "gzip" in self.headers.get("Accept-Encoding", "")
+        etag = '"%s%s"' % (hashlib.md5(body).hexdigest(), "-gz" if compress else "")
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        if compress:
+            body = gzip.compress(body, 6)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept, Accept-Encoding")
+        if compress:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def stream_events(self, params):
+        """events.php: push changed visitors as server-sent events."""
+        columns = VISITOR_COLUMNS
+        if params.get("fields"):
+            wanted = {"visitor_id", "updated_at", *params["fields"][0].split(",")}
+            columns = [c for c in VISITOR_COLUMNS if c in wanted]
+        last_id = int(self.headers.get("Last-Event-ID") or params.get("last_event_id", ["0"])[0])
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        store = self.visitors
+        with store.lock:
+            newest = len(store.events)
+        self.send_chunk(f"retry: {self.retry_ms}\n\n")
+        if last_id <= 0 or last_id > newest:
+            last_id = newest
+            self.send_chunk(f"id: {last_id}\nevent: hello\ndata: {json.dumps({'last_event_id': last_id})}\n\n")
+
+        started = last_ping = time.monotonic()
+        try:
+            while time.monotonic() - started < self.stream_seconds:
+                events = store.wait_events(last_id, min(self.ping_seconds, self.stream_seconds))
+                if not events:
+                    if time.monotonic() - last_ping >= self.ping_seconds:
+                        self.send_chunk(": ping\n\n")
+                        last_ping = time.monotonic()
+                    continue
+                last_id = events[-1][0]
+                ids = list(dict.fromkeys(vid for _, vid in events))
+                data = store.rows(ids, columns)
+                found = {int(row["visitor_id"]) for row in data}
+                payload = {"data": data, "tombstones": [vid for vid in ids if vid not in found]}
+                self.send_chunk(f"id: {last_id}\nevent: visitors\ndata: {json.dumps(payload)}\n\n")
+                last_ping = time.monotonic()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+
+        if url.path == "/get_visitors.php":
+            time.sleep(self.feed_latency)
+            try:
+                self.send_json(self.visitors.feed(params))
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # the client gave up waiting
+            return
+
+        if url.path == "/events.php":
+            self.stream_events(params)
+            return
+
+        if url.path == "/digests.php":
+            self.send_plain_json(self.visitors.digests(params))
+            return
+
+        if url.path == "/get_logs.php":
+            self.send_plain_json(self.visitors.logs(params))
+            return
+
+        if url.path == "/check.php":
+            time.sleep(self.scan_latency)
+            code, payload = self.visitors.check(params.get("qr", [""])[0])
+            self.send_plain_json(payload, code)
+            return
+
+        if url.path == "/v1/create-qr-code/":
+            body = qr_png(params.get("data", [""])[0])
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_error(404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if url.path == "/check_batch.php":
+            time.sleep(self.scan_latency)
+            try:
+                batch = json.loads(body)
+                scans = batch["scans"]
+            except (ValueError, KeyError, TypeError):
+                self.send_plain_json({"ok": False, "msg": "Expected at most 1000 scans"}, 400)
+                return
+            applied, duplicates = self.visitors.apply_scans(scans, batch.get("gate", ""))
+            self.send_plain_json({"ok": True, "applied": applied, "duplicates": duplicates})
+            return
+        self.send_error(404)
+
+    def send_plain_json(self, payload, code=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    """Runs StubHandler on a free local port in a background thread."""
+
+    def __init__(self, handler=StubHandler, visitors=None, port=0):
+        if visitors is not None:
+            handler = type("BoundStubHandler", (handler,), {"visitors": visitors})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @property
+    def qr_url(self):
+        """QR_API_URL (QRGATE_QR_URL) for this server's qrserver.com stand-in."""
+        return self.base_url + "/v1/create-qr-code/?size=80x80&data={}"
+
+
+class ChangeGenerator:
+    """Background writer: ``rate`` visitor changes per second (scans, exits, edits) until stopped."""
+
+    def __init__(self, store, rate, seed=3):
+        self.store = store
+        self.rate = rate
+        self.rng = random.Random(seed)
+        self.changes = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        if self.rate > 0:
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        with self.store.lock:
+            count = self.store.db.execute("SELECT MAX(visitor_id) FROM visitors").fetchone()[0] or 0
+        interval = 1 / self.rate
+        while count and not self.stopped.wait(interval):
+            vid = self.rng.randint(1, count)
+            at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            kind = self.rng.random()
+            if kind < 0.6:
+                self.store.touch([vid], last_status="Inside", last_scan=at)
+            elif kind < 0.9:
+                self.store.touch([vid], last_status="Exited", exit_time=at)
+            else:
+                self.store.touch([vid], phone=f"0917{self.rng.randrange(10 ** 7):07d}")
+            self.changes += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a seeded stand-in of the QRGate endpoints on localhost.")
+    parser.add_argument("--visitors", type=int, default=10_000)
+    parser.add_argument("--change-rate", type=float, default=1.0, help="visitor changes per second")
+    parser.add_argument("--logs-days", type=int, default=30, help="days of scan log for get_logs.php")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--feed-latency", type=float, default=0.0,
+                        help="seconds added to every get_visitors.php answer (run several to try QRGATE_SOURCES)")
+    args = parser.parse_args()
+
+    store = VisitorStore()
+    store.seed(args.visitors)
+    if args.logs_days:
+        store.seed_logs(args.logs_days, 2000)
+    handler = type("LatentStubHandler", (StubHandler,), {"feed_latency": args.feed_latency})
+    with StubServer(handler, visitors=store, port=args.port) as server:
+        ChangeGenerator(store, args.change_rate).start()
+        print(f"Serving {args.visitors} visitors on {server.base_url}; point the dashboard at it with")
+        print(f"  QRGATE_API_URL={server.base_url}/get_visitors.php")
+        print(f"  QRGATE_QR_URL='{server.qr_url}'")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
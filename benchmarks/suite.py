@@ -0,0 +1,336 @@
+"""Benchmark suite: the dashboard's data path as the visitors table grows.
+
+Every scenario runs in a fresh (spawned) process against a local
+stub_server seeded with N visitors, so no number depends on the network
+or on api.qrserver.com, and each process's peak RSS is its scenario's
+own.  While they run, ChangeGenerator changes ``--change-rate`` visitors
+per second, the way a busy gate does.
+
+    fetch   cold load of every visitor (load_all), then delta polls
+    status  status counts from scratch, and the per-tick refresh
+    filter  the table's status filter over every row
+    search  indexed searches (visitor_search)
+    stats   VisitorEngine.stats(), as the stat cards call it
+    export  CSV export of every row (ExportJob)
+    render  the Tk dashboard: first paint, the whole history, filter
+            switches, searches and scrolling; needs a display, and runs
+            under Xvfb when there is none and Xvfb is installed
+
+Results go to ``--out`` as JSON: {"meta": {...}, "results": {"fetch/10000":
+{"load_ms": ..., "peak_rss_mb": ...}, ...}}.  ``--baseline`` compares
+every *_ms and peak_rss_mb number with a stored run and exits with 1 if
+any is more than ``--tolerance`` worse; ``--save-baseline`` stores this
+run there instead.  Compare runs from the same machine only.
+
+    python benchmarks/suite.py [--sizes 1000,10000,100000] [--scenarios fetch,search]
+                               [--change-rate 20] [--repeat 5] [--out results.json]
+                               [--baseline benchmarks/baseline.json [--save-baseline]]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import ChangeGenerator, StubServer, VisitorStore
+
+SIZES = [1000, 10_000, 100_000]
+SCENARIOS = ["fetch", "status", "filter", "search", "stats", "export", "render"]
+SEARCHES = ["visitor 12", "example.com", "registrar", "0917", "nobody matches this"]
+STATUSES = ["Valid", "Expired", "Inside", "Exited", "Invalid"]
+SCROLL_FRAMES = 50
+TOLERANCE = 0.25  # a number this much worse than the baseline is a regression
+NOISE_MS = 0.1  # ...unless it moved by less than this (timer noise on sub-ms steps)
+
+
+def quiet(message):
+    pass
+
+
+def median_ms(fn, repeat):
+    """Median wall time of ``fn()`` over ``repeat`` runs, in ms."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def peak_rss_mb():
+    """This process's peak resident memory.
+
+    VmHWM where there is one: ru_maxrss survives exec on Linux, so in a
+    spawned child it starts at the parent's peak (the seeded stub server).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 1024 / 1024 if sys.platform == "darwin" else maxrss / 1024
+
+
+def loaded_engine(options):
+    from visitor_engine import VisitorEngine
+
+    engine = VisitorEngine(options["api_url"], log=quiet)
+    engine.load_all()
+    return engine
+
+
+def scenario_fetch(options):
+    from visitor_engine import VisitorEngine
+
+    engine = VisitorEngine(options["api_url"], log=quiet)
+    started = time.perf_counter()
+    engine.load_all()
+    load_ms = (time.perf_counter() - started) * 1000
+
+    polls = []
+    for _ in range(options["repeat"]):
+        time.sleep(0.2)  # let some changes pile up
+        started = time.perf_counter()
+        engine.refresh()
+        polls.append((time.perf_counter() - started) * 1000)
+    return {"load_ms": load_ms, "delta_poll_ms": statistics.median(polls), "rows": len(engine.rows.by_id)}
+
+
+def scenario_status(options):
+    engine = loaded_engine(options)
+    records = list(engine.rows.by_id.values())
+    now = datetime.now()
+    return {
+        "reset_ms": median_ms(lambda: engine.counts.reset(records, now), options["repeat"]),
+        "refresh_ms": median_ms(lambda: engine.counts.refresh(engine.rows.by_id, datetime.now()), options["repeat"]),
+    }
+
+
+def scenario_filter(options):
+    engine = loaded_engine(options)
+    records = engine.rows.rows()
+
+    def filter_all():
+        now = datetime.now()
+        for status in STATUSES:
+            [v for v in records if v.status_at(now) == status]
+
+    return {"filter_ms": median_ms(filter_all, options["repeat"]) / len(STATUSES)}
+
+
+def scenario_search(options):
+    engine = loaded_engine(options)
+    records = engine.rows.rows()
+
+    def search_all():
+        for query in SEARCHES:
+            engine.search.search(query, records)
+
+    return {"search_ms": median_ms(search_all, options["repeat"]) / len(SEARCHES)}
+
+
+def scenario_stats(options):
+    engine = loaded_engine(options)
+    return {"stats_ms": median_ms(engine.stats, options["repeat"])}
+
+
+def scenario_export(options):
+    from visitor_export import ExportJob, snapshot_batches
+
+    engine = loaded_engine(options)
+    records = engine.rows.rows()
+    path = os.path.join(options["tmp"], "export.csv")
+
+    def export():
+        job = ExportJob(path, snapshot_batches(records))
+        job.run()
+        if job.error:
+            raise RuntimeError(job.error)
+
+    ms = median_ms(export, options["repeat"])
+    return {"export_ms": ms, "rows_per_s": len(records) / ms * 1000, "file_kb": os.path.getsize(path) / 1024}
+
+
+def scenario_render(options):
+    if not os.environ.get("DISPLAY") and sys.platform.startswith("linux"):
+        return {"skipped": "no display (install Xvfb to run this scenario headless)"}
+    import dashboard
+
+    dashboard.REPLICA_PATH = os.path.join(options["tmp"], "replica.sqlite3")
+    dashboard.QR_CACHE_DIR = os.path.join(options["tmp"], "qr_cache")
+
+    class BenchDashboard(dashboard.QRGateDashboard):
+        def start_updates(self):
+            pass  # no worker thread: the suite fetches and applies snapshots itself
+
+    started = time.perf_counter()
+    app = BenchDashboard()
+    root = app.root
+    site = app.sites[0]
+    app.update_dashboard(site, site.engine.feed.snapshot())
+    root.update()
+    first_paint_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    key = ("All", "")
+    while site.more_pages.get(key):
+        app.update_dashboard(site, site.engine.feed.page({'before_id': site.page_floor[key], 'key': key}))
+        root.update()
+    history_ms = (time.perf_counter() - started) * 1000
+
+    def switch_filters():
+        for status in STATUSES + ["All"]:
+            app.set_filter(status)
+            root.update()
+
+    def search():
+        for query in SEARCHES:
+            app.search_var.set(query)
+            app.search_settled()
+            root.update()
+        app.search_var.set("")
+        app.search_settled()
+
+    def scroll():
+        for frame in range(SCROLL_FRAMES):
+            app.table.yview("moveto", frame / SCROLL_FRAMES)
+            root.update()
+
+    result = {
+        "first_paint_ms": first_paint_ms,
+        "history_ms": history_ms,
+        "filter_switch_ms": median_ms(switch_filters, options["repeat"]) / (len(STATUSES) + 1),
+        "search_ms": median_ms(search, options["repeat"]) / (len(SEARCHES) + 1),
+        "scroll_frame_ms": median_ms(scroll, options["repeat"]) / SCROLL_FRAMES,
+        "rows": len(app.current_data),
+    }
+    root.destroy()
+    return result
+
+
+def run_scenario(name, options):
+    """Child process: one scenario, plus its peak RSS."""
+    # Before anything imports visitor_engine or dashboard, which read these
+    os.environ["QRGATE_API_URL"] = options["api_url"]
+    os.environ["QRGATE_QR_URL"] = options["qr_url"]
+    result = globals()["scenario_" + name](options)
+    if "skipped" not in result:
+        result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def start_xvfb():
+    """A headless X server for the render scenario, or None if there is no Xvfb."""
+    if os.environ.get("DISPLAY") or not shutil.which("Xvfb"):
+        return None
+    xvfb = subprocess.Popen(["Xvfb", "-displayfd", "1", "-screen", "0", "1920x1080x24", "-nolisten", "tcp"],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    display = xvfb.stdout.readline().strip().decode()
+    if not display:
+        xvfb.kill()
+        return None
+    os.environ["DISPLAY"] = ":" + display
+    return xvfb
+
+
+def compare(results, baseline, tolerance):
+    """Print each number next to the baseline's; returns the regressions."""
+    regressions = []
+    print(f"\n  {'benchmark':34} {'baseline':>10} {'now':>10} {'change':>8}")
+    for key in sorted(results):
+        for metric, value in sorted(results[key].items()):
+            before = baseline.get(key, {}).get(metric)
+            if not (metric.endswith("_ms") or metric == "peak_rss_mb") or not isinstance(before, (int, float)):
+                continue
+            change = value / before - 1 if before else 0.0
+            flag = ""
+            if metric.endswith("_ms") and abs(value - before) < NOISE_MS:
+                pass
+            elif change > tolerance:
+                flag = "  REGRESSION"
+                regressions.append(f"{key} {metric}")
+            elif change < -tolerance and metric.endswith("_ms"):
+                flag = "  faster"
+            print(f"  {key + ' ' + metric:34} {before:10.2f} {value:10.2f} {change:+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="visitor counts, comma-separated")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated, from " + ",".join(SCENARIOS))
+    parser.add_argument("--change-rate", type=float, default=20, help="visitor changes per second during the run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="write the results here as JSON")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as --baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    xvfb = start_xvfb() if "render" in scenarios else None
+    spawn = multiprocessing.get_context("spawn")
+    results = {}
+    try:
+        for size in map(int, args.sizes.split(",")):
+            store = VisitorStore()
+            store.seed(size)
+            with StubServer(visitors=store) as server, tempfile.TemporaryDirectory() as tmp:
+                changes = ChangeGenerator(store, args.change_rate).start()
+                options = {"api_url": server.base_url + "/get_visitors.php", "qr_url": server.qr_url,
+                           "repeat": args.repeat, "tmp": tmp}
+                for name in scenarios:
+                    with ProcessPoolExecutor(1, mp_context=spawn) as pool:
+                        result = pool.submit(run_scenario, name, options).result()
+                    results[f"{name}/{size}"] = result
+                    numbers = "  ".join(f"{k} {v:.3g}" if isinstance(v, float) else f"{k} {v}"
+                                        for k, v in result.items())
+                    print(f"  {name + '/' + str(size):16} {numbers}", flush=True)
+                changes.stop()
+    finally:
+        if xvfb is not None:
+            xvfb.kill()
+
+    report = {
+        "meta": {"date": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                 "platform": platform.platform(), "cpus": os.cpu_count(), "change_rate": args.change_rate,
+                 "repeat": args.repeat},
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"Saved as the baseline in {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressions over {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
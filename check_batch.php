@@ -0,0 +1,108 @@
+<?php
+// Batched scan writes from gate_aggregator.py.
+//
+// The aggregator decides every scan itself, from its own copy of the
+// visitors and with the rules of check.php and log_exit.php, and answers
+// the scanner at once.  The writes those decisions imply arrive here in
+// batches and are applied in one transaction, each statement prepared
+// once per batch instead of once per scan:
+//
+//   POST {"gate": "north", "scans": [{"scan_id": "...", "qr": "...",
+//         "visitor_id": 12 or null, "status": "Valid|Expired|Invalid|Exited",
+//         "scanned_at": "Y-m-d H:i:s"}, ...]}
+//
+// status is what goes into logs; Valid also marks the visitor Inside,
+// Expired marks it Expired, Exited records the exit.  A scan whose
+// scan_id is already logged is skipped (the aggregator retries batches
+// that timed out), and a visitor is not updated by a scan older than its
+// last_scan.  With GATE_TOKEN set, requests must send it as X-Gate-Token.
+//
+// Answers {"ok": true, "applied": n, "duplicates": n}.
+
+date_default_timezone_set('Asia/Manila');
+
+require __DIR__ . '/db.php';
+header('Content-Type: application/json');
+
+const MAX_SCANS = 1000;
+
+$token = getenv('GATE_TOKEN');
+if ($token && !hash_equals($token, $_SERVER['HTTP_X_GATE_TOKEN'] ?? '')) {
+    http_response_code(403);
+    exit(json_encode(['ok' => false, 'msg' => 'Bad gate token']));
+}
+if ($_SERVER['REQUEST_METHOD'] !== 'POST') {
+    http_response_code(405);
+    exit(json_encode(['ok' => false, 'msg' => 'POST a JSON batch']));
+}
+
+$batch = json_decode(file_get_contents('php://input'), true);
+$scans = $batch['scans'] ?? null;
+if (!is_array($scans) || count($scans) > MAX_SCANS) {
+    http_response_code(400);
+    exit(json_encode(['ok' => false, 'msg' => 'Expected at most ' . MAX_SCANS . ' scans']));
+}
+$gate = substr((string)($batch['gate'] ?? ''), 0, 64);
+
+// A failed statement must abort the whole batch, on any PHP version
+mysqli_report(MYSQLI_REPORT_ERROR | MYSQLI_REPORT_STRICT);
+
+try {
+    $log = $mysqli->prepare("INSERT IGNORE INTO logs(scan_id, visitor_id, qr_code, status, scanned_at, gate) VALUES(?, ?, ?, ?, ?, ?)");
+    $entered = $mysqli->prepare("UPDATE visitors SET last_status='Inside', last_scan=?, entry_scan=IF(entry_scan IS NULL, ?, entry_scan)
+                                 WHERE visitor_id=? AND (last_scan IS NULL OR last_scan <= ?)");
+    $expired = $mysqli->prepare("UPDATE visitors SET last_status='Expired', last_scan=?
+                                 WHERE visitor_id=? AND (last_scan IS NULL OR last_scan <= ?)");
+    $exited  = $mysqli->prepare("UPDATE visitors SET exit_time=?, last_status='Exited', last_scan=?
+                                 WHERE visitor_id=? AND (last_scan IS NULL OR last_scan <= ?)");
+
+    $applied = 0;
+    $duplicates = 0;
+    $mysqli->begin_transaction();
+    foreach ($scans as $scan) {
+        $scan_id    = (string)($scan['scan_id'] ?? '');
+        $qr         = (string)($scan['qr'] ?? '');
+        $visitor_id = isset($scan['visitor_id']) ? (int)$scan['visitor_id'] : null;
+        $status     = (string)($scan['status'] ?? '');
+        $at         = (string)($scan['scanned_at'] ?? '');
+        if ($scan_id === '' || !in_array($status, ['Valid', 'Expired', 'Invalid', 'Exited'], true)
+                || !DateTime::createFromFormat('Y-m-d H:i:s', $at)) {
+            throw new InvalidArgumentException("Malformed scan: " . json_encode($scan));
+        }
+
+        $log->bind_param('sissss', $scan_id, $visitor_id, $qr, $status, $at, $gate);
+        $log->execute();
+        if ($log->affected_rows === 0) {
+            $duplicates++;
+            continue;
+        }
+        $applied++;
+
+        if ($visitor_id === null) {
+            continue;
+        }
+        if ($status === 'Valid') {
+            $entered->bind_param('ssis', $at, $at, $visitor_id, $at);
+            $entered->execute();
+        } elseif ($status === 'Expired') {
+            $expired->bind_param('sis', $at, $visitor_id, $at);
+            $expired->execute();
+        } elseif ($status === 'Exited') {
+            $exited->bind_param('ssis', $at, $at, $visitor_id, $at);
+            $exited->execute();
+        }
+    }
+    $mysqli->commit();
+
+    echo json_encode(['ok' => true, 'applied' => $applied, 'duplicates' => $duplicates]);
+
+} catch (InvalidArgumentException $e) {
+    $mysqli->rollback();
+    http_response_code(400);
+    echo json_encode(['ok' => false, 'msg' => $e->getMessage()]);
+} catch (Exception $e) {
+    $mysqli->rollback();
+    http_response_code(500);
+    echo json_encode(['ok' => false, 'msg' => 'Database error: ' . $e->getMessage()]);
+}
+?>
@@ -1,20 +1,61 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from PIL import Image, ImageTk
 import requests
 from io import BytesIO
 import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
 import time
-from datetime import datetime, date
-import csv
+from datetime import datetime, date, timedelta
+import base64
+import logging
+import os
+import sqlite3
 import ssl
-import urllib3
-
-# Disable SSL warnings (for testing - remove in production)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-API_URL = "https://qrgate-production.up.railway.app/get_visitors.php"
-UPDATE_INTERVAL = 15  #15 seconds
+from urllib.parse import urlparse
+
+import qr_encoder
+from visitor_engine import API_URL, FEED_FIELDS, STREAM_POLL_INTERVAL, FetchSnapshot, VisitorFeed, VisitorStream, events_url
+from visitor_export import EXPORT_FILETYPES, ExportJob, server_batches, snapshot_batches
+from visitor_record import STATUSES
+from visitor_replica import LocalReplica
+from visitor_sites import Site, SitePool, default_sources, merge_rows
+from qr_cache import LRUCache, DiskThumbnailStore
+from perf_metrics import Metrics, MetricsServer
+
+log = logging.getLogger("qrgate.dashboard")
+
+LAUNCHED_AT = time.perf_counter()  # startup-to-first-paint is measured from here
+
+UPDATE_INTERVAL = 15  # normal poll interval; PollScheduler shortens or stretches it
+VERIFY_INTERVAL = 600  # seconds between digest checks of the rows held against the server's
+EXPORT_PAGE_SIZE = 2000  # rows per request when exporting a date range from the server
+# "local" draws thumbnails with qr_encoder (no network, visitor tokens stay
+# on this machine); "remote" downloads them from QR_API_URL as before.
+# QRGATE_QR_RENDERER / QRGATE_QR_URL override them (benchmarks/suite.py
+# points the URL at its stub server).
+QR_RENDERER = os.environ.get("QRGATE_QR_RENDERER") or "local"
+QR_API_URL = os.environ.get("QRGATE_QR_URL") or "https://api.qrserver.com/v1/create-qr-code/?size=80x80&data={}"
+QR_SIZE = 36  # thumbnail edge in pixels
+QR_MAX_WORKERS = 4  # concurrent QR downloads
+QR_RETRY_BASE = 5  # seconds before a failed QR code is retried; doubles per failure
+QR_RETRY_MAX = 300
+QR_MEMORY_CACHE_SIZE = 512  # PhotoImages kept in memory (must exceed visible rows)
+QR_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".qrgate", "qr_cache")
+QR_DISK_CACHE_BYTES = 20 * 1024 * 1024
+# Visitors seen so far, shown at startup before (or without) the first fetch
+REPLICA_PATH = os.path.join(os.path.expanduser("~"), ".qrgate", "replica.sqlite3")
+REPLICA_FIRST_ROWS = 500  # restored before the window opens; the rest follow from the worker
+REPLICA_BATCH = 1000  # rows per restored snapshot; about one heartbeat budget to apply
+HEARTBEAT_MS = 50  # main-loop tick that drains fetched snapshots and measures UI stalls
+APPLY_BUDGET_MS = 30  # snapshots applied per tick stop after this long; the rest wait a tick
+# Performance overlay (toggled with F12) and, when QRGATE_METRICS_PORT is set,
+# the same numbers in Prometheus text format at http://127.0.0.1:PORT/metrics
+OVERLAY_REFRESH_MS = 500
+METRICS_PORT = int(os.environ.get("QRGATE_METRICS_PORT") or 0)
+ANALYTICS_REFRESH_S = 300  # the analytics tab recomputes today when shown after this long
+OVERLAY_PHASES = ["network", "decode", "normalize", "diff", "status", "index", "digest", "filter",
+                  "stats", "widgets", "layout", "qr_load", "qr_image", "verify"]
 
 # Enhanced color scheme
 COLORS = {
@@ -24,12 +65,30 @@ COLORS = {
     "warning": "#f39c12",
     "light": "#ecf0f1",
     "dark": "#34495e",
+    "muted": "#7f8c8d",
     "white": "#ffffff"
 }
 
 # Column definitions (widths in pixels) - keep in sync for header and rows
 COLUMNS = ["ID", "Visitor Name", "Email", "Purpose", "Host", "QR Code", "Expires At", "Status", "Last Scan", "Duration", "Created At"]
 COLUMN_WIDTHS = [50, 150, 180, 120, 120, 80, 140, 80, 140, 100, 140]
+SITE_COLUMN = "Site"  # added after the others when several sites are shown
+SITE_COLUMN_WIDTH = 100
+QR_COLUMN = 5
+STATUS_COLUMN = 7
+DURATION_COLUMN = 9
+
+# Search runs once typing pauses for this long (ms)
+SEARCH_DEBOUNCE_MS = 150
+
+# The status/duration timer sleeps until the next pass expires or a visible
+# duration reaches its next minute, but never longer than this (ms), so a
+# suspend or clock change is caught up within a minute
+TIMER_MAX_MS = 60000
+
+# Every table row has the same height so the visible slice can be computed
+# from the scroll offset alone (needed by the virtualized table)
+ROW_HEIGHT = 62
 
 # Status colors - Updated to match Arduino LED colors
 STATUS_COLORS = {
@@ -47,34 +106,623 @@ STATUS_TEXT_COLORS = {
     "Inside": "#0c5460"
 }
 
+# Site cards (several sources): Site.health -> text color
+SITE_HEALTH_COLORS = {
+    "ok": COLORS["success"],
+    "retrying": COLORS["warning"],
+    "down": COLORS["danger"]
+}
+
+
+def render_local_thumbnail(qr_code):
+    """PNG thumbnail drawn locally at whole-pixel module size."""
+    return qr_encoder.thumbnail_png(qr_code, QR_SIZE)
+
+
+def fetch_remote_thumbnail(qr_code):
+    """Download the QR image from QR_API_URL and shrink it to a PNG thumbnail."""
+    from PIL import Image  # only the remote renderer needs PIL
+
+    response = requests.get(QR_API_URL.format(qr_code), timeout=5)
+    response.raise_for_status()
+    img = Image.open(BytesIO(response.content))
+    # Reduce QR image size to avoid misalignment
+    resample = getattr(Image, "Resampling", None)
+    resample_filter = Image.Resampling.LANCZOS if resample else Image.ANTIALIAS
+    img = img.resize((QR_SIZE, QR_SIZE), resample_filter)
+    out = BytesIO()
+    img.save(out, "PNG")
+    return out.getvalue()
+
+
+class QRImageLoader:
+    """Renders or downloads QR thumbnails on a small worker pool without blocking the UI.
+
+    ``get`` returns the PhotoImage from the in-memory LRU, or None while the
+    image is not available yet, queueing a load if needed.  Loads try the
+    on-disk PNG store first, so a restart with a warm disk cache makes no
+    network requests.  Requests for a code that is already loading are
+    coalesced, and failed codes are not retried until an exponential
+    backoff has passed.  Finished loads are turned into PhotoImages on the
+    Tk thread by ``drain``.
+    """
+
+    def __init__(self, max_workers=QR_MAX_WORKERS, metrics=None):
+        self.metrics = metrics or Metrics()
+        self.memory = LRUCache(QR_MEMORY_CACHE_SIZE)
+        try:
+            self.disk = DiskThumbnailStore(QR_CACHE_DIR, QR_DISK_CACHE_BYTES)
+        except OSError as e:
+            log.warning("QR disk cache disabled: %s", e)
+            self.disk = None
+        self.in_flight = set()
+        self.failures = {}  # qr_code -> (attempts, retry_at)
+        self.lock = threading.Lock()  # ``rendered``, counted on the worker threads
+        self.rendered = 0  # thumbnails rendered or downloaded (disk cache misses)
+        self.results = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="qr")
+
+    def get(self, qr_code):
+        if not qr_code:
+            return None
+        photo = self.memory.get(qr_code)
+        if photo is not None or qr_code in self.in_flight:
+            return photo
+
+        failure = self.failures.get(qr_code)
+        if failure and time.monotonic() < failure[1]:
+            return None
+
+        self.in_flight.add(qr_code)
+        self.executor.submit(self._load, qr_code)
+        return None
+
+    def _load(self, qr_code):
+        """Worker thread: PNG bytes for one code, from disk or freshly made (no Tk calls)."""
+        # Local and remote thumbnails look different, so they are stored apart
+        disk_key = f"{QR_RENDERER}:{QR_SIZE}:{qr_code}"
+        started = time.perf_counter()
+        try:
+            png = self.disk.get(disk_key) if self.disk else None
+            if png is None:
+                if QR_RENDERER == "local":
+                    png = render_local_thumbnail(qr_code)
+                else:
+                    png = fetch_remote_thumbnail(qr_code)
+                with self.lock:
+                    self.rendered += 1
+                if self.disk:
+                    self.disk.put(disk_key, png)
+            self.metrics.observe("qr_load", (time.perf_counter() - started) * 1000)
+            self.results.put((qr_code, png))
+        except Exception as e:
+            log.warning("Error loading QR code: %s", e)
+            self.results.put((qr_code, None))
+
+    def drain(self):
+        """Turn finished loads into PhotoImages; returns the codes that became available."""
+        loaded = set()
+        while True:
+            try:
+                qr_code, png = self.results.get_nowait()
+            except queue.Empty:
+                return loaded
+
+            self.in_flight.discard(qr_code)
+            if png is None:
+                attempts = self.failures.get(qr_code, (0, 0))[0] + 1
+                delay = min(QR_RETRY_MAX, QR_RETRY_BASE * 2 ** (attempts - 1))
+                self.failures[qr_code] = (attempts, time.monotonic() + delay)
+                continue
+
+            self.failures.pop(qr_code, None)
+            with self.metrics.timed("qr_image"):
+                self.memory.put(qr_code, tk.PhotoImage(data=base64.b64encode(png)))
+            loaded.add(qr_code)
+
+    def stats(self):
+        """Hit/miss/eviction counters for both cache tiers."""
+        with self.lock:
+            rendered = self.rendered
+        return {
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk else None,
+            "rendered": rendered,
+            "failed": len(self.failures),
+        }
+
+
+class PooledRow:
+    """The widgets of one visible table row, reused for whichever visitor scrolls into it."""
+
+    def __init__(self, parent, column_widths=COLUMN_WIDTHS):
+        self.frame = tk.Frame(parent, bg=COLORS["white"], height=ROW_HEIGHT - 1)
+        self.frame.grid_propagate(False)
+        self.visible = False
+        self.cells = []
+        # Last options applied to each widget, so rebinding only touches what changed
+        self.applied = {}
+
+        for i, width in enumerate(column_widths):
+            if i == QR_COLUMN:
+                cell = tk.Label(self.frame, compound="top", fg=COLORS["dark"], justify="center")
+                cell.grid(row=0, column=i, sticky="w", padx=1, pady=5)
+            elif i == STATUS_COLUMN:
+                cell = tk.Label(
+                    self.frame,
+                    font=("Arial", 10, "bold"),
+                    width=max(6, width // 10),
+                    pady=10,
+                    anchor="w",
+                    justify="left"
+                )
+                cell.grid(row=0, column=i, sticky="w", padx=1)
+            else:
+                cell = tk.Label(
+                    self.frame,
+                    fg=COLORS["dark"],
+                    font=("Arial", 10),
+                    width=max(6, width // 10),
+                    pady=10,
+                    wraplength=max(50, width - 20),
+                    anchor="w",
+                    justify="left"
+                )
+                cell.grid(row=0, column=i, sticky="w", padx=1)
+            self.frame.grid_columnconfigure(i, minsize=width, weight=0)
+            self.cells.append(cell)
+
+    def update(self, widget, **options):
+        """Configure ``widget`` with only the options that differ from last time."""
+        applied = self.applied.setdefault(widget, {})
+        changed = {k: v for k, v in options.items() if applied.get(k) != v}
+        if changed:
+            widget.configure(**changed)
+            applied.update(changed)
+        return bool(changed)
+
+    def show(self, slot):
+        if not self.visible:
+            self.frame.place(x=10, y=slot * ROW_HEIGHT, relwidth=1, width=-20, height=ROW_HEIGHT - 1)
+            self.visible = True
+
+    def hide(self):
+        if self.visible:
+            self.frame.place_forget()
+            self.visible = False
+
+    def destroy(self):
+        self.frame.destroy()
+
+
+class VirtualTable:
+    """Scrollable visitor table backed by a fixed pool of row widgets.
+
+    Only as many rows as fit in the viewport are ever created.  Scrolling
+    or replacing the data rebinds the pooled rows to a different slice of
+    ``rows`` through ``bind_row(row, row_num, visitor)``, so memory and
+    redraw cost depend on the window height, not on the visitor count.
+    """
+
+    def __init__(self, parent, bind_row, key, on_near_end=None, metrics=None, column_widths=COLUMN_WIDTHS):
+        self.bind_row = bind_row
+        self.key = key
+        self.column_widths = column_widths
+        self.on_near_end = on_near_end  # called when the last rows come into view
+        self.metrics = metrics or Metrics()
+        self.rows = []
+        self.first = 0
+        self.pool = []
+
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.body = tk.Frame(parent, bg=COLORS["white"])
+        self.body.pack(side="left", fill="both", expand=True)
+        self.body.bind("<Configure>", lambda e: self.resize_pool())
+
+        self.empty_label = tk.Label(
+            self.body,
+            text="No visitors found. Check your connection or try refreshing.",
+            font=("Arial", 14),
+            bg=COLORS["white"],
+            fg=COLORS["dark"],
+            pady=50
+        )
+        self.empty_label.pack()
+
+    @property
+    def visible_count(self):
+        return len(self.pool)
+
+    def set_rows(self, rows):
+        self.rows = rows
+        if rows:
+            self.empty_label.pack_forget()
+        else:
+            self.empty_label.pack()
+        self.scroll_to(self.first)
+
+    def patch(self, rows, keys):
+        """Swap in ``rows`` (same order as before) and rebind only rows whose key is in ``keys``."""
+        self.rows = rows
+        bound = 0
+        with self.metrics.timed("widgets"):
+            for i, row in enumerate(self.pool):
+                index = self.first + i
+                if index < len(rows) and self.key(rows[index]) in keys:
+                    self.bind_row(row, index + 1, rows[index])
+                    bound += 1
+        self.metrics.count("rows_bound", bound)
+
+    def visible_rows(self):
+        """Yield (pooled_row, visitor) for every row currently on screen."""
+        for i, row in enumerate(self.pool):
+            index = self.first + i
+            if index >= len(self.rows):
+                break
+            yield row, self.rows[index]
+
+    def resize_pool(self):
+        """Grow or shrink the pool to exactly cover the viewport height."""
+        height = max(self.body.winfo_height(), ROW_HEIGHT)
+        wanted = height // ROW_HEIGHT + 1
+
+        widgets = 1 + len(self.column_widths)  # a PooledRow's frame and cells
+        while len(self.pool) < wanted:
+            row = PooledRow(self.body, self.column_widths)
+            self.pool.append(row)
+            self.metrics.count("widgets_created", widgets)
+        while len(self.pool) > wanted:
+            self.pool.pop().destroy()
+            self.metrics.count("widgets_destroyed", widgets)
+
+        self.scroll_to(self.first)
+
+    def scroll_to(self, first):
+        max_first = max(0, len(self.rows) - len(self.pool) + 1)
+        self.first = max(0, min(first, max_first))
+        self.redraw()
+
+    def redraw(self):
+        bound = 0
+        with self.metrics.timed("widgets"):
+            for i, row in enumerate(self.pool):
+                index = self.first + i
+                if index < len(self.rows):
+                    self.bind_row(row, index + 1, self.rows[index])
+                    row.show(i)
+                    bound += 1
+                else:
+                    row.hide()
+        self.metrics.count("rows_bound", bound)
+
+        total = len(self.rows)
+        if total:
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + len(self.pool)) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+        if self.on_near_end and self.pool and self.first + len(self.pool) >= total:
+            self.on_near_end()
+
+    def yview(self, *args):
+        """Scrollbar / mousewheel protocol: ("moveto", fraction) or ("scroll", n, what)."""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.rows)))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if len(args) > 2 and args[2] == "pages":
+                step *= max(1, len(self.pool) - 1)
+            self.scroll_to(self.first + step)
+
+
+def shade(value, top, low=COLORS["light"], high=COLORS["primary"]):
+    """Color between ``low`` (0) and ``high`` (``top``), for heatmap cells."""
+    share = min(1.0, value / top) if top else 0.0
+    a = [int(low[i:i + 2], 16) for i in (1, 3, 5)]
+    b = [int(high[i:i + 2], 16) for i in (1, 3, 5)]
+    return "#" + "".join(f"{round(x + (y - x) * share):02x}" for x, y in zip(a, b))
+
+
+class AnalyticsTab:
+    """Occupancy, dwell-time and peak-hour charts over the scan log (visitor_analytics).
+
+    Nothing is read (and NumPy is not imported) until the tab is first
+    shown.  The log is processed on a worker thread; finished days come
+    from the on-disk cache, so a refresh normally only reads today.
+    """
+
+    RANGES = [("7 days", 7), ("30 days", 30), ("Year", 365)]
+
+    def __init__(self, parent, root, api_url=API_URL):
+        self.root = root
+        self.api_url = api_url
+        self.frame = tk.Frame(parent, bg=COLORS["light"])
+        self.analytics = None
+        self.thread = None
+        self.progress = (0, 0)
+        self.error = None
+        self.elapsed_ms = 0.0
+        self.updated_at = None  # monotonic time of the last finished update
+        self.days = 7
+        self.group = tk.StringVar(value="host")
+
+        bar = tk.Frame(self.frame, bg=COLORS["light"])
+        bar.pack(fill="x", padx=20, pady=(15, 5))
+        for label, days in self.RANGES:
+            tk.Button(bar, text=label, command=lambda d=days: self.set_range(d),
+                      bg=COLORS["primary"], fg="white", padx=10).pack(side="left", padx=2)
+        tk.Label(bar, text="Dwell time by:", bg=COLORS["light"], font=("Arial", 10)).pack(side="left", padx=(20, 5))
+        for group in ("host", "purpose"):
+            tk.Radiobutton(bar, text=group.title(), variable=self.group, value=group, command=self.draw,
+                           bg=COLORS["light"]).pack(side="left")
+        tk.Button(bar, text="🔄 Recompute", command=self.refresh,
+                  bg=COLORS["primary"], fg="white", padx=15).pack(side="right", padx=5)
+        self.status = tk.Label(bar, text="", bg=COLORS["light"], fg=COLORS["muted"], font=("Arial", 9))
+        self.status.pack(side="right", padx=10)
+
+        self.occupancy_canvas = self.chart(self.frame, "Visitors inside (peak per interval)", fill="x")
+        lower = tk.Frame(self.frame, bg=COLORS["light"])
+        lower.pack(expand=True, fill="both")
+        self.heatmap_canvas = self.chart(lower, "Entries by weekday and hour", side="left")
+        self.dwell_canvas = self.chart(lower, "Dwell time", side="left")
+
+    def chart(self, parent, title, fill="both", side="top"):
+        box = tk.LabelFrame(parent, text=title, bg=COLORS["white"], fg=COLORS["primary"], font=("Arial", 11, "bold"))
+        box.pack(side=side, expand=fill == "both", fill=fill, padx=20, pady=8)
+        canvas = tk.Canvas(box, bg=COLORS["white"], height=200, highlightthickness=0)
+        canvas.pack(expand=True, fill="both")
+        canvas.bind("<Configure>", lambda e: self.draw())
+        return canvas
+
+    def shown(self):
+        """The tab was selected: compute on first show, and again once ANALYTICS_REFRESH_S passed."""
+        if self.updated_at is None or time.monotonic() - self.updated_at > ANALYTICS_REFRESH_S:
+            self.refresh()
+
+    def set_range(self, days):
+        self.days = days
+        self.draw()
+
+    def refresh(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        if self.analytics is None:
+            try:
+                import visitor_analytics
+            except ImportError as e:
+                self.status.configure(text=f"Analytics need NumPy ({e})", fg=COLORS["danger"])
+                return
+            self.va = visitor_analytics
+            source = visitor_analytics.LogSource(visitor_analytics.logs_url(self.api_url))
+            try:
+                self.analytics = visitor_analytics.LogAnalytics(source)
+            except OSError as e:
+                log.warning("Analytics cache disabled: %s", e)
+                self.analytics = visitor_analytics.LogAnalytics(source, cache_dir=None)
+        self.error = None
+        self.progress = (0, 0)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.root.after(200, self.poll)
+
+    def run(self):
+        """Worker thread: bring the per-day statistics up to date."""
+        started = time.perf_counter()
+        try:
+            self.analytics.update(progress=lambda done, total: setattr(self, "progress", (done, total)))
+        except Exception as e:
+            log.warning("Analytics update failed: %s", e)
+            self.error = str(e)
+        self.elapsed_ms = (time.perf_counter() - started) * 1000
+
+    def poll(self):
+        if self.thread.is_alive():
+            done, total = self.progress
+            self.status.configure(text=f"Reading the scan log: day {done} of {total or '?'}", fg=COLORS["muted"])
+            self.root.after(200, self.poll)
+            return
+        self.updated_at = time.monotonic()
+        if self.error:
+            self.status.configure(text=f"Could not read the scan log: {self.error}", fg=COLORS["danger"])
+        else:
+            self.status.configure(
+                text=f"Updated {datetime.now():%H:%M:%S}: {len(self.analytics.days)} days, "
+                     f"{self.analytics.computed} read from the server, {self.elapsed_ms:.0f} ms",
+                fg=COLORS["muted"])
+        self.draw()
+
+    def draw(self):
+        if self.analytics is None or not self.analytics.days or (self.thread and self.thread.is_alive()):
+            return
+        last = max(self.analytics.days)
+        first = last - timedelta(days=self.days - 1)
+        self.draw_occupancy(first, last)
+        self.draw_grid(self.heatmap_canvas, ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"],
+                       [str(h) for h in range(24)], self.analytics.heatmap(first, last).tolist())
+        names, counts, mean = self.analytics.dwell(self.group.get(), first, last)
+        rows = [f"{name[:16]} ({m:.0f}m avg)" for name, m in zip(names[:10], mean[:10])]
+        self.draw_grid(self.dwell_canvas, rows, self.va.DWELL_LABELS, counts[:10].tolist())
+
+    def draw_occupancy(self, first, last):
+        canvas = self.occupancy_canvas
+        canvas.delete("all")
+        width, height = max(canvas.winfo_width(), 200), max(canvas.winfo_height(), 100)
+        times, inside, peak = self.analytics.occupancy(first, last)
+        if not len(peak):
+            return
+        left, bottom = 50, height - 20
+        points = self.va.downsample_max(peak, width - left - 10)
+        top = max(1, int(points.max()))
+        step = (width - left - 10) / max(1, len(points) - 1)
+        coords = []
+        for i, value in enumerate(points.tolist()):
+            coords += [left + i * step, bottom - (bottom - 10) * value / top]
+        canvas.create_line(left, 10, left, bottom, fill=COLORS["muted"])
+        canvas.create_line(left, bottom, width - 10, bottom, fill=COLORS["muted"])
+        if len(coords) >= 4:
+            canvas.create_line(*coords, fill=COLORS["primary"], width=2)
+        canvas.create_text(left - 5, 10, text=str(top), anchor="ne", font=("Arial", 8))
+        canvas.create_text(left - 5, bottom, text="0", anchor="e", font=("Arial", 8))
+        canvas.create_text(left, bottom + 4, text=f"{first:%b %d}", anchor="nw", font=("Arial", 8))
+        canvas.create_text(width - 10, bottom + 4, text=f"{last:%b %d}  (now {int(inside[-1])} inside)",
+                           anchor="ne", font=("Arial", 8))
+
+    def draw_grid(self, canvas, row_labels, column_labels, values):
+        """Heatmap of ``values`` (a list of rows), shaded by size, with the counts written in."""
+        canvas.delete("all")
+        if not row_labels:
+            canvas.create_text(10, 10, text="No scans in this range", anchor="nw", fill=COLORS["muted"])
+            return
+        width, height = max(canvas.winfo_width(), 200), max(canvas.winfo_height(), 100)
+        left = 8 + 7 * max(len(label) for label in row_labels)
+        cell_w = (width - left - 10) / len(column_labels)
+        cell_h = min(28, (height - 25) / len(row_labels))
+        top = max(max(row) for row in values) or 1
+        for j, label in enumerate(column_labels):
+            canvas.create_text(left + (j + 0.5) * cell_w, 10, text=label, font=("Arial", 8))
+        for i, (label, row) in enumerate(zip(row_labels, values)):
+            y = 20 + i * cell_h
+            canvas.create_text(left - 5, y + cell_h / 2, text=label, anchor="e", font=("Arial", 8))
+            for j, value in enumerate(row):
+                x = left + j * cell_w
+                canvas.create_rectangle(x, y, x + cell_w, y + cell_h, fill=shade(value, top), outline=COLORS["white"])
+                if value and cell_w > 22:
+                    canvas.create_text(x + cell_w / 2, y + cell_h / 2, text=str(value), font=("Arial", 7),
+                                       fill=COLORS["white"] if value > top / 2 else COLORS["dark"])
+
 
 class QRGateDashboard:
-    def __init__(self):
+    def __init__(self, sources=None):
         self.root = tk.Tk()
         self.root.title("QRGate Visitor Dashboard")
         self.root.configure(bg=COLORS["light"])
-        self.root.state('zoomed')
+        try:
+            self.root.state('zoomed')
+        except tk.TclError:
+            self.root.attributes('-zoomed', True)  # X11 has no 'zoomed' state
 
-        self.rows_widgets = []
         self.current_data = []
         self.filtered_data = []
         self.search_var = tk.StringVar()
         self.filter_status = "All"
 
-        # Performance optimization variables
-        self.is_updating = False
-        self.last_qr_cache = {}
-        self.qr_images_cache = {}
-        self.last_data_hash = None
+        # Every refresh phase is timed into one Metrics, shown by the F12 overlay
+        self.metrics = Metrics()
+        self.metrics.collectors.append(self.collect_metrics)
+        self.metrics_server = None
+        self.overlay = None
+        self.layout_started = None  # set while a Tk layout pass is being timed
+        self.qr_loader = QRImageLoader(metrics=self.metrics)
+        # One Site per visitor endpoint (``sources``, else QRGATE_SOURCES, else
+        # API_URL): each has its own replica, status counts, search index,
+        # poll schedule and paging state; feeds run on the site pool
+        self.sites = []
+        for source in sources or default_sources():
+            site = Site(source, metrics=self.metrics, log=logging.getLogger("qrgate.feed").warning,
+                        interval=UPDATE_INTERVAL)
+            site.engine.store = self.open_replica(site, first=not self.sites)
+            # Pushed changes go through the snapshot queue; every (re)connect asks
+            # for a delta refresh of the site to pick up what was missed meanwhile
+            site.stream = VisitorStream(events_url(site.api_url),
+                                        on_snapshot=lambda snapshot, site=site: self.pushed(site, snapshot),
+                                        on_resync=lambda site=site: self.refresh_site(site),
+                                        log=logging.getLogger("qrgate.stream").warning)
+            # The first check waits a full interval, until the replica restore has been applied
+            site.next_verify = time.monotonic() + VERIFY_INTERVAL
+            self.sites.append(site)
+        self.first_paint_ms = None
+        self.timer_after = None  # pending timer_fired (Tk after id) and when it fires
+        self.timer_due = None
+        self.paint_source = "server"  # where the first rows shown came from
+        self.export_job = None
+        self.export_window = None
+        self.search_after = None  # pending debounced search (Tk after id)
         self.auto_refresh = True
-        self.connection_error_count = 0  # Track connection errors
+        self.paused = False  # minimized: nothing is polled
+
+        # Background fetch pipeline: a dispatcher thread hands each site whose
+        # poll is due to the site pool (at most one request in flight per
+        # site), and finished (site, snapshot) pairs reach the Tk thread
+        # through a queue
+        self.snapshots = queue.Queue()
+        self.wake = threading.Event()
+        self.site_pool = SitePool(self.sites)
+        # The Site column only tells rows apart when there is more than one
+        self.columns, self.column_widths = COLUMNS, COLUMN_WIDTHS
+        if len(self.sites) > 1:
+            self.columns = COLUMNS + [SITE_COLUMN]
+            self.column_widths = COLUMN_WIDTHS + [SITE_COLUMN_WIDTH]
+        self.last_heartbeat = time.perf_counter()
+        self.max_stall_ms = 0.0
 
         self.setup_ui()
+        self.restore_replica()
         self.start_updates()
 
+    def open_replica(self, site, first):
+        """The site's LocalReplica, or None if it cannot be opened.
+
+        The first site keeps REPLICA_PATH, so a single-site setup finds the
+        file it always had; the others get one named after the site.
+        """
+        path = REPLICA_PATH if first else os.path.join(os.path.dirname(REPLICA_PATH), f"replica-{site.slug}.sqlite3")
+        try:
+            return LocalReplica(path, site.api_url)
+        except (OSError, sqlite3.Error) as e:
+            log.warning("Local replica of %s disabled: %s", site.name, e)
+            return None
+
+    def restore_replica(self):
+        """Show the newest visitors stored by the last session right away.
+
+        The worker queues the older ones (restore_rest) before its first
+        poll, which is a delta from the stored cursor.
+        """
+        synced = []
+        for site in self.sites:
+            store = site.engine.store
+            if store is None:
+                continue
+            try:
+                site.engine.restore(REPLICA_FIRST_ROWS)
+            except sqlite3.Error as e:
+                log.warning("Could not read the local replica of %s: %s", site.name, e)
+                continue
+            if not site.engine.rows.by_id:
+                continue
+            site.rows = site.engine.rows.rows()
+            if len(site.rows) == REPLICA_FIRST_ROWS:
+                site.restore_floor = int(site.rows[-1].visitor_id)
+            if site.engine.feed.sync_cursor:
+                # Without a cursor the first poll is a full sync that restarts the listing
+                site.page_floor[("All", "")] = store.meta.get("page_floor")
+                site.more_pages[("All", "")] = store.meta.get("more", True)
+            synced.append(store.meta.get('synced_at', 'Never'))
+        if not synced:
+            return
+        self.current_data = merge_rows([site.rows for site in self.sites])
+        self.paint_source = "local replica"
+        self.update_statistics()
+        self.apply_filters()
+        self.status_text.configure(text="Local copy (syncing...)")
+        self.last_update_label.configure(text=f"Last updated: {min(synced)} (local copy)")
+
     def setup_ui(self):
+        # Tabs: the live visitor table, and analytics over the scan log
+        self.notebook = ttk.Notebook(self.root)
+        self.notebook.pack(expand=True, fill="both")
+        visitors_tab = tk.Frame(self.notebook, bg=COLORS["light"])
+        self.notebook.add(visitors_tab, text="Visitors")
+        self.analytics_tab = AnalyticsTab(self.notebook, self.root, self.sites[0].api_url)
+        self.notebook.add(self.analytics_tab.frame, text="Analytics")
+        self.notebook.bind("<<NotebookTabChanged>>", self.tab_changed)
+
         # Main container
-        main_container = tk.Frame(self.root, bg=COLORS["light"])
+        main_container = tk.Frame(visitors_tab, bg=COLORS["light"])
         main_container.pack(expand=True, fill="both", padx=20, pady=20)
 
         # Title header
@@ -91,9 +739,13 @@ class QRGateDashboard:
         title_label.pack()
 
         # Connection info label
+        if len(self.sites) == 1:
+            connected = self.sites[0].api_url
+        else:
+            connected = ", ".join(f"{site.name} ({urlparse(site.api_url).netloc})" for site in self.sites)
         self.connection_info = tk.Label(
             title_frame,
-            text=f"Connected to: {API_URL}",
+            text=f"Connected to: {connected}",
             font=("Arial", 9),
             bg=COLORS["light"],
             fg=COLORS["dark"]
@@ -102,6 +754,7 @@ class QRGateDashboard:
 
         # Statistics Panel
         self.create_stats_panel(main_container)
+        self.create_site_panel(main_container)
 
         # Control Panel (Search, Filter, Export)
         self.create_control_panel(main_container)
@@ -128,37 +781,34 @@ class QRGateDashboard:
         )
         self.status_text.pack(side="left", padx=(5, 0))
 
+        # Scheduler panel: why and when the next poll happens, and the last
+        # connection error (reported here instead of in a modal dialog)
+        self.schedule_text = tk.Label(status_frame, text="", font=("Arial", 9),
+                                      bg=COLORS["light"], fg=COLORS["muted"])
+        self.schedule_text.pack(side="right")
+        self.error_text = tk.Label(main_container, text="", font=("Arial", 9), anchor="w",
+                                   bg=COLORS["light"], fg=COLORS["danger"])
+        self.error_text.pack(fill="x")
+        self.root.bind("<Unmap>", self.window_state_changed)
+        self.root.bind("<Map>", self.window_state_changed)
+
         # Table container
         table_container = tk.Frame(main_container, bg=COLORS["white"], relief="solid", borderwidth=1)
         table_container.pack(expand=True, fill="both", pady=10)
 
-        # Scrollable frame
-        canvas = tk.Canvas(table_container, bg=COLORS["white"], highlightthickness=0)
-        scrollbar = ttk.Scrollbar(table_container, orient="vertical", command=canvas.yview)
-
-        self.scrollable_frame = tk.Frame(canvas, bg=COLORS["white"])
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-
-        canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        # Create table header (stays put while the rows scroll underneath)
+        self.create_header(table_container)
 
-        scrollbar.pack(side="right", fill="y")
-        canvas.pack(side="left", fill="both", expand=True)
+        # Virtualized body: only the rows that fit in the viewport get widgets
+        self.table = VirtualTable(table_container, self.bind_visitor_row, key=lambda v: (v.source, v.visitor_id),
+                                  on_near_end=self.load_more, metrics=self.metrics,
+                                  column_widths=self.column_widths)
 
         def on_mousewheel(event):
-            canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
-
-        canvas.bind_all("<MouseWheel>", on_mousewheel)
-        self.canvas = canvas
-
-        # Create table header
-        self.create_header()
+            self.table.yview("scroll", int(-1 * (event.delta / 120)), "units")
 
-        self.data_frame = tk.Frame(self.scrollable_frame, bg=COLORS["white"])
-        self.data_frame.pack(fill="x")
+        self.root.bind_all("<MouseWheel>", on_mousewheel)
+        self.root.bind("<F12>", lambda e: self.toggle_overlay())
 
         # Footer
         footer_frame = tk.Frame(main_container, bg=COLORS["light"])
@@ -181,6 +831,26 @@ class QRGateDashboard:
         self.stat_valid = self.create_stat_card(stats_frame, "Valid Access", "0", COLORS["success"])
         self.stat_expired = self.create_stat_card(stats_frame, "Expired", "0", COLORS["warning"])
         self.stat_pending = self.create_stat_card(stats_frame, "Inside", "0", COLORS["dark"])
+        self.stat_exited = self.create_stat_card(stats_frame, "Exited", "0", COLORS["danger"])
+        self.stat_invalid = self.create_stat_card(stats_frame, "Invalid", "0", COLORS["muted"])
+
+    def create_site_panel(self, parent):
+        """With several sites, a card per site: its counts, health and last fetch."""
+        self.site_cards = {}
+        if len(self.sites) < 2:
+            return
+        sites_frame = tk.Frame(parent, bg=COLORS["light"])
+        sites_frame.pack(fill="x", pady=(0, 5))
+        for site in self.sites:
+            card = tk.Frame(sites_frame, bg=COLORS["white"], relief="solid", borderwidth=1)
+            card.pack(side="left", padx=10, fill="both", expand=True)
+            tk.Label(card, text=site.name, font=("Arial", 11, "bold"), bg=COLORS["white"],
+                     fg=COLORS["primary"]).pack(anchor="w", padx=8, pady=(6, 0))
+            counts = tk.Label(card, text="", font=("Arial", 10), bg=COLORS["white"], fg=COLORS["dark"])
+            counts.pack(anchor="w", padx=8)
+            health = tk.Label(card, text="connecting...", font=("Arial", 9), bg=COLORS["white"], fg=COLORS["muted"])
+            health.pack(anchor="w", padx=8, pady=(0, 6))
+            self.site_cards[site.name] = (counts, health)
 
     def create_stat_card(self, parent, label, value, color):
         card = tk.Frame(parent, bg=color, relief="raised", borderwidth=2)
@@ -201,7 +871,7 @@ class QRGateDashboard:
 
         search_entry = tk.Entry(control_frame, textvariable=self.search_var, width=30, font=("Arial", 10))
         search_entry.pack(side="left", padx=5)
-        self.search_var.trace("w", lambda *args: self.apply_filters())
+        self.search_var.trace("w", lambda *args: self.search_typed())
 
         # Filter buttons
         tk.Button(control_frame, text="All", command=lambda: self.set_filter("All"),
@@ -231,147 +901,281 @@ class QRGateDashboard:
         tk.Button(control_frame, text="📊 Export CSV", command=self.export_to_csv,
                   bg=COLORS["success"], fg="white", padx=15).pack(side="right", padx=5)
 
+    def tab_changed(self, event):
+        if self.notebook.select() == str(self.analytics_tab.frame):
+            self.analytics_tab.shown()
+
     def toggle_auto_refresh(self):
         self.auto_refresh = not self.auto_refresh
         if self.auto_refresh:
             self.auto_refresh_btn.config(text="⏸️ Auto Refresh", bg=COLORS["warning"])
             self.status_text.config(text="Live Updates")
+            self.wake.set()
         else:
             self.auto_refresh_btn.config(text="▶️ Auto Refresh", bg=COLORS["success"])
             self.status_text.config(text="Updates Paused")
 
     def manual_refresh(self):
         """Manual refresh triggered by user"""
-        if not self.is_updating:
-            self.update_dashboard()
+        for site in self.sites:
+            site.refresh_requested = True
+        self.wake.set()
+
+    def refresh_site(self, site):
+        """Stream thread: the site's push stream (re)connected; catch up with a delta poll."""
+        site.refresh_requested = True
+        self.wake.set()
+
+    def pushed(self, site, snapshot):
+        """Stream thread: queue a pushed change unless updates are paused."""
+        if self.auto_refresh and not self.paused:
+            self.snapshots.put((site, snapshot))
+
+    def window_state_changed(self, event):
+        """Stop polling while minimized; catch up as soon as the window is back."""
+        if event.widget is not self.root:
+            return
+        minimized = self.root.state() == "iconic"
+        if minimized == self.paused:
+            return
+        self.paused = minimized
+        if not minimized:
+            self.manual_refresh()
+        self.update_schedule_panel()
+
+    def update_schedule_panel(self):
+        """Show the schedulers' decisions and the last errors without interrupting anyone."""
+        several = len(self.sites) > 1
+        if not self.auto_refresh:
+            text = "Polling paused"
+        elif self.paused:
+            text = "Polling paused while minimized"
+        else:
+            site = min(self.sites, key=lambda s: s.next_poll)
+            left = max(0, site.next_poll - time.monotonic())
+            text = f"Next poll in {left:.0f} s ({f'{site.name}: ' if several else ''}{site.scheduler.reason})"
+        if self.schedule_text.cget("text") != text:
+            self.schedule_text.configure(text=text)
+
+        errors = []
+        for site in self.sites:
+            scheduler = site.scheduler
+            if not scheduler.failures:
+                continue
+            error = (f"{scheduler.last_error_at:%H:%M:%S}  {f'{site.name}: ' if several else ''}{scheduler.last_error}  "
+                     f"(failure {scheduler.failures}; check that {site.api_url} is reachable)")
+            store = site.engine.store
+            if store is not None and site.rows:
+                error += f"  -  showing the local copy synced {store.meta.get('synced_at', 'in an earlier session')}"
+            errors.append(error)
+        error = "\n".join(errors)
+        if self.error_text.cget("text") != error:
+            self.error_text.configure(text=error)
+
+        for site in self.sites:
+            if site.name not in self.site_cards:
+                break
+            health = site.health
+            if site.last_fetch_ms is None and health == "ok":
+                text = "connecting..."
+            else:
+                text = health if site.last_fetch_ms is None else f"{health}  |  fetch {site.last_fetch_ms:.0f} ms"
+                if site.stream.connected:
+                    text += "  |  push"
+            label = self.site_cards[site.name][1]
+            if label.cget("text") != text:
+                label.configure(text=text, fg=SITE_HEALTH_COLORS[health])
+
+    def search_typed(self):
+        """Debounce the search box: only the text typing pauses on is searched."""
+        if self.search_after is not None:
+            self.root.after_cancel(self.search_after)
+        self.search_after = self.root.after(SEARCH_DEBOUNCE_MS, self.search_settled)
+
+    def search_settled(self):
+        self.search_after = None
+        self.filters_changed()
 
     def set_filter(self, status):
         self.filter_status = status
+        self.filters_changed()
+
+    def filters_changed(self):
+        # Show the matching rows we already have, and ask each server for the
+        # newest matches in case some of them are not loaded yet
         self.apply_filters()
+        key = self.page_key()
+        self.request_page([site for site in self.sites if key not in site.more_pages])
+
+    def page_key(self):
+        return (self.filter_status, self.search_var.get().strip())
+
+    def request_page(self, sites):
+        status, q = key = self.page_key()
+        for site in sites:
+            site.page_loading = True
+            site.page_requests.put({
+                'status': status if status != "All" else None,
+                'q': q or None,
+                'before_id': site.page_floor.get(key),
+                'key': key,
+            })
+        if sites:
+            self.wake.set()
+
+    def load_more(self):
+        """Infinite scroll: fetch the next page of history when the end comes into view."""
+        key = self.page_key()
+        self.request_page([site for site in self.sites
+                           if not site.page_loading and site.more_pages.get(key, False)])
 
     def apply_filters(self):
         search_text = self.search_var.get().lower()
+        now = datetime.now()
+
+        with self.metrics.timed("filter"):
+            # Apply search filter (each site's index covers its own rows)
+            if search_text:
+                visitors = merge_rows([site.engine.search.search(search_text, site.rows) for site in self.sites])
+            else:
+                visitors = self.current_data
 
-        self.filtered_data = []
-        for visitor in self.current_data:
             # Apply status filter
             if self.filter_status != "All":
-                visitor_status = self.get_visitor_status(visitor)
-                if visitor_status != self.filter_status:
-                    continue
-
-            # Apply search filter
-            if search_text:
-                searchable_text = f"{visitor.get('full_name', '')} {visitor.get('email', '')} {visitor.get('purpose', '')} {visitor.get('host', '')}".lower()
-                if search_text not in searchable_text:
-                    continue
+                visitors = [v for v in visitors if v.status_at(now) == self.filter_status]
 
-            self.filtered_data.append(visitor)
+            self.filtered_data = list(visitors)
 
         self.display_data(self.filtered_data)
 
-    def get_visitor_status(self, visitor):
-        """Determine visitor status based on last_status and expiry"""
-        last_status_raw = visitor.get('last_status')
-        last_status = str(last_status_raw or "").strip().lower()
-
-        expiry_str = visitor.get('expiry_at', '')
-        last_scan = visitor.get('last_scan')
-
-        # Check if expired
-        try:
-            expiry = datetime.strptime(expiry_str, '%Y-%m-%d %H:%M:%S')
-            now = datetime.now()
-            is_expired = expiry < now
-        except:
-            is_expired = False
-
-        exit_statuses = ['exited', 'exit', 'left', 'out', 'exited_by']
-
-        # PRIORITY 1: Check last_status first (most reliable)
-        if last_status == "invalid":
-            return "Invalid"
-        
-        if last_status in exit_statuses:
-            return "Exited"
-        
-        if last_status == "inside":
-            # Only show Inside if not expired and has a scan time
-            if is_expired:
-                return "Expired"
-            if last_scan and last_scan not in ["None", "", None]:
-                return "Inside"
-        
-        if last_status == "expired":
-            return "Expired"
-
-        # PRIORITY 2: Check expiry date
-        if is_expired:
-            return "Expired"
-
-        # PRIORITY 3: Check if they have scanned in (but status is not explicitly set)
-        if last_scan and last_scan not in ["None", "", None] and last_status not in ["invalid", "expired"]:
-            return "Inside"
+    def export_to_csv(self):
+        """Export dialog: the loaded rows or a date range paged from the server,
+        written on a worker thread with progress and cancellation."""
+        if self.export_window is not None and self.export_window.winfo_exists():
+            self.export_window.lift()
+            return
 
-        # Default: Valid (not scanned yet, not expired)
-        return "Valid"
+        win = tk.Toplevel(self.root)
+        win.title("Export Visitors")
+        win.configure(bg=COLORS["light"])
+        win.resizable(False, False)
+        self.export_window = win
+
+        source = tk.StringVar(value="loaded")
+        tk.Radiobutton(win, text=f"Loaded rows ({len(self.current_data)})", variable=source, value="loaded",
+                       bg=COLORS["light"]).grid(row=0, column=0, columnspan=4, sticky="w", padx=10, pady=(10, 2))
+        tk.Radiobutton(win, text="All visitors on the server registered between:", variable=source, value="server",
+                       bg=COLORS["light"]).grid(row=1, column=0, columnspan=3, sticky="w", padx=10)
+        site_name = tk.StringVar(value=self.sites[0].name)
+        if len(self.sites) > 1:
+            tk.OptionMenu(win, site_name, *(site.name for site in self.sites)).grid(row=1, column=3, sticky="w",
+                                                                                    padx=(0, 10))
+
+        today = date.today()
+        date_from = tk.Entry(win, width=12)
+        date_from.insert(0, today.replace(day=1).isoformat())
+        date_to = tk.Entry(win, width=12)
+        date_to.insert(0, today.isoformat())
+        tk.Label(win, text="From", bg=COLORS["light"]).grid(row=2, column=0, padx=(30, 2), sticky="e")
+        date_from.grid(row=2, column=1, sticky="w")
+        tk.Label(win, text="To", bg=COLORS["light"]).grid(row=2, column=2, padx=(10, 2), sticky="e")
+        date_to.grid(row=2, column=3, sticky="w", padx=(0, 10))
+
+        progress = ttk.Progressbar(win, length=320, mode="determinate", maximum=100)
+        progress.grid(row=3, column=0, columnspan=4, padx=10, pady=(12, 2))
+        status = tk.Label(win, text="CSV, .csv.gz, Parquet or Arrow (by file extension)",
+                          bg=COLORS["light"], fg=COLORS["dark"], font=("Arial", 9))
+        status.grid(row=4, column=0, columnspan=4, padx=10)
+
+        def start():
+            if source.get() == "server":
+                try:
+                    first = datetime.strptime(date_from.get().strip(), "%Y-%m-%d").date()
+                    last = datetime.strptime(date_to.get().strip(), "%Y-%m-%d").date()
+                except ValueError:
+                    messagebox.showerror("Export", "Dates must look like 2025-01-31.", parent=win)
+                    return
+                params = {'created_from': first.isoformat(), 'created_to': last.isoformat(), 'fields': FEED_FIELDS}
+                site = next(site for site in self.sites if site.name == site_name.get())
+                feed = VisitorFeed(site.api_url, timeout=site.source.timeout)
+                batches = server_batches(feed.fetch, params, EXPORT_PAGE_SIZE)
+                total = None
+                default_filename = f"visitors_{first:%Y%m%d}_{last:%Y%m%d}.csv"
+                if len(self.sites) > 1:
+                    default_filename = f"visitors_{site.slug}_{first:%Y%m%d}_{last:%Y%m%d}.csv"
+            else:
+                if not self.current_data:
+                    messagebox.showwarning("No Data", "No data to export!", parent=win)
+                    return
+                records = list(self.current_data)
+                batches = snapshot_batches(records)
+                total = len(records)
+                default_filename = f"visitors_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+
+            filename = filedialog.asksaveasfilename(
+                parent=win,
+                title="Export Visitors",
+                defaultextension=".csv",
+                filetypes=EXPORT_FILETYPES,
+                initialfile=default_filename
+            )
+            if not filename:
+                return
 
+            self.export_job = ExportJob(filename, batches, total).start()
+            start_btn.configure(state="disabled")
+            if total is None:
+                progress.configure(mode="indeterminate")
+                progress.start(50)
+            else:
+                progress.configure(mode="determinate", value=0)
+            self.root.after(200, poll)
+
+        def poll():
+            job = self.export_job
+            if not win.winfo_exists():
+                return  # closed; close() already cancelled the job
+            if job.total:
+                progress.configure(value=100 * job.rows_written / job.total)
+            status.configure(text=f"{job.rows_written} rows written")
+            if not job.done:
+                self.root.after(200, poll)
+                return
+            progress.stop()
+            progress.configure(mode="determinate")
+            start_btn.configure(state="normal")
+            if job.error:
+                status.configure(text="Export failed")
+                messagebox.showerror("Export Failed", f"Error: {job.error}", parent=win)
+            elif job.cancelled.is_set():
+                status.configure(text="Export cancelled")
+            else:
+                progress.configure(value=100)
+                status.configure(text=f"Exported {job.rows_written} rows to {os.path.basename(job.path)}")
 
-    def export_to_csv(self):
-        if not self.current_data:
-            messagebox.showwarning("No Data", "No data to export!")
-            return
+        def cancel():
+            if self.export_job is not None and not self.export_job.done:
+                self.export_job.cancel()
+            else:
+                win.destroy()
 
-        # Ask user for filename
-        default_filename = f"visitors_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        filename = filedialog.asksaveasfilename(
-            title="Export CSV File",
-            defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-            initialfile=default_filename
-        )
+        start_btn = tk.Button(win, text="Export...", command=start, bg=COLORS["success"], fg="white", padx=15)
+        start_btn.grid(row=5, column=0, columnspan=2, pady=10)
+        tk.Button(win, text="Cancel", command=cancel, bg=COLORS["danger"], fg="white",
+                  padx=15).grid(row=5, column=2, columnspan=2, pady=10)
 
-        if not filename:
-            return
+        def close():
+            if self.export_job is not None and not self.export_job.done:
+                self.export_job.cancel()
+            win.destroy()
 
-        try:
-            with open(filename, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                # include duration column
-                writer.writerow(
-                    ["ID", "Name", "Email", "Phone", "Purpose", "Host", "QR Code", "Status", "Expires At", "Last Scan", "Duration",
-                     "Created At"])
-
-                for visitor in self.current_data:
-                    duration = self.format_duration(
-                        last_scan=visitor.get('entry_scan') or visitor.get('last_scan'),
-                        exit_ts=visitor.get('exit_time'),
-                        last_status=self.get_visitor_status(visitor)
-                    )
-                    writer.writerow([
-                        visitor.get('visitor_id', ''),
-                        visitor.get('full_name', ''),
-                        visitor.get('email', ''),
-                        visitor.get('phone', ''),
-                        visitor.get('purpose', ''),
-                        visitor.get('host', ''),
-                        visitor.get('qr_code', ''),
-                        self.get_visitor_status(visitor),
-                        visitor.get('expiry_at', ''),
-                        visitor.get('last_scan', ''),
-                        duration,
-                        visitor.get('created_at', '')
-                    ])
-
-            messagebox.showinfo("Export Successful", f"Data exported to:\n{filename}")
-        except Exception as e:
-            messagebox.showerror("Export Failed", f"Error: {str(e)}")
+        win.protocol("WM_DELETE_WINDOW", close)
 
-    def create_header(self):
-        columns = COLUMNS
-        column_widths = COLUMN_WIDTHS
+    def create_header(self, parent):
+        columns = self.columns
+        column_widths = self.column_widths
 
-        header_frame = tk.Frame(self.scrollable_frame, bg=COLORS["primary"])
+        header_frame = tk.Frame(parent, bg=COLORS["primary"])
         header_frame.pack(fill="x", padx=10, pady=(10, 0))
 
         for i, (col, width) in enumerate(zip(columns, column_widths)):
@@ -387,177 +1191,269 @@ class QRGateDashboard:
             )
             lbl.grid(row=0, column=i, sticky="w", padx=1)
             header_frame.grid_columnconfigure(i, minsize=width, weight=0)
-    def display_data(self, data):
-        # Clear old rows
-        for child in self.data_frame.winfo_children():
-            child.destroy()
-        self.rows_widgets.clear()
-
-        if not data:
-            no_data_label = tk.Label(
-                self.data_frame,
-                text="No visitors found. Check your connection or try refreshing.",
-                font=("Arial", 14),
-                bg=COLORS["white"],
-                fg=COLORS["dark"],
-                pady=50
-            )
-            no_data_label.pack()
-            return
 
-        # Batch create all rows at once (defer image loading)
-        for r, visitor in enumerate(data):
-            self.create_visitor_row(r + 1, visitor)
-        
-        # Force UI update after all rows created
-        self.data_frame.update_idletasks()
-
-    def fetch_data(self):
-        try:
-            # Add detailed error logging
-            print(f"Attempting to fetch from: {API_URL}")
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
-                "Accept": "application/json, text/javascript, */*; q=0.01",
-                "Referer": API_URL
-            }
-            response = requests.get(API_URL, headers=headers, timeout=15, verify=False)
-            print(f"Response status code: {response.status_code}")
-            print(f"Response headers: {response.headers}")
-            response.raise_for_status()
-
-            data = response.json()
-            
-            print(f"Response data type: {type(data)}")
-            print(f"Response data keys: {data.keys() if isinstance(data, dict) else 'N/A'}")
-
-            # Reset error count on success
-            self.connection_error_count = 0
-
-            if isinstance(data, dict) and 'data' in data:
-                print(f"Found {len(data['data'])} visitors")
-                return data['data']
-            elif isinstance(data, list):
-                print(f"Found {len(data)} visitors (list format)")
-                return data
-            else:
-                print(f"Unexpected data format: {data}")
-                return []
-
-        except requests.exceptions.SSLError as e:
-            self.connection_error_count += 1
-            print(f"SSL Error: {e}")
-            self.show_connection_error(f"SSL Certificate Error. Try accessing the website in your browser first.")
-            return []
-        except requests.exceptions.ConnectionError as e:
-            self.connection_error_count += 1
-            print(f"Connection Error: {e}")
-            self.show_connection_error(f"Cannot connect to server. Check your internet connection.")
-            return []
-        except requests.exceptions.Timeout as e:
-            self.connection_error_count += 1
-            print(f"Timeout Error: {e}")
-            self.show_connection_error(f"Server took too long to respond.")
-            return []
-        except requests.exceptions.HTTPError as e:
-            self.connection_error_count += 1
-            print(f"HTTP Error: {e}")
-            self.show_connection_error(f"Server error: {e}")
-            return []
-        except ValueError as e:
-            self.connection_error_count += 1
-            print(f"JSON Decode Error: {e}")
-            self.show_connection_error(f"Invalid response from server.")
-            return []
-        except Exception as e:
-            self.connection_error_count += 1
-            print(f"Unexpected error fetching data: {e}")
-            self.show_connection_error(f"Error: {str(e)}")
-            return []
-
-    def show_connection_error(self, message):
-        """Update UI to show connection error"""
-        self.root.after(0, lambda: self.status_text.config(
-            text=f"Connection Error ({self.connection_error_count})",
+    def display_data(self, data):
+        # The table keeps its own widget pool; we only hand it the rows
+        self.table.set_rows(data)
+        if self.first_paint_ms is None and data:
+            self.first_paint_ms = 0.0  # measured once Tk has drawn the rows
+            self.root.after_idle(self.note_first_paint)
+
+    def note_first_paint(self):
+        self.first_paint_ms = (time.perf_counter() - LAUNCHED_AT) * 1000
+        self.metrics.set_gauge("first_paint_ms", round(self.first_paint_ms))
+        log.info("First paint %.0f ms after launch (%d visitors from the %s)",
+                 self.first_paint_ms, len(self.current_data), self.paint_source)
+
+    def show_connection_error(self, site, message):
+        """Update UI to show connection error; the details go to the scheduler panel"""
+        self.status_text.config(
+            text=f"Connection Error ({site.error_count})" if len(self.sites) == 1 else
+                 f"Connection Error: {site.name} ({site.error_count})",
             fg=COLORS["danger"]
-        ))
-        
-        # Show error dialog only on first few errors
-        if self.connection_error_count <= 3:
-            self.root.after(0, lambda: messagebox.showerror(
-                "Connection Error",
-                f"{message}\n\nURL: {API_URL}\n\nMake sure:\n1. The website is accessible\n2. get_visitors.php exists\n3. Database is configured correctly"
-            ))
-
-    def calculate_data_hash(self, data):
-        """Create a simple hash to detect data changes"""
-        import hashlib
-        data_str = str([(v.get('visitor_id'), v.get('last_scan')) for v in data])
-        return hashlib.md5(data_str.encode()).hexdigest()
-
-    def update_dashboard(self):
-        if self.is_updating:
-            return
+        )
+        log.warning("Connection error (%s): %s", site.name, message)
+        self.update_schedule_panel()
 
-        self.is_updating = True
+    def update_dashboard(self, site, snapshot):
+        """Apply a snapshot the worker prepared for ``site``, on the Tk thread."""
         try:
             # Visual feedback
             current_color = self.status_dot.cget("fg")
             new_color = COLORS["warning"] if current_color == COLORS["success"] else COLORS["success"]
             self.status_dot.configure(fg=new_color)
 
-            # Fetch new data
-            new_data = self.fetch_data()
+            if snapshot.page is not None:
+                self.note_page(site, snapshot)
 
-            # Check if we got data
-            if not new_data and self.connection_error_count > 0:
+            if snapshot.error:
+                site.error_count += 1
+                self.show_connection_error(site, snapshot.error)
                 self.status_dot.configure(fg=COLORS["danger"])
-                self.status_text.configure(text="Connection Failed", fg=COLORS["danger"])
                 return
-
-            # Check if data actually changed
-            new_hash = self.calculate_data_hash(new_data)
-            data_changed = new_hash != self.last_data_hash
-
-            if data_changed or not self.current_data:
-                # New/changed data - update everything
-                self.last_data_hash = new_hash
-                self.current_data = new_data
+            site.error_count = 0
+
+            # Merge into (or diff against) the site's replica and patch only what
+            # changed; live durations are ticked separately by timer_fired()
+            diff = site.engine.apply(snapshot)
+            if diff:
+                site.rows = site.engine.rows.rows()
+                self.current_data = merge_rows([s.rows for s in self.sites])
                 self.update_statistics()
-
-            # ALWAYS redraw so duration ticks live for Inside visitors
-            self.apply_filters()
-
+                self.apply_changes(site, diff)
+                self.arm_timer(site.engine.counts.next_change)
+                self.time_layout()
+            if snapshot.restored:
+                return  # nothing was fetched; the footer keeps describing the server
+
+            # Stalls measured since the previous refresh include the cost of
+            # applying that refresh, which is what this number is meant to show
             current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.last_update_label.configure(text=f"Last updated: {current_time}")
+            self.last_update_label.configure(
+                text=f"Last updated: {current_time}{f' ({site.name})' if len(self.sites) > 1 else ''}"
+                     f"  |  fetch {snapshot.fetch_ms:.0f} ms, "
+                     f"{snapshot.fetch_bytes / 1024:.1f} KB{' (not modified)' if snapshot.not_modified else ''}"
+                     f"  |  max UI stall {self.max_stall_ms:.0f} ms"
+                     f"{f'  |  first paint {self.first_paint_ms:.0f} ms' if self.first_paint_ms else ''}"
+            )
+            self.max_stall_ms = 0.0
 
-            self.status_dot.configure(fg=COLORS["success"])
-            self.status_text.configure(text="Live Updates", fg=COLORS["dark"])
+            failing = [s.name for s in self.sites if s.error_count]
+            self.status_dot.configure(fg=COLORS["warning"] if failing else COLORS["success"])
+            if failing:
+                text = f"Live Updates ({', '.join(failing)} failing)"
+            else:
+                text = "Live Updates (push)" if all(s.stream.connected for s in self.sites) else "Live Updates"
+            self.status_text.configure(text=text, fg=COLORS["dark"])
 
-        except Exception as e:
-            import traceback
-            print("===== UPDATE ERROR START =====")
-            traceback.print_exc()
-            print("===== UPDATE ERROR END =====")
+        except Exception:
+            log.exception("Update error")
             self.status_dot.configure(fg=COLORS["danger"])
             self.status_text.configure(text="Update Error", fg=COLORS["danger"])
 
+    def note_page(self, site, snapshot):
+        """Remember how far the site's paged listing for this filter has been read."""
+        if snapshot.delta:
+            site.page_loading = False
+        if snapshot.error:
+            return
+        ids = [int(v.visitor_id) for v in snapshot.visitors if v.visitor_id.isdigit()]
+        if ids:
+            floor = site.page_floor.get(snapshot.page)
+            site.page_floor[snapshot.page] = min(ids) if floor is None else min(floor, min(ids))
+        site.more_pages[snapshot.page] = snapshot.more
+        if snapshot.page == ("All", "") and site.engine.store is not None:
+            site.engine.store.set_meta(page_floor=site.page_floor.get(snapshot.page), more=snapshot.more)
+
+    def heartbeat(self):
+        """Main-loop tick: record how late we ran (UI stall) and apply any finished fetch."""
+        now = time.perf_counter()
+        stall = (now - self.last_heartbeat) * 1000 - HEARTBEAT_MS
+        self.max_stall_ms = max(self.max_stall_ms, stall)
+        self.last_heartbeat = now
+
+        # Every snapshot is applied in order: deltas and pages only make sense on
+        # top of the ones before them, so none can be skipped as stale. A
+        # backlog (the replica restore) is spread over several ticks.
+        deadline = now + APPLY_BUDGET_MS / 1000
+        try:
+            while time.perf_counter() < deadline:
+                self.update_dashboard(*self.snapshots.get_nowait())
+        except queue.Empty:
+            pass
+
+        loaded = self.qr_loader.drain()
+        if loaded:
+            self.refresh_qr_cells(loaded)
+        self.update_schedule_panel()
+        self.metrics.set_gauge("ui_stall_ms", round(max(0.0, stall), 1))
+
+        self.root.after(HEARTBEAT_MS, self.heartbeat)
+
+    def apply_changes(self, site, diff):
+        filtering = self.filter_status != "All" or self.search_var.get()
+        if diff.structural or filtering:
+            # Membership or order may have changed; the table only rebinds visible rows
+            self.apply_filters()
+        else:
+            self.filtered_data = self.current_data
+            self.table.patch(self.filtered_data, {(site.name, vid) for vid in diff.changed})
+
+    def arm_timer(self, due):
+        """Make sure timer_fired runs once ``due`` (a datetime, or None for never) has passed."""
+        if due is None or (self.timer_due is not None and self.timer_due <= due):
+            return
+        now = datetime.now()
+        delay_ms = min(TIMER_MAX_MS, max(0, int((due - now).total_seconds() * 1000) + 1))
+        if self.timer_after is not None:
+            self.root.after_cancel(self.timer_after)
+        self.timer_due = min(due, now + timedelta(milliseconds=delay_ms))
+        self.timer_after = self.root.after(delay_ms, self.timer_fired)
+
+    def timer_fired(self):
+        """Flip the statuses that are due and tick the visible durations whose minute changed."""
+        self.timer_after = self.timer_due = None
+        now = datetime.now()
+        try:
+            changed = {(site.name, vid) for site in self.sites
+                       for vid in site.engine.counts.refresh(site.engine.rows.by_id, now)}
+            if changed:
+                self.update_statistics()
+                if self.filter_status != "All":
+                    self.apply_filters()  # expired passes leave the Valid/Inside views
+                else:
+                    self.table.patch(self.filtered_data, changed)
+            for row, visitor in self.table.visible_rows():
+                if visitor.status_at(now) == "Inside":
+                    row.update(row.cells[DURATION_COLUMN], text=visitor.duration_text(now))
         finally:
-            self.is_updating = False
+            for site in self.sites:
+                self.arm_timer(site.engine.counts.next_change)
+            for row, visitor in self.table.visible_rows():
+                self.arm_timer(visitor.next_duration_tick(now))
 
     def update_statistics(self):
-        total = len(self.current_data)
-        valid = len([v for v in self.current_data if self.get_visitor_status(v) == "Valid"])
-        expired = len([v for v in self.current_data if self.get_visitor_status(v) == "Expired"])
-        pending = len([v for v in self.current_data if self.get_visitor_status(v) == "Inside"])
-
-        self.stat_total.configure(text=str(total))
-        self.stat_valid.configure(text=str(valid))
-        self.stat_expired.configure(text=str(expired))
-        self.stat_pending.configure(text=str(pending))
+        # Counts are maintained incrementally by each site's engine; this only adds them up and shows them
+        with self.metrics.timed("stats"):
+            counts = {status: sum(site.engine.counts.counts[status] for site in self.sites) for status in STATUSES}
+            self.stat_total.configure(text=str(sum(site.engine.counts.total() for site in self.sites)))
+            self.stat_valid.configure(text=str(counts["Valid"]))
+            self.stat_expired.configure(text=str(counts["Expired"]))
+            self.stat_pending.configure(text=str(counts["Inside"]))
+            self.stat_exited.configure(text=str(counts["Exited"]))
+            self.stat_invalid.configure(text=str(counts["Invalid"]))
+            for site in self.sites:
+                if site.name in self.site_cards:
+                    site_counts = site.engine.counts.counts
+                    self.site_cards[site.name][0].configure(
+                        text=f"{site.engine.counts.total()} visitors  |  {site_counts['Inside']} inside  |  "
+                             f"{site_counts['Valid']} valid  |  {site_counts['Expired']} expired")
+
+    def time_layout(self):
+        """Time the geometry and redraw work Tk does for the widgets just changed.
+
+        Tk runs its layout and redisplay as idle callbacks, in the order they
+        were queued, so one queued after them runs when they are done.
+        """
+        if self.layout_started is None:
+            self.layout_started = time.perf_counter()
+            self.root.after_idle(self.note_layout)
+
+    def note_layout(self):
+        self.metrics.observe("layout", (time.perf_counter() - self.layout_started) * 1000)
+        self.layout_started = None
+
+    def collect_metrics(self, metrics):
+        """Sampled values for the overlay and /metrics (may run on the metrics server thread)."""
+        qr = self.qr_loader.stats()
+        memory = qr["memory"]
+        lookups = memory["hits"] + memory["misses"]
+        metrics.set_gauge("qr_memory_hit_ratio", round(memory["hits"] / lookups, 3) if lookups else 0)
+        disk = qr["disk"]
+        if disk:
+            lookups = disk["hits"] + disk["misses"]
+            metrics.set_gauge("qr_disk_hit_ratio", round(disk["hits"] / lookups, 3) if lookups else 0)
+        metrics.set_gauge("qr_rendered", qr["rendered"])
+        metrics.set_gauge("qr_failed", qr["failed"])
+        metrics.set_gauge("visitors_loaded", len(self.current_data))
+        metrics.set_gauge("visitors_shown", len(self.filtered_data))
+        metrics.set_gauge("row_pool", self.table.visible_count)
+        metrics.set_gauge("snapshots_queued", self.snapshots.qsize())
+        if len(self.sites) > 1:
+            for site in self.sites:
+                metrics.set_gauge(f"site_{site.slug}_failures", site.scheduler.failures)
+                metrics.set_gauge(f"site_{site.slug}_visitors", len(site.rows))
+
+    def toggle_overlay(self):
+        """F12: show or hide the performance overlay over the top right of the window."""
+        if self.overlay is not None:
+            self.overlay.destroy()
+            self.overlay = None
+            return
+        self.overlay = tk.Label(self.root, font=("Courier", 9), justify="left", anchor="nw",
+                                bg="#111111", fg="#9fe870", padx=8, pady=6)
+        self.overlay.place(relx=1.0, x=-12, y=12, anchor="ne")
+        self.update_overlay()
 
-    def create_visitor_row(self, row_num, visitor):
-        status = self.get_visitor_status(visitor)
+    def update_overlay(self):
+        if self.overlay is None:
+            return
+        self.metrics.collect()
+        phases = self.metrics.phases()
+        lines = [f"{'phase':<10}{'last':>8}{'mean':>8}{'p95':>8}{'max':>8}{'n':>7}"]
+        for phase in OVERLAY_PHASES:
+            p = phases.get(phase)
+            if p:
+                lines.append(f"{phase:<10}{p['last']:8.1f}{p['mean']:8.1f}{p['p95']:8.1f}{p['max']:8.1f}{p['count']:7}")
+            else:
+                lines.append(f"{phase:<10}{'-':>8}")
+        counters, gauges = dict(self.metrics.counters), dict(self.metrics.gauges)
+        lines.append("")
+        lines.append(f"widgets +{counters.get('widgets_created', 0)} -{counters.get('widgets_destroyed', 0)}"
+                     f"  rows bound {counters.get('rows_bound', 0)}")
+        lines.append(f"QR hits: memory {gauges.get('qr_memory_hit_ratio', 0):.0%}"
+                     f"  disk {gauges.get('qr_disk_hit_ratio', 0):.0%}  rendered {gauges.get('qr_rendered', 0)}"
+                     f"  failed {gauges.get('qr_failed', 0)}")
+        requests_made = counters.get('feed_requests', 0)
+        lines.append(f"feed: {requests_made} requests, {counters.get('feed_not_modified', 0)} not modified, "
+                     f"{counters.get('feed_bytes', 0) / 1024:.0f} KB")
+        lines.append(f"rows {gauges.get('visitors_shown', 0)}/{gauges.get('visitors_loaded', 0)}"
+                     f"  queued {gauges.get('snapshots_queued', 0)}  stall {gauges.get('ui_stall_ms', 0):.0f} ms")
+        if len(self.sites) > 1:
+            for site in self.sites:
+                fetch = "-" if site.last_fetch_ms is None else f"{site.last_fetch_ms:.0f} ms"
+                lines.append(f"{site.name[:10]:<10} {site.health:<9}{fetch:>8}  rows {len(site.rows)}")
+        if self.metrics_server is not None:
+            lines.append(self.metrics_server.url)
+        self.overlay.configure(text="\n".join(lines))
+        self.overlay.lift()
+        self.root.after(OVERLAY_REFRESH_MS, self.update_overlay)
+
+    def bind_visitor_row(self, row, row_num, visitor):
+        """Point a pooled table row at ``visitor`` (row_num is 1-based)."""
+        now = datetime.now()
+        status = visitor.status_at(now)
+        self.arm_timer(visitor.next_duration_tick(now))
 
         bg_color = STATUS_COLORS.get(status, "#eaeded")
         status_text_color = STATUS_TEXT_COLORS.get(status, "#7f8c8d")
@@ -565,17 +1461,9 @@ class QRGateDashboard:
         if row_num % 2 == 0:
             bg_color = self.lighten_color(bg_color)
 
-        row_frame = tk.Frame(self.data_frame, bg=bg_color)
-        row_frame.pack(fill="x", padx=10, pady=1)
+        row.update(row.frame, bg=bg_color)
 
-        row_widgets = []
-
-        # Duration = time inside only. Use computed status so Expired always shows '-'
-        duration_str = self.format_duration(
-            last_scan=visitor.get('entry_scan') or visitor.get('last_scan'),
-            exit_ts=visitor.get('exit_time'),
-            last_status=self.get_visitor_status(visitor)
-        )
+        expires, last_scan, created = visitor.display_times()
 
         columns_data = [
             str(visitor.get('visitor_id', '')),
@@ -584,119 +1472,37 @@ class QRGateDashboard:
             visitor.get('purpose', ''),
             visitor.get('host', ''),
             '',
-            self.format_datetime(visitor.get('expiry_at', '')),
+            expires,
             status,
-            self.format_datetime(visitor.get('last_scan', '')) or "Never",
-            duration_str,
-            self.format_datetime(visitor.get('created_at', ''))
+            last_scan,
+            visitor.duration_text(now),
+            created
         ]
-
-        column_widths = COLUMN_WIDTHS
-
-        for i, (data, width) in enumerate(zip(columns_data, column_widths)):
-            if i == 5:   # QR code cell
-                self.create_qr_widget(row_frame, i, visitor.get('qr_code', ''), bg_color, row_widgets)
-            elif i == 7:
-                lbl = tk.Label(
-                    row_frame,
-                    text=data,
-                    bg=bg_color,
-                    fg=status_text_color,
-                    font=("Arial", 10, "bold"),
-                    width=max(6, width // 10),
-                    pady=10,
-                    anchor="w",
-                    justify="left"
-                )
-                lbl.grid(row=0, column=i, sticky="w", padx=1)
-                row_widgets.append(lbl)
+        if len(self.sites) > 1:
+            columns_data.append(visitor.source or '')
+
+        for i, (data, cell) in enumerate(zip(columns_data, row.cells)):
+            if i == QR_COLUMN:
+                self.bind_qr_cell(row, cell, visitor.get('qr_code', ''), bg_color)
+            elif i == STATUS_COLUMN:
+                row.update(cell, text=data, bg=bg_color, fg=status_text_color)
             else:
-                lbl = tk.Label(
-                    row_frame,
-                    text=data,
-                    bg=bg_color,
-                    fg=COLORS["dark"],
-                    font=("Arial", 10),
-                    width=max(6, width // 10),
-                    pady=10,
-                    wraplength=max(50, width - 20),
-                    anchor="w",
-                    justify="left"
-                )
-                lbl.grid(row=0, column=i, sticky="w", padx=1)
-                row_widgets.append(lbl)
-
-        for i, w in enumerate(column_widths):
-            row_frame.grid_columnconfigure(i, minsize=w, weight=0)
-
-        self.rows_widgets.append(row_widgets)
-
-    def create_qr_widget(self, parent, column, qr_code, bg_color, row_widgets):
-        qr_frame = tk.Frame(parent, bg=bg_color)
-        qr_frame.grid(row=0, column=column, sticky="w", padx=1, pady=5)
-
-        # Use cached QR code if available
-        if qr_code in self.qr_images_cache:
-            cached_img = self.qr_images_cache[qr_code]
-            qr_label = tk.Label(qr_frame, image=cached_img, bg=bg_color)
-            qr_label.image = cached_img
-            qr_label.pack(pady=2)
-
-            code_label = tk.Label(
-                qr_frame,
-                text=qr_code[:8] + "...",
-                font=("Courier", 8),
-                bg=bg_color,
-                fg=COLORS["dark"]
-            )
-            code_label.pack()
-            row_widgets.extend([qr_label, code_label])
-            return
+                row.update(cell, text=data, bg=bg_color)
 
-        try:
-            if qr_code:
-                qr_url = f"https://api.qrserver.com/v1/create-qr-code/?size=80x80&data={qr_code}"
-                response = requests.get(qr_url, timeout=5)
-
-                if response.status_code == 200:
-                    img = Image.open(BytesIO(response.content))
-                    # Reduce QR image size to avoid misalignment
-                    resample = getattr(Image, "Resampling", None)
-                    resample_filter = Image.Resampling.LANCZOS if resample else Image.ANTIALIAS
-                    img = img.resize((36, 36), resample_filter)
-                    photo = ImageTk.PhotoImage(img)
-
-                    # Cache the image
-                    self.qr_images_cache[qr_code] = photo
-
-                    qr_label = tk.Label(qr_frame, image=photo, bg=bg_color)
-                    qr_label.image = photo
-                    qr_label.pack(pady=2)
-
-                    code_label = tk.Label(
-                        qr_frame,
-                        text=qr_code[:8] + "...",
-                        font=("Courier", 8),
-                        bg=bg_color,
-                        fg=COLORS["dark"]
-                    )
-                    code_label.pack()
-
-                    row_widgets.extend([qr_label, code_label])
-                    return
-        except Exception as e:
-            print(f"Error loading QR code: {e}")
+    def bind_qr_cell(self, row, cell, qr_code, bg_color):
+        # Never blocks: until the thumbnail arrives the cell shows a placeholder
+        photo = self.qr_loader.get(qr_code)
+        if photo is not None:
+            row.update(cell, image=photo, text=qr_code[:8] + "...", font=("Courier", 8), bg=bg_color)
+        else:
+            row.update(cell, image="", text="QR\nCode", font=("Arial", 8), bg=bg_color)
 
-        fallback_label = tk.Label(
-            qr_frame,
-            text="QR\nCode",
-            bg=bg_color,
-            fg=COLORS["dark"],
-            font=("Arial", 8),
-            justify="center"
-        )
-        fallback_label.pack(pady=15)
-        row_widgets.append(fallback_label)
+    def refresh_qr_cells(self, qr_codes):
+        """Swap freshly loaded thumbnails into the visible rows that show them."""
+        for row, visitor in self.table.visible_rows():
+            qr_code = visitor.get('qr_code', '')
+            if qr_code in qr_codes:
+                self.bind_qr_cell(row, row.cells[QR_COLUMN], qr_code, row.applied[row.frame]["bg"])
 
     def lighten_color(self, color):
         color = color.lstrip('#')
@@ -704,76 +1510,109 @@ class QRGateDashboard:
         lightened = tuple(min(255, c + 10) for c in rgb)
         return f"#{lightened[0]:02x}{lightened[1]:02x}{lightened[2]:02x}"
 
-    def format_datetime(self, dt_string):
-        if not dt_string or dt_string == "None":
-            return ""
-        try:
-            dt = datetime.strptime(dt_string, "%Y-%m-%d %H:%M:%S")
-            return dt.strftime("%m/%d/%Y %H:%M")
-        except:
-            return dt_string
-
-    def format_duration(self, last_scan=None, exit_ts=None, last_status=None):
-        """Duration = time spent INSIDE only.
-        - Valid/Expired/Invalid -> "-"  (never entered)
-        - Inside  -> entry_scan to now  (live ticking)
-        - Exited  -> entry_scan to exit_time (fixed)
+    def restore_rest(self, site):
+        """Worker thread: queue the rest of the site's local replica, oldest last, as delta snapshots.
+
+        Runs before the first poll and before the push streams start, so
+        the queue keeps every server change behind the restored rows.
         """
-        try:
-            status = str(last_status or "").lower()
-            if status in ("valid", "expired", "invalid", ""):
-                return "-"
-            if not last_scan or last_scan in ("None", None):
-                return "-"
-            fmt = "%Y-%m-%d %H:%M:%S"
-            entry = datetime.strptime(last_scan, fmt)
-            if status in ("exited", "left", "out", "exited_by"):
-                if not exit_ts or exit_ts in ("None", "", None):
-                    return "-"
-                end = datetime.strptime(exit_ts, fmt)
-            elif status == "inside":
-                end = datetime.now()
-            else:
-                return "-"
-            delta = end - entry
-            if delta.total_seconds() < 0:
-                return "-"
-            days  = delta.days
-            hours = delta.seconds // 3600
-            mins  = (delta.seconds % 3600) // 60
-            if days > 0:
-                return f"{days}d {hours}h {mins}m"
-            if hours > 0:
-                return f"{hours}h {mins}m"
-            if mins > 0:
-                return f"{mins}m"
-            return "just now"
-        except Exception:
-            return "-"
+        floor = site.restore_floor
+        while floor is not None:
+            started = time.perf_counter()
+            try:
+                records = site.engine.store.load(REPLICA_BATCH, before_id=floor)
+            except sqlite3.Error as e:
+                log.warning("Could not read the local replica of %s: %s", site.name, e)
+                return
+            if not records:
+                return
+            self.snapshots.put((site, FetchSnapshot(records, fetch_ms=(time.perf_counter() - started) * 1000,
+                                                    delta=True, restored=True)))
+            floor = int(records[-1].visitor_id) if len(records) == REPLICA_BATCH else None
 
     def periodic_update(self):
+        """Worker thread: hand every site with a poll, page or digest check due to the site pool.
+
+        Each site's requests run as one job on the pool, so sites are
+        fetched side by side and a slow or unreachable one only delays its
+        own snapshots; a finished job wakes this loop again.
+        """
+        for site in self.sites:
+            self.restore_rest(site)
+        for site in self.sites:
+            site.stream.start()
         while True:
-            try:
-                if self.auto_refresh and not self.is_updating:
-                    self.root.after(0, self.update_dashboard)
-                time.sleep(UPDATE_INTERVAL)
-            except Exception as e:
-                print(f"Error in periodic update: {e}")
-                time.sleep(UPDATE_INTERVAL)
+            # Cleared before the flags are read, so a request made meanwhile still wakes us
+            self.wake.clear()
+            polling = self.auto_refresh and not self.paused
+            now = time.monotonic()
+            for site in self.sites:
+                if site.busy:
+                    continue
+                if (site.refresh_requested or not site.page_requests.empty()
+                        or (polling and now >= min(site.next_poll, site.next_verify))):
+                    self.site_pool.submit(site, self.poll_site, polling, done=lambda site: self.wake.set())
+            waits = [site.next_poll - now for site in self.sites if not site.busy]
+            self.wake.wait(max(0.0, min(waits)) if polling and waits else UPDATE_INTERVAL)
+
+    def poll_site(self, site, polling):
+        """Site pool: serve the site's page and refresh requests, poll it if due, queue the snapshots."""
+        try:
+            page = None
+            while not site.page_requests.empty():
+                page = site.page_requests.get_nowait()  # only the latest filter matters
+            if page is not None:
+                self.snapshots.put((site, site.engine.feed.page(page)))
+            if site.refresh_requested or (polling and time.monotonic() >= site.next_poll):
+                site.refresh_requested = False
+                snapshot = site.engine.feed.snapshot()
+                site.scheduler.record(snapshot)
+                site.last_fetch_ms = snapshot.fetch_ms
+                self.snapshots.put((site, snapshot))
+                self.schedule_next_poll(site)
+            if polling and time.monotonic() >= site.next_verify:
+                site.next_verify = time.monotonic() + VERIFY_INTERVAL
+                from_id = self.verify_from(site)
+                if from_id is not None:
+                    snapshot = site.engine.feed.verify(site.engine.digests, from_id)
+                    if snapshot is not None:
+                        self.snapshots.put((site, snapshot))
+        except Exception:
+            log.exception("Error in periodic update of %s", site.name)
+            self.schedule_next_poll(site)
+
+    def verify_from(self, site):
+        """Lowest visitor_id the site's rows are complete from (None until the listing's first page)."""
+        key = ("All", "")
+        if key not in site.page_floor:
+            return None
+        return 0 if not site.more_pages.get(key, True) else site.page_floor[key]
+
+    def schedule_next_poll(self, site):
+        push_interval = STREAM_POLL_INTERVAL if site.stream.connected else None
+        site.next_poll = time.monotonic() + site.scheduler.next_delay(push_interval=push_interval)
 
     def start_updates(self):
+        if METRICS_PORT:
+            try:
+                self.metrics_server = MetricsServer(self.metrics, METRICS_PORT).start()
+                log.info("Metrics at %s", self.metrics_server.url)
+            except OSError as e:
+                log.warning("Metrics endpoint disabled: %s", e)
         update_thread = threading.Thread(target=self.periodic_update, daemon=True)
         update_thread.start()
-        self.root.after(1000, self.update_dashboard)
+        self.root.after(HEARTBEAT_MS, self.heartbeat)
+        self.root.after_idle(self.timer_fired)
 
     def run(self):
         self.root.mainloop()
 
 
 if __name__ == "__main__":
-    print("=== QRGate Dashboard Starting ===")
-    print(f"API URL: {API_URL}")
-    print("Attempting first connection...")
-    
+    # QRGATE_LOG_LEVEL=DEBUG logs every request and response
+    logging.basicConfig(level=os.environ.get("QRGATE_LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    log.info("QRGate Dashboard starting, sources %s", default_sources())
+
     app = QRGateDashboard()
     app.run()
\ No newline at end of file
@@ -7,7 +7,11 @@ $password = getenv('MYSQLPASSWORD') ?: '';
 $database = getenv('MYSQLDATABASE') ?: 'qrgate_db';
 $port     = getenv('MYSQLPORT')     ?: 3306;
 
-$mysqli = new mysqli($host, $user, $password, $database, $port);
+// Persistent connections ("p:"): scanners call check.php once per scan, and a
+// new TCP connection and login for every request was a large share of it.
+// PHP resets the session state before a connection is reused.
+$persistent = getenv('MYSQL_PERSISTENT') !== '0';
+$mysqli = new mysqli(($persistent ? 'p:' : '') . $host, $user, $password, $database, $port);
 
 if ($mysqli->connect_errno) {
     exit('DB connection failed: ' . $mysqli->connect_error);
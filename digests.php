@@ -0,0 +1,64 @@
+<?php
+// Range digests of the visitors table, for the dashboard's replica check
+// (visitor_digest.py).  Reads only visitor_digests, which the triggers of
+// migrations/005_visitor_digests.sql keep: per leaf of 64 visitor ids,
+// the row count and the XOR of the rows' CRC32 digests.
+//
+//   ?size=N&from_id=A[&to_id=B]
+//       leaves combined into buckets of N ids (a multiple of 64; 0 = one
+//       bucket for the whole range), over from_id <= visitor_id < to_id
+//       (both rounded down to a leaf boundary):
+//       {"ok": true, "size": N, "buckets": [[bucket, rows, digest], ...]}
+//
+// bucket is visitor_id DIV N (0 when N is 0); empty buckets are left out.
+
+require __DIR__ . '/db.php';
+header('Content-Type: application/json');
+header('Access-Control-Allow-Origin: *');
+header('Cache-Control: no-cache');
+
+const LEAF_IDS = 64;
+
+$size = (int)($_GET['size'] ?? 0);
+$from = max(0, (int)($_GET['from_id'] ?? 0));
+$to   = isset($_GET['to_id']) ? (int)$_GET['to_id'] : null;
+if ($size < 0 || $size % LEAF_IDS) {
+    http_response_code(400);
+    exit(json_encode(['ok' => false, 'msg' => 'size must be 0 or a multiple of ' . LEAF_IDS]));
+}
+
+try {
+    $bucket = $size ? "leaf DIV " . ($size / LEAF_IDS) : "0";
+    $sql = "SELECT $bucket AS bucket, SUM(row_count) AS row_count, BIT_XOR(digest) AS digest
+            FROM visitor_digests
+            WHERE row_count > 0 AND leaf >= ?" . ($to !== null ? " AND leaf < ?" : "") . "
+            GROUP BY bucket
+            ORDER BY bucket";
+    $stmt = $mysqli->prepare($sql);
+    if (!$stmt) throw new Exception("Prepare failed: " . $mysqli->error);
+    $first_leaf = intdiv($from, LEAF_IDS);
+    if ($to !== null) {
+        $end_leaf = intdiv($to, LEAF_IDS);
+        $stmt->bind_param('ii', $first_leaf, $end_leaf);
+    } else {
+        $stmt->bind_param('i', $first_leaf);
+    }
+    if (!$stmt->execute()) throw new Exception("Query failed: " . $stmt->error);
+    $result = $stmt->get_result();
+
+    $buckets = [];
+    while ($row = $result->fetch_row()) {
+        $buckets[] = [(int)$row[0], (int)$row[1], (int)$row[2]];
+    }
+    $body = json_encode(['ok' => true, 'size' => $size, 'buckets' => $buckets]);
+    if (strlen($body) > 1024 && stripos($_SERVER['HTTP_ACCEPT_ENCODING'] ?? '', 'gzip') !== false) {
+        header('Content-Encoding: gzip');
+        $body = gzencode($body, 6);
+    }
+    echo $body;
+
+} catch (Exception $e) {
+    http_response_code(500);
+    echo json_encode(['ok' => false, 'msg' => 'Database error: ' . $e->getMessage()]);
+}
+?>
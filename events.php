@@ -0,0 +1,105 @@
+<?php
+// Server-sent event stream of visitor changes (migrations/002_visitor_events.sql).
+//
+// Each "visitors" event carries the changed rows in get_visitors.php's
+// shape, {"data": [...], "tombstones": [...]}, and its id is the last
+// visitor_events row it covers.  A new subscriber starts at the newest
+// event (it resyncs through get_visitors.php once connected); one that
+// reconnects with Last-Event-ID resumes where it left off, or gets a
+// "resync" event if those events were already pruned.  The connection is
+// closed after STREAM_SECONDS and the client reconnects.
+//
+//   fields=a,b,c   columns sent for each visitor, as for get_visitors.php
+
+date_default_timezone_set('Asia/Manila');
+
+require __DIR__ . '/db.php';
+header('Content-Type: text/event-stream');
+header('Cache-Control: no-cache');
+header('X-Accel-Buffering: no');  // ask the proxy not to buffer the stream
+header('Access-Control-Allow-Origin: *');
+
+const STREAM_SECONDS = 55;
+const POLL_MICROSECONDS = 250000;  // how often visitor_events is checked
+const PING_SECONDS = 15;           // keeps proxies from timing out an idle stream
+
+set_time_limit(0);
+while (ob_get_level() > 0) {
+    ob_end_flush();
+}
+
+$all_columns = ['visitor_id', 'full_name', 'email', 'phone', 'purpose', 'host', 'notes', 'qr_code', 'expiry_at',
+                'last_status', 'last_scan', 'entry_scan', 'exit_time', 'created_at', 'updated_at'];
+$columns = $all_columns;
+if (!empty($_GET['fields'])) {
+    $wanted  = array_map('trim', explode(',', $_GET['fields']));
+    $columns = array_values(array_intersect($all_columns, array_merge(['visitor_id', 'updated_at'], $wanted)));
+}
+$select = implode(', ', $columns);
+
+function send_event($event, $id, $data) {
+    echo ($id !== null ? "id: $id\n" : '') . "event: $event\ndata: " . json_encode($data) . "\n\n";
+    flush();
+}
+
+$last_id = (int)($_SERVER['HTTP_LAST_EVENT_ID'] ?? $_GET['last_event_id'] ?? 0);
+
+// Forget events older than a day (cheap: created_at is indexed)
+$mysqli->query("DELETE FROM visitor_events WHERE created_at < NOW(3) - INTERVAL 1 DAY LIMIT 1000");
+
+$res = $mysqli->query("SELECT MIN(event_id) AS first_id, MAX(event_id) AS last_id FROM visitor_events");
+$bounds = $res ? $res->fetch_assoc() : ['first_id' => null, 'last_id' => null];
+echo "retry: 2000\n\n";
+if ($last_id <= 0) {
+    $last_id = (int)$bounds['last_id'];
+    send_event('hello', $last_id, ['last_event_id' => $last_id]);
+} elseif ($bounds['first_id'] !== null && $last_id < (int)$bounds['first_id'] - 1) {
+    $last_id = (int)$bounds['last_id'];
+    send_event('resync', $last_id, ['last_event_id' => $last_id]);
+}
+
+$events = $mysqli->prepare("SELECT event_id, visitor_id FROM visitor_events WHERE event_id > ? ORDER BY event_id LIMIT 500");
+$started = time();
+$last_ping = time();
+
+while (!connection_aborted() && time() - $started < STREAM_SECONDS) {
+    $events->bind_param('i', $last_id);
+    $events->execute();
+    $res = $events->get_result();
+
+    $ids = [];
+    while ($e = $res->fetch_assoc()) {
+        $last_id = (int)$e['event_id'];
+        $ids[(int)$e['visitor_id']] = true;  // several events for one visitor: send it once
+    }
+
+    if (!$ids) {
+        if (time() - $last_ping >= PING_SECONDS) {
+            echo ": ping\n\n";
+            flush();
+            $last_ping = time();
+        }
+        usleep(POLL_MICROSECONDS);
+        continue;
+    }
+
+    $ids = array_keys($ids);
+    $rows = $mysqli->prepare("SELECT $select FROM visitors WHERE visitor_id IN (" . implode(',', array_fill(0, count($ids), '?')) . ")");
+    $rows->bind_param(str_repeat('i', count($ids)), ...$ids);
+    $rows->execute();
+    $result = $rows->get_result();
+
+    $data = [];
+    $found = [];
+    while ($row = $result->fetch_assoc()) {
+        $data[] = $row;
+        $found[(int)$row['visitor_id']] = true;
+    }
+    // Visitors that no longer exist were deleted
+    $tombstones = array_values(array_filter($ids, function ($id) use ($found) { return !isset($found[$id]); }));
+
+    send_event('visitors', $last_id, ['data' => $data, 'tombstones' => $tombstones]);
+    $last_ping = time();
+}
+
+?>
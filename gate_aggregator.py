@@ -0,0 +1,449 @@
+"""Gate-side aggregator: answers the QR scanners locally, writes to the server in batches.
+
+    python gate_aggregator.py [--port 8085] [--gate NAME] [--api-url URL] [--batch-url URL]
+
+Scanners send their check.php and log_exit.php requests here instead of
+to the server (on the LAN, over plain HTTP).  Every scan is decided at
+once from a local copy of the visitors, indexed by qr_code, with the
+rules of check.php and log_exit.php, and answered in the same JSON, so
+the firmware only needs the new URL.  The copy is a VisitorEngine kept
+current by the events.php push stream and delta polls, and stored in a
+LocalReplica so a restart does not need the server.
+
+The writes a scan implies (a logs row, the visitor's status) are queued,
+appended to a spool file, and sent to check_batch.php every
+FLUSH_INTERVAL seconds or BATCH_MAX scans, one transaction per batch.
+A batch that fails is retried with backoff; every scan carries a
+scan_id, so a batch sent twice is only applied once.  Until the server
+has a scan, the local copy keeps the aggregator's own decision, so a
+second scan at another gate sees the first one.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from visitor_engine import API_URL, FeedError, FetchSnapshot, RowDiff, VisitorEngine, VisitorStream, events_url
+from visitor_record import VisitorRecord, parse_timestamp
+from visitor_replica import LocalReplica
+
+FLUSH_INTERVAL = 0.2  # seconds between batches while scans are pending
+BATCH_MAX = 500  # scans per check_batch.php request (the endpoint takes up to 1000)
+FLUSH_RETRY_MAX = 60
+REFRESH_INTERVAL = 10  # delta poll while the push stream is down
+STREAM_REFRESH_INTERVAL = 120  # safety-net poll while it is up
+MISS_REFRESH_INTERVAL = 1.0  # an unknown QR code triggers a refresh at most this often
+MISS_REFRESH_WAIT = 0.5  # seconds a scan waits for that refresh before it is answered from the copy as is
+STATE_DIR = os.path.join(os.path.expanduser("~"), ".qrgate")
+
+
+def batch_url(api_url):
+    """check_batch.php next to the given get_visitors.php."""
+    return api_url.rsplit('/', 1)[0] + "/check_batch.php"
+
+
+def php_duration(entry, exit_time):
+    """log_exit.php's calculateDuration: hours and minutes of the interval."""
+    seconds = int((exit_time - entry).total_seconds())
+    hours = seconds // 3600 % 24  # DateInterval's h excludes whole days
+    minutes = seconds // 60 % 60
+    parts = []
+    if hours > 0:
+        parts.append(f"{hours} hour{'s' if hours > 1 else ''}")
+    if minutes > 0:
+        parts.append(f"{minutes} minute{'s' if minutes > 1 else ''}")
+    return " ".join(parts) or "Less than a minute"
+
+
+class GateAggregator:
+    """Decides scans from the local visitor copy and batches their writes to check_batch.php."""
+
+    def __init__(self, api_url=API_URL, batch_url=None, gate=None, token=None,
+                 replica_path=None, spool_path=None, log=print):
+        self.api_url = api_url
+        self.batch_url = batch_url or globals()["batch_url"](api_url)
+        self.gate = gate or socket.gethostname()
+        self.log = log
+        store = LocalReplica(replica_path, api_url) if replica_path else None
+        self.engine = VisitorEngine(api_url, log=lambda message: None, store=store)
+        self.lock = threading.Lock()  # decisions and the engine
+        self.fetch_lock = threading.Lock()  # the engine's feed (one request at a time)
+        self.by_qr = {}  # qr_code -> visitor_id
+        self.qr_of = {}  # visitor_id -> qr_code indexed for it
+        self.local = {}  # visitor_id -> fields this gate wrote that the server has not echoed yet
+        self.last_miss_refresh = 0.0
+
+        self.pending = []  # scans not yet acknowledged by check_batch.php, oldest first
+        self.spool_path = spool_path
+        self.spool = None
+        self.flush_lock = threading.Lock()  # one batch in flight, so acknowledged scans are removed once
+        self.flush_wanted = threading.Event()
+        self.refresh_wanted = threading.Event()
+        self.refreshed = threading.Condition()
+        self.refreshes_started = 0
+        self.refreshes_done = 0
+        self.session = requests.Session()
+        self.session.verify = False
+        if token:
+            self.session.headers["X-Gate-Token"] = token
+        self.stream = VisitorStream(events_url(api_url), on_snapshot=self.apply_server,
+                                    on_resync=self.refresh_wanted.set, log=log)
+
+        self.decided = 0
+        self.batches = 0
+        self.flushed = 0
+        self.flush_failures = 0  # consecutive
+        self.last_error = None
+        self.last_flush_ms = 0.0
+
+    # ---- visitor copy -------------------------------------------------
+
+    def start(self):
+        """Load the visitors and spooled scans, then start the refresh, push and flush threads."""
+        if self.engine.store is not None:
+            self.engine.restore()
+        try:
+            with self.fetch_lock:
+                if self.engine.feed.sync_cursor:
+                    snapshot = self.engine.feed.snapshot()
+                    if snapshot.error:
+                        raise FeedError(snapshot.error)
+                    self.engine.apply(snapshot)
+                else:
+                    self.engine.load_all()
+        except FeedError as e:
+            self.log(f"Starting with {len(self.engine.rows.by_id)} stored visitors: {e}")
+        with self.lock:
+            self.index(RowDiff(set(self.engine.rows.by_id), set(), set(), False))
+        self.load_spool()
+        for target in (self.refresh_loop, self.flush_loop):
+            threading.Thread(target=target, daemon=True).start()
+        self.stream.start()
+        return self
+
+    def index(self, diff):
+        """Patch the qr_code index with a RowDiff; call with the lock held."""
+        by_id = self.engine.rows.by_id
+        for vid in diff.removed | diff.inserted | diff.changed:
+            old = self.qr_of.pop(vid, None)
+            if old is not None and self.by_qr.get(old) == vid:
+                del self.by_qr[old]
+            record = by_id.get(vid)
+            qr = record.get('qr_code') if record is not None else None
+            if qr:
+                self.by_qr[qr] = vid
+                self.qr_of[vid] = qr
+
+    def apply_server(self, snapshot):
+        """Apply a snapshot from the server, keeping this gate's writes it does not have yet."""
+        with self.lock:
+            diff = self.engine.apply(snapshot)
+            self.index(diff)
+            for vid in (diff.inserted | diff.changed) & self.local.keys():
+                fields = self.local[vid]
+                if (self.engine.rows.by_id[vid].get('last_scan') or '') >= fields['last_scan']:
+                    del self.local[vid]  # the server has this gate's write, or a newer scan
+                else:
+                    self.apply_local(vid, fields)
+
+    def apply_local(self, vid, fields):
+        """Show a decision in the local copy right away; call with the lock held."""
+        current = self.engine.rows.by_id[vid]
+        record = VisitorRecord(dict(current.fields, **fields))
+        self.engine.apply(FetchSnapshot([record], delta=True))
+
+    def refresh(self):
+        with self.fetch_lock:
+            with self.refreshed:
+                self.refreshes_started += 1
+                number = self.refreshes_started
+            snapshot = self.engine.feed.snapshot()
+        try:
+            if snapshot.error:
+                self.log(f"Refresh failed: {snapshot.error}")
+                return False
+            self.apply_server(snapshot)
+            return True
+        finally:
+            with self.refreshed:
+                self.refreshes_done = max(self.refreshes_done, number)
+                self.refreshed.notify_all()
+
+    def refresh_loop(self):
+        while True:
+            interval = STREAM_REFRESH_INTERVAL if self.stream.connected else REFRESH_INTERVAL
+            self.refresh_wanted.wait(interval)
+            self.refresh_wanted.clear()
+            self.refresh()
+
+    def lookup(self, qr):
+        """The VisitorRecord for ``qr``; an unknown code may be newly registered, so refresh once.
+
+        The refresh runs on the refresh thread; the scan waits for it at
+        most MISS_REFRESH_WAIT seconds, so a slow server cannot hold up
+        the answer for the feed's whole timeout.
+        """
+        with self.lock:
+            vid = self.by_qr.get(qr)
+            if vid is not None:
+                return self.engine.rows.by_id[vid]
+        now = time.monotonic()
+        if now - self.last_miss_refresh < MISS_REFRESH_INTERVAL:
+            return None
+        self.last_miss_refresh = now
+        with self.refreshed:
+            wanted = self.refreshes_started + 1  # one that starts after this miss
+            self.refresh_wanted.set()
+            self.refreshed.wait_for(lambda: self.refreshes_done >= wanted, MISS_REFRESH_WAIT)
+        with self.lock:
+            vid = self.by_qr.get(qr)
+            return self.engine.rows.by_id[vid] if vid is not None else None
+
+    # ---- decisions (check.php / log_exit.php) -----------------------------
+
+    def check(self, qr):
+        """check.php: returns (http status, response)."""
+        if qr == '':
+            return 400, {'status': 'Invalid', 'msg': 'QR code parameter missing'}
+        record = self.lookup(qr)
+        with self.lock:
+            now = datetime.now()
+            at = now.strftime("%Y-%m-%d %H:%M:%S")
+            if record is None:
+                self.queue_scan(None, qr, 'Invalid', at)
+                return 200, {'status': 'Invalid', 'msg': 'QR code not found'}
+
+            record = self.engine.rows.by_id.get(record.visitor_id, record)  # latest, under the lock
+            vid = record.visitor_id
+            if record.expiry is None or record.expiry < now:
+                self.queue_scan(vid, qr, 'Expired', at, last_status='Expired', last_scan=at)
+                return 200, {'status': 'Expired', 'msg': 'QR code has expired', 'visitor_id': vid}
+
+            if record.get('last_status') == 'Exited':
+                self.queue_scan(vid, qr, 'Invalid', at)
+                return 200, {'status': 'AlreadyExited',
+                             'msg': 'Visitor has already exited. Re-entry is not allowed.',
+                             'visitor_id': vid, 'visitor_name': record.get('full_name')}
+
+            self.queue_scan(vid, qr, 'Valid', at, last_status='Inside', last_scan=at,
+                            entry_scan=record.get('entry_scan') or at)
+            return 200, {'status': 'Inside', 'visitor_id': vid, 'visitor_name': record.get('full_name'),
+                         'email': record.get('email'), 'phone': record.get('phone'),
+                         'purpose': record.get('purpose'), 'host': record.get('host'),
+                         'expires_at': record.get('expiry_at'), 'current_time': at}
+
+    def exit(self, qr):
+        """log_exit.php: returns (http status, response)."""
+        qr = qr.strip()
+        if not qr:
+            return 400, {'ok': False, 'msg': 'QR code is required'}
+        record = self.lookup(qr)
+        with self.lock:
+            if record is None:
+                return 200, {'ok': False, 'msg': 'QR code not found. Please check and try again.'}
+            record = self.engine.rows.by_id.get(record.visitor_id, record)
+            now = datetime.now()
+            if record.expiry is None or record.expiry < now:
+                return 200, {'ok': False, 'msg': 'QR code has expired. Cannot log exit.',
+                             'expired_at': record.get('expiry_at')}
+
+            at = now.strftime("%Y-%m-%d %H:%M:%S")
+            entered = record.entry or parse_timestamp(record.get('created_at')) or now
+            self.queue_scan(record.visitor_id, qr, 'Exited', at, exit_time=at, last_status='Exited', last_scan=at)
+            return 200, {'ok': True, 'msg': 'Exit logged successfully! Thank you for visiting.',
+                         'visitor_id': record.visitor_id, 'visitor_name': record.get('full_name'),
+                         'email': record.get('email'), 'phone': record.get('phone'),
+                         'purpose': record.get('purpose'), 'host': record.get('host'),
+                         'entry_time': entered.strftime("%b %d, %Y %I:%M %p"),
+                         'exit_time': now.strftime("%b %d, %Y %I:%M %p"),
+                         'duration': php_duration(entered, now)}
+
+    # ---- batched writes -------------------------------------------------
+
+    def queue_scan(self, vid, qr, status, at, **fields):
+        """Queue the logs row (and visitor update) for one decision; call with the lock held."""
+        scan = {'scan_id': uuid.uuid4().hex, 'qr': qr, 'visitor_id': int(vid) if vid else None,
+                'status': status, 'scanned_at': at}
+        self.pending.append(scan)
+        if self.spool is not None:
+            self.spool.write(json.dumps(scan) + "\n")
+            self.spool.flush()
+        if fields:
+            self.local[vid] = fields
+            self.apply_local(vid, fields)
+        self.decided += 1
+        if len(self.pending) >= BATCH_MAX:
+            self.flush_wanted.set()
+
+    def load_spool(self):
+        """Re-queue the scans a previous run accepted but did not get acknowledged."""
+        if not self.spool_path:
+            return
+        if os.path.exists(self.spool_path):
+            with open(self.spool_path, encoding="utf-8") as f:
+                spooled = [json.loads(line) for line in f if line.strip()]
+            if spooled:
+                self.log(f"Re-sending {len(spooled)} spooled scans")
+            with self.lock:
+                self.pending[:0] = spooled
+        self.spool = open(self.spool_path, "a", encoding="utf-8")
+
+    def rewrite_spool(self):
+        """Replace the spool with the scans still pending; call with the lock held."""
+        if self.spool is None:
+            return
+        self.spool.close()
+        directory = os.path.dirname(os.path.abspath(self.spool_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(scan) + "\n" for scan in self.pending)
+        os.replace(tmp_path, self.spool_path)
+        self.spool = open(self.spool_path, "a", encoding="utf-8")
+
+    def flush(self):
+        """Send the oldest pending scans as one batch; True when the server took them."""
+        with self.flush_lock:
+            return self.send_batch()
+
+    def send_batch(self):
+        with self.lock:
+            batch = self.pending[:BATCH_MAX]
+        if not batch:
+            return True
+        started = time.perf_counter()
+        try:
+            response = self.session.post(self.batch_url, json={'gate': self.gate, 'scans': batch}, timeout=15)
+            response.raise_for_status()
+            result = response.json()
+            if not result.get('ok'):
+                raise ValueError(result.get('msg', 'batch refused'))
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.flush_failures += 1
+            self.last_error = str(e)
+            self.log(f"Batch of {len(batch)} scans failed ({self.flush_failures}): {e}")
+            return False
+        with self.lock:
+            del self.pending[:len(batch)]
+            self.rewrite_spool()
+            more = bool(self.pending)
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+        self.flush_failures = 0
+        self.batches += 1
+        self.flushed += len(batch)
+        if more:
+            self.flush_wanted.set()
+        return True
+
+    def flush_loop(self):
+        while True:
+            if self.flush_failures:
+                ceiling = min(FLUSH_RETRY_MAX, 2 ** self.flush_failures)
+                time.sleep(ceiling / 2 + random.uniform(0, ceiling / 2))
+            else:
+                self.flush_wanted.wait(FLUSH_INTERVAL)
+            self.flush_wanted.clear()
+            self.flush()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'gate': self.gate,
+                'visitors': len(self.engine.rows.by_id),
+                'decided': self.decided,
+                'pending': len(self.pending),
+                'batches': self.batches,
+                'flushed': self.flushed,
+                'last_flush_ms': round(self.last_flush_ms, 1),
+                'flush_failures': self.flush_failures,
+                'last_error': self.last_error,
+                'push': self.stream.connected,
+            }
+
+
+class GateHandler(BaseHTTPRequestHandler):
+    """check.php, log_exit.php and /stats on top of a GateAggregator."""
+
+    protocol_version = "HTTP/1.1"  # scanners and load generators keep the connection open
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+    aggregator = None
+
+    def send_json(self, code, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.endswith("/check.php"):
+            self.send_json(*self.aggregator.check(parse_qs(url.query).get('qr', [''])[0]))
+        elif url.path == "/stats":
+            self.send_json(200, self.aggregator.stats())
+        else:
+            self.send_json(404, {'ok': False, 'msg': 'Not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        if url.path.endswith("/log_exit.php"):
+            self.send_json(*self.aggregator.exit(form.get('qr_code', [''])[0]))
+        else:
+            self.send_json(404, {'ok': False, 'msg': 'Not found'})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(aggregator, host="0.0.0.0", port=8085):
+    """A ThreadingHTTPServer answering scanners from ``aggregator`` (call serve_forever on it)."""
+    handler = type("BoundGateHandler", (GateHandler,), {"aggregator": aggregator})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8085)
+    parser.add_argument("--gate", help="name written to logs.gate (default: host name)")
+    parser.add_argument("--api-url", default=API_URL, help="get_visitors.php URL")
+    parser.add_argument("--batch-url", help="check_batch.php URL (default: next to --api-url)")
+    parser.add_argument("--token", default=os.environ.get("GATE_TOKEN"), help="X-Gate-Token (default: $GATE_TOKEN)")
+    parser.add_argument("--replica", default=os.path.join(STATE_DIR, "gate_replica.sqlite3"))
+    parser.add_argument("--spool", default=os.path.join(STATE_DIR, "gate_spool.jsonl"))
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.spool)), exist_ok=True)
+    log = print if args.verbose else (lambda message: None)
+    aggregator = GateAggregator(args.api_url, args.batch_url, args.gate, args.token,
+                                replica_path=args.replica, spool_path=args.spool, log=log).start()
+    server = serve(aggregator, args.host, args.port)
+    print(f"Gate {aggregator.gate}: {len(aggregator.by_qr)} QR codes, "
+          f"listening on {args.host}:{args.port}, writing to {aggregator.batch_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    while aggregator.pending and aggregator.flush():
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
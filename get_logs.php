@@ -0,0 +1,92 @@
+<?php
+// The scan log (logs table) for visitor_analytics.py, as column arrays.
+//
+//   ?range=1
+//       {"ok": true, "first": "Y-m-d H:i:s", "last": "Y-m-d H:i:s"} (nulls when empty)
+//   ?from=Y-m-d H:i:s&to=Y-m-d H:i:s[&after_t=S&after_id=ID][&limit=N]
+//       scans with from <= event_at < to, oldest first, keyset-paged by
+//       (t, log_id): pass the last row's t and log_id as after_t/after_id
+//       for the next page.  One array per column, so the client can load
+//       them straight into NumPy:
+//       {"ok": true, "log_id": [...], "visitor_id": [...], "kind": [...],
+//        "t": [...], "host": [...], "purpose": [...], "more": bool}
+//
+// t is seconds since ``from``; kind is 1 Valid, 2 Expired, 3 Invalid,
+// 4 Exited (0 anything else); host and purpose are the visitor's (null
+// for unknown QR codes).  event_at comes from migrations/004_logs_event_time.sql.
+
+date_default_timezone_set('Asia/Manila');
+
+require __DIR__ . '/db.php';
+header('Content-Type: application/json');
+header('Access-Control-Allow-Origin: *');
+
+const MAX_LIMIT = 100000;
+
+function send_json($response) {
+    $body = json_encode($response);
+    if (strlen($body) > 1024 && stripos($_SERVER['HTTP_ACCEPT_ENCODING'] ?? '', 'gzip') !== false) {
+        header('Content-Encoding: gzip');
+        $body = gzencode($body, 6);
+    }
+    header('Cache-Control: no-cache');
+    echo $body;
+}
+
+try {
+    if (!empty($_GET['range'])) {
+        $res = $mysqli->query("SELECT MIN(event_at) AS first, MAX(event_at) AS last FROM logs");
+        $row = $res->fetch_assoc();
+        send_json(['ok' => true, 'first' => $row['first'], 'last' => $row['last']]);
+        exit;
+    }
+
+    $from = $_GET['from'] ?? '';
+    $to   = $_GET['to'] ?? '';
+    if (!DateTime::createFromFormat('Y-m-d H:i:s', $from) || !DateTime::createFromFormat('Y-m-d H:i:s', $to)) {
+        http_response_code(400);
+        exit(json_encode(['ok' => false, 'msg' => 'from and to must look like 2025-01-31 00:00:00']));
+    }
+    $after_t  = (int)($_GET['after_t'] ?? -1);
+    $after_id = (int)($_GET['after_id'] ?? 0);
+    $limit    = max(1, min(MAX_LIMIT, (int)($_GET['limit'] ?? 50000)));
+
+    $stmt = $mysqli->prepare("
+        SELECT l.log_id, l.visitor_id,
+               FIELD(l.status, 'Valid', 'Expired', 'Invalid', 'Exited') AS kind,
+               TIMESTAMPDIFF(SECOND, ?, l.event_at) AS t,
+               v.host, v.purpose
+        FROM logs l
+        LEFT JOIN visitors v ON v.visitor_id = l.visitor_id
+        WHERE l.event_at >= ? AND l.event_at < ?
+          AND (l.event_at > DATE_ADD(?, INTERVAL ? SECOND)
+               OR (l.event_at = DATE_ADD(?, INTERVAL ? SECOND) AND l.log_id > ?))
+        ORDER BY l.event_at, l.log_id
+        LIMIT " . ($limit + 1));
+    if (!$stmt) throw new Exception("Prepare failed: " . $mysqli->error);
+    $stmt->bind_param('ssssisii', $from, $from, $to, $from, $after_t, $from, $after_t, $after_id);
+    if (!$stmt->execute()) throw new Exception("Query failed: " . $stmt->error);
+    $result = $stmt->get_result();
+
+    $columns = ['log_id' => [], 'visitor_id' => [], 'kind' => [], 't' => [], 'host' => [], 'purpose' => []];
+    $count = 0;
+    $more = false;
+    while ($row = $result->fetch_row()) {
+        if (++$count > $limit) {
+            $more = true;
+            break;
+        }
+        $columns['log_id'][]     = (int)$row[0];
+        $columns['visitor_id'][] = $row[1] === null ? null : (int)$row[1];
+        $columns['kind'][]       = (int)$row[2];
+        $columns['t'][]          = (int)$row[3];
+        $columns['host'][]       = $row[4];
+        $columns['purpose'][]    = $row[5];
+    }
+    send_json(['ok' => true] + $columns + ['more' => $more]);
+
+} catch (Exception $e) {
+    http_response_code(500);
+    echo json_encode(['ok' => false, 'msg' => 'Database error: ' . $e->getMessage()]);
+}
+?>
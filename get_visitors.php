@@ -6,31 +6,209 @@ require __DIR__ . '/db.php';
 header('Content-Type: application/json');
 header('Access-Control-Allow-Origin: *');
 
-$sql = "SELECT visitor_id, full_name, email, phone, purpose, host, notes, qr_code, expiry_at, last_status, last_scan, entry_scan, exit_time, created_at
-        FROM visitors ORDER BY visitor_id DESC";
+$all_columns = ['visitor_id', 'full_name', 'email', 'phone', 'purpose', 'host', 'notes', 'qr_code', 'expiry_at',
+                'last_status', 'last_scan', 'entry_scan', 'exit_time', 'created_at', 'updated_at'];
+
+// Delta sync needs migrations/001_visitors_delta_sync.sql.  Until it is
+// applied there is no updated_at to select or page by, so every request
+// gets the plain listing: no since-paging, cursor or tombstones.
+$res = $mysqli->query("SHOW COLUMNS FROM visitors LIKE 'updated_at'");
+$delta_sync = $res && $res->num_rows > 0;
+if (!$delta_sync) {
+    $all_columns = array_values(array_diff($all_columns, ['updated_at']));
+}
+
+// Same rules as the dashboard's get_visitor_status(), so ?status= filters match what it shows
+$status_sql = "CASE
+    WHEN LOWER(COALESCE(last_status, '')) = 'invalid' THEN 'Invalid'
+    WHEN LOWER(COALESCE(last_status, '')) IN ('exited', 'exit', 'left', 'out', 'exited_by') THEN 'Exited'
+    WHEN expiry_at < NOW() OR LOWER(COALESCE(last_status, '')) = 'expired' THEN 'Expired'
+    WHEN last_scan IS NOT NULL THEN 'Inside'
+    ELSE 'Valid'
+END";
+
+// Query parameters (all optional; no parameters = every visitor, every column):
+//   fields=a,b,c        only these columns (visitor_id and updated_at are always sent)
+//   limit=N             page size; "more" says whether another page follows
+//   before_id=ID        keyset paging for the full list: visitors older than ID
+//   status=Inside       derived status filter (Valid, Expired, Inside, Exited, Invalid)
+//   q=text              substring search over name, email, purpose and host
+//   ids=1,2,3           only these visitors (at most 500)
+//   created_from=YYYY-MM-DD&created_to=YYYY-MM-DD
+//                       visitors registered in that date range (inclusive; either end optional)
+//
+// Response format is negotiated: a client whose Accept header lists
+// application/vnd.qrgate.columnar+json gets the column names once
+// ("columns") and one value array per visitor ("rows") instead of "data";
+// bodies over 1 KB are gzipped for clients that send Accept-Encoding: gzip.
+//
+//   since=TS&since_id=ID
+//                       delta sync (migrations/001_visitors_delta_sync.sql): only rows
+//                       changed after that cursor, oldest change first, plus the ids
+//                       deleted since then ("tombstones"); status/q do not apply
+$since     = $delta_sync ? ($_GET['since'] ?? '') : '';
+$since_id  = (int)($_GET['since_id'] ?? 0);
+$limit     = isset($_GET['limit']) ? max(1, min(5000, (int)$_GET['limit'])) : ($since !== '' ? 1000 : 0);
+$before_id = (int)($_GET['before_id'] ?? 0);
+$status    = $_GET['status'] ?? '';
+$q         = trim($_GET['q'] ?? '');
+$ids       = array_slice(array_values(array_filter(array_map('intval', explode(',', $_GET['ids'] ?? '')))), 0, 500);
+$created_from = $_GET['created_from'] ?? '';
+$created_to   = $_GET['created_to'] ?? '';
+
+$columns = $all_columns;
+if (!empty($_GET['fields'])) {
+    $wanted  = array_map('trim', explode(',', $_GET['fields']));
+    $columns = array_values(array_intersect($all_columns, array_merge(['visitor_id', 'updated_at'], $wanted)));
+}
+$select = implode(', ', $columns);
 
 try {
-    $result = $mysqli->query($sql);
-    
-    if (!$result) {
-        throw new Exception("Query failed: " . $mysqli->error);
+    $where  = [];
+    $types  = '';
+    $params = [];
+
+    if ($since !== '') {
+        $where[] = "(updated_at > ? OR (updated_at = ? AND visitor_id > ?))";
+        $types  .= 'ssi';
+        array_push($params, $since, $since, $since_id);
+        $order = "updated_at, visitor_id";
+    } else {
+        if ($before_id > 0) {
+            $where[] = "visitor_id < ?";
+            $types  .= 'i';
+            $params[] = $before_id;
+        }
+        if (in_array($status, ['Valid', 'Expired', 'Inside', 'Exited', 'Invalid'], true)) {
+            $where[] = "($status_sql) = ?";
+            $types  .= 's';
+            $params[] = $status;
+        }
+        if ($q !== '') {
+            $like = '%' . addcslashes($q, '%_\\') . '%';
+            $where[] = "(full_name LIKE ? OR email LIKE ? OR purpose LIKE ? OR host LIKE ?)";
+            $types  .= 'ssss';
+            array_push($params, $like, $like, $like, $like);
+        }
+        if ($ids) {
+            $where[] = "visitor_id IN (" . implode(',', array_fill(0, count($ids), '?')) . ")";
+            $types  .= str_repeat('i', count($ids));
+            array_push($params, ...$ids);
+        }
+        if (preg_match('/^\d{4}-\d{2}-\d{2}$/', $created_from)) {
+            $where[] = "created_at >= ?";
+            $types  .= 's';
+            $params[] = $created_from;
+        }
+        if (preg_match('/^\d{4}-\d{2}-\d{2}$/', $created_to)) {
+            $where[] = "created_at < DATE_ADD(?, INTERVAL 1 DAY)";
+            $types  .= 's';
+            $params[] = $created_to;
+        }
+        $order = "visitor_id DESC";
     }
-    
+
+    // Delta cursor for a full listing: taken before the page is read, so
+    // anything that changes in between is picked up by the next delta
+    $cursor = ['updated_at' => $since !== '' ? $since : '1970-01-01 00:00:00.000', 'visitor_id' => $since_id];
+    if ($delta_sync && $since === '') {
+        $res = $mysqli->query("SELECT updated_at, visitor_id FROM visitors ORDER BY updated_at DESC, visitor_id DESC LIMIT 1");
+        if ($res && ($top = $res->fetch_assoc())) {
+            $cursor = ['updated_at' => $top['updated_at'], 'visitor_id' => (int)$top['visitor_id']];
+        }
+    }
+
+    $sql = "SELECT $select FROM visitors"
+         . ($where ? " WHERE " . implode(' AND ', $where) : "")
+         . " ORDER BY $order"
+         . ($limit > 0 ? " LIMIT " . ($limit + 1) : "");  // one extra row tells us whether there is a next page
+
+    $stmt = $mysqli->prepare($sql);
+    if (!$stmt) throw new Exception("Prepare failed: " . $mysqli->error);
+    if ($params) {
+        $stmt->bind_param($types, ...$params);
+    }
+    if (!$stmt->execute()) {
+        throw new Exception("Query failed: " . $stmt->error);
+    }
+    $result = $stmt->get_result();
+
+    $now = new DateTimeImmutable('now', new DateTimeZone('Asia/Manila'));
     $data = [];
     while ($row = $result->fetch_assoc()) {
         // Check if expired using Philippines timezone
-        $now = new DateTimeImmutable('now', new DateTimeZone('Asia/Manila'));
-        $expiry = new DateTimeImmutable($row['expiry_at'], new DateTimeZone('Asia/Manila'));
-        $row['is_expired'] = $expiry < $now;
-        
+        if (isset($row['expiry_at'])) {
+            $expiry = new DateTimeImmutable($row['expiry_at'], new DateTimeZone('Asia/Manila'));
+            $row['is_expired'] = $expiry < $now;
+        }
+
         $data[] = $row;
     }
-    
-    echo json_encode(['ok' => true, 'data' => $data]);
-    
+
+    $more = false;
+    if ($limit > 0 && count($data) > $limit) {
+        array_pop($data);
+        $more = true;
+    }
+
+    $tombstones = [];
+    if ($since !== '') {
+        // The cursor is the newest (updated_at, visitor_id) this response covers
+        if ($data) {
+            $last = end($data);
+            $cursor = ['updated_at' => $last['updated_at'], 'visitor_id' => (int)$last['visitor_id']];
+        }
+
+        $del = $mysqli->prepare("SELECT visitor_id FROM visitor_tombstones WHERE deleted_at >= ?");
+        if ($del) {
+            $del->bind_param('s', $since);
+            $del->execute();
+            $res = $del->get_result();
+            while ($t = $res->fetch_assoc()) {
+                $tombstones[] = (int)$t['visitor_id'];
+            }
+        }
+    }
+
+    $response = [
+        'ok'         => true,
+        'data'       => $data,
+        'cursor'     => $cursor,
+        'more'       => $more,
+        'tombstones' => $tombstones
+    ];
+    if (!$delta_sync) {
+        unset($response['cursor'], $response['tombstones']);  // clients keep polling the full list
+    }
+    if (stripos($_SERVER['HTTP_ACCEPT'] ?? '', 'application/vnd.qrgate.columnar+json') !== false) {
+        unset($response['data']);
+        $response['columns'] = $data ? array_keys($data[0]) : $columns;
+        $response['rows'] = array_map('array_values', $data);
+        header('Content-Type: application/vnd.qrgate.columnar+json');
+    }
+    $body = json_encode($response);
+    $gzip = strlen($body) > 1024 && stripos($_SERVER['HTTP_ACCEPT_ENCODING'] ?? '', 'gzip') !== false;
+
+    // Conditional GET: a client that already has this exact answer gets a
+    // bodyless 304 (the dashboard polls the same query until something changes)
+    $etag = '"' . md5($body) . ($gzip ? '-gz' : '') . '"';
+    header('ETag: ' . $etag);
+    header('Cache-Control: no-cache');
+    header('Vary: Accept, Accept-Encoding');
+    $if_none_match = array_map('trim', explode(',', $_SERVER['HTTP_IF_NONE_MATCH'] ?? ''));
+    if (in_array($etag, $if_none_match, true)) {
+        http_response_code(304);
+        exit;
+    }
+    if ($gzip) {
+        header('Content-Encoding: gzip');
+        $body = gzencode($body, 6);
+    }
+    echo $body;
+
 } catch (Exception $e) {
     http_response_code(500);
     echo json_encode(['ok' => false, 'msg' => 'Database error: ' . $e->getMessage()]);
 }
 
-?>
\ No newline at end of file
+?>
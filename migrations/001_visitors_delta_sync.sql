@@ -0,0 +1,23 @@
+-- Delta sync support for get_visitors.php (?since=<updated_at>&since_id=<visitor_id>)
+--
+-- updated_at has millisecond precision so two changes in the same second
+-- still get distinct cursors; (updated_at, visitor_id) is the keyset the
+-- endpoint pages through.  Deleted visitors leave a tombstone so clients
+-- holding a replica can drop them.
+
+ALTER TABLE visitors
+    ADD COLUMN updated_at TIMESTAMP(3) NOT NULL
+        DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+    ADD INDEX idx_visitors_updated_at (updated_at, visitor_id);
+
+CREATE TABLE IF NOT EXISTS visitor_tombstones (
+    visitor_id INT NOT NULL PRIMARY KEY,
+    deleted_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    INDEX idx_visitor_tombstones_deleted_at (deleted_at)
+);
+
+DROP TRIGGER IF EXISTS visitors_after_delete;
+CREATE TRIGGER visitors_after_delete AFTER DELETE ON visitors
+FOR EACH ROW
+    INSERT INTO visitor_tombstones (visitor_id) VALUES (OLD.visitor_id)
+    ON DUPLICATE KEY UPDATE deleted_at = CURRENT_TIMESTAMP(3);
@@ -0,0 +1,37 @@
+-- Change events for events.php (server-sent events to the dashboard)
+--
+-- Every write to visitors, and every scan logged by check.php / log_exit.php,
+-- appends a row here.  events.php streams them to subscribers in event_id
+-- order; a subscriber that reconnects resumes from its Last-Event-ID.  Rows
+-- older than a day are pruned by events.php, so a client that was away
+-- longer is told to resync through get_visitors.php instead.
+
+CREATE TABLE IF NOT EXISTS visitor_events (
+    event_id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    visitor_id INT NOT NULL,
+    kind ENUM('change', 'scan', 'delete') NOT NULL,
+    created_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    INDEX idx_visitor_events_created_at (created_at)
+);
+
+DROP TRIGGER IF EXISTS visitors_after_insert_event;
+CREATE TRIGGER visitors_after_insert_event AFTER INSERT ON visitors
+FOR EACH ROW
+    INSERT INTO visitor_events (visitor_id, kind) VALUES (NEW.visitor_id, 'change');
+
+DROP TRIGGER IF EXISTS visitors_after_update_event;
+CREATE TRIGGER visitors_after_update_event AFTER UPDATE ON visitors
+FOR EACH ROW
+    INSERT INTO visitor_events (visitor_id, kind) VALUES (NEW.visitor_id, 'change');
+
+DROP TRIGGER IF EXISTS visitors_after_delete_event;
+CREATE TRIGGER visitors_after_delete_event AFTER DELETE ON visitors
+FOR EACH ROW FOLLOWS visitors_after_delete
+    INSERT INTO visitor_events (visitor_id, kind) VALUES (OLD.visitor_id, 'delete');
+
+-- Scans of unknown QR codes have no visitor_id and are not visitor events
+DROP TRIGGER IF EXISTS logs_after_insert_event;
+CREATE TRIGGER logs_after_insert_event AFTER INSERT ON logs
+FOR EACH ROW
+    INSERT INTO visitor_events (visitor_id, kind)
+    SELECT NEW.visitor_id, 'scan' FROM DUAL WHERE NEW.visitor_id IS NOT NULL;
@@ -0,0 +1,14 @@
+-- Batched scan writes from gate_aggregator.py (check_batch.php)
+--
+-- The aggregator answers scanners itself and sends the logs rows later,
+-- in batches.  scan_id identifies a scan across retries, so a batch that
+-- is sent again after a timeout is not logged twice; scanned_at is when
+-- the gate saw the QR code (the insert can be seconds later, or much
+-- later after an outage); gate names the aggregator.  All three stay
+-- NULL for scans logged directly by check.php and log_exit.php.
+
+ALTER TABLE logs
+    ADD COLUMN scan_id CHAR(32) NULL,
+    ADD COLUMN scanned_at DATETIME NULL,
+    ADD COLUMN gate VARCHAR(64) NULL,
+    ADD UNIQUE INDEX uq_logs_scan_id (scan_id);
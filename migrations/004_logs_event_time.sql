@@ -0,0 +1,16 @@
+-- Scan analytics (get_logs.php, visitor_analytics.py)
+--
+-- logs rows need a time to be analysed by.  logged_at is when the row was
+-- inserted; event_at is when the scan happened, which is scanned_at for
+-- scans sent in batches by gate_aggregator.py (seconds or, after an
+-- outage, hours before the insert) and logged_at otherwise.  get_logs.php
+-- reads one day at a time, in (event_at, log_id) order, from the index.
+--
+-- Rows that exist before this migration get the time it runs.  If logs
+-- already has an insert-time column of its own, copy it over afterwards,
+-- e.g.  UPDATE logs SET logged_at = created_at;
+
+ALTER TABLE logs
+    ADD COLUMN logged_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ADD COLUMN event_at DATETIME AS (COALESCE(scanned_at, logged_at)) STORED,
+    ADD INDEX idx_logs_event_at (event_at, log_id);
@@ -0,0 +1,62 @@
+-- Range digests of the visitors table for digests.php (visitor_digest.py)
+--
+-- A row's digest is CRC32 over the fields the dashboard shows, joined with
+-- CHAR(31), NULL as ''; the dashboard computes the same from the rows it
+-- holds (visitor_record.row_digest), so both must list the same fields in
+-- the same order.  Rows are grouped into leaves of 64 visitor ids, each
+-- kept as (row count, XOR of the row digests) by the triggers below, so a
+-- write costs one small upsert and digests.php never reads visitors.
+-- TIMESTAMP columns render in the session time zone, which every
+-- endpoint sets to +08:00 (db.php).
+
+CREATE TABLE IF NOT EXISTS visitor_digests (
+    leaf INT NOT NULL PRIMARY KEY,  -- visitor_id DIV 64
+    row_count INT NOT NULL,
+    digest INT UNSIGNED NOT NULL
+);
+
+DROP TRIGGER IF EXISTS visitors_after_insert_digest;
+CREATE TRIGGER visitors_after_insert_digest AFTER INSERT ON visitors
+FOR EACH ROW
+    INSERT INTO visitor_digests (leaf, row_count, digest)
+    VALUES (NEW.visitor_id DIV 64, 1, CRC32(CONCAT_WS(CHAR(31), NEW.visitor_id,
+        IFNULL(NEW.full_name, ''), IFNULL(NEW.email, ''), IFNULL(NEW.phone, ''), IFNULL(NEW.purpose, ''),
+        IFNULL(NEW.host, ''), IFNULL(NEW.qr_code, ''), IFNULL(NEW.expiry_at, ''), IFNULL(NEW.last_status, ''),
+        IFNULL(NEW.last_scan, ''), IFNULL(NEW.entry_scan, ''), IFNULL(NEW.exit_time, ''), IFNULL(NEW.created_at, '')))))
+    ON DUPLICATE KEY UPDATE row_count = row_count + 1, digest = digest ^ VALUES(digest);
+
+-- visitor_id never changes, so an update only swaps the row's digest within its leaf
+DROP TRIGGER IF EXISTS visitors_after_update_digest;
+CREATE TRIGGER visitors_after_update_digest AFTER UPDATE ON visitors
+FOR EACH ROW
+    UPDATE visitor_digests SET digest = digest
+        ^ CRC32(CONCAT_WS(CHAR(31), OLD.visitor_id,
+            IFNULL(OLD.full_name, ''), IFNULL(OLD.email, ''), IFNULL(OLD.phone, ''), IFNULL(OLD.purpose, ''),
+            IFNULL(OLD.host, ''), IFNULL(OLD.qr_code, ''), IFNULL(OLD.expiry_at, ''), IFNULL(OLD.last_status, ''),
+            IFNULL(OLD.last_scan, ''), IFNULL(OLD.entry_scan, ''), IFNULL(OLD.exit_time, ''), IFNULL(OLD.created_at, '')))
+        ^ CRC32(CONCAT_WS(CHAR(31), NEW.visitor_id,
+            IFNULL(NEW.full_name, ''), IFNULL(NEW.email, ''), IFNULL(NEW.phone, ''), IFNULL(NEW.purpose, ''),
+            IFNULL(NEW.host, ''), IFNULL(NEW.qr_code, ''), IFNULL(NEW.expiry_at, ''), IFNULL(NEW.last_status, ''),
+            IFNULL(NEW.last_scan, ''), IFNULL(NEW.entry_scan, ''), IFNULL(NEW.exit_time, ''), IFNULL(NEW.created_at, '')))
+    WHERE leaf = NEW.visitor_id DIV 64;
+
+DROP TRIGGER IF EXISTS visitors_after_delete_digest;
+CREATE TRIGGER visitors_after_delete_digest AFTER DELETE ON visitors
+FOR EACH ROW
+    UPDATE visitor_digests SET row_count = row_count - 1, digest = digest
+        ^ CRC32(CONCAT_WS(CHAR(31), OLD.visitor_id,
+            IFNULL(OLD.full_name, ''), IFNULL(OLD.email, ''), IFNULL(OLD.phone, ''), IFNULL(OLD.purpose, ''),
+            IFNULL(OLD.host, ''), IFNULL(OLD.qr_code, ''), IFNULL(OLD.expiry_at, ''), IFNULL(OLD.last_status, ''),
+            IFNULL(OLD.last_scan, ''), IFNULL(OLD.entry_scan, ''), IFNULL(OLD.exit_time, ''), IFNULL(OLD.created_at, '')))
+    WHERE leaf = OLD.visitor_id DIV 64;
+
+-- Existing rows.  Run this part again (it starts from scratch) if visitors
+-- was written to while the triggers were being created.
+DELETE FROM visitor_digests;
+INSERT INTO visitor_digests (leaf, row_count, digest)
+SELECT visitor_id DIV 64, COUNT(*), BIT_XOR(CRC32(CONCAT_WS(CHAR(31), visitor_id,
+    IFNULL(full_name, ''), IFNULL(email, ''), IFNULL(phone, ''), IFNULL(purpose, ''),
+    IFNULL(host, ''), IFNULL(qr_code, ''), IFNULL(expiry_at, ''), IFNULL(last_status, ''),
+    IFNULL(last_scan, ''), IFNULL(entry_scan, ''), IFNULL(exit_time, ''), IFNULL(created_at, ''))))
+FROM visitors
+GROUP BY visitor_id DIV 64;
@@ -0,0 +1,155 @@
+"""Refresh-path timings and counters, for the overlay and a /metrics endpoint.
+
+``Metrics`` keeps the last WINDOW durations of every phase (network,
+decode, normalize, status, filter, widgets, ...) plus running totals,
+and named counters and gauges.  The feed's phases are recorded on the
+worker thread and the UI's on the Tk thread, so everything is guarded
+by one lock; recording is a perf_counter pair and a deque append.
+
+``collectors`` are callables run before the numbers are read, for values
+that are cheaper to sample than to track (cache hit rates, row counts).
+``MetricsServer`` serves the Prometheus text format on a local port.
+Like visitor_engine, this module does not import tkinter.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WINDOW = 200  # recent samples per phase the percentiles are taken from
+
+
+def percentile(samples, share):
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * share))]
+
+
+def metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+class Metrics:
+    """Rolling phase timings (ms), counters and gauges, safe to record from any thread."""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {}  # phase -> deque of recent durations in ms
+        self.totals = {}  # phase -> [count, sum of ms] since start
+        self.counters = {}
+        self.gauges = {}
+        self.collectors = []
+
+    def observe(self, phase, ms):
+        with self.lock:
+            samples = self.samples.get(phase)
+            if samples is None:
+                samples = self.samples[phase] = deque(maxlen=self.window)
+                self.totals[phase] = [0, 0.0]
+            samples.append(ms)
+            total = self.totals[phase]
+            total[0] += 1
+            total[1] += ms
+
+    @contextmanager
+    def timed(self, phase):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, (time.perf_counter() - started) * 1000)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def collect(self):
+        for collector in self.collectors:
+            collector(self)
+
+    def phases(self):
+        """{phase: {"last", "mean", "p50", "p95", "max", "count", "sum"}} over the recent window."""
+        with self.lock:
+            recent = {phase: list(samples) for phase, samples in self.samples.items()}
+            totals = {phase: tuple(total) for phase, total in self.totals.items()}
+        result = {}
+        for phase, samples in recent.items():
+            ordered = sorted(samples)
+            result[phase] = {
+                "last": samples[-1],
+                "mean": sum(samples) / len(samples),
+                "p50": percentile(ordered, 0.5),
+                "p95": percentile(ordered, 0.95),
+                "max": ordered[-1],
+                "count": totals[phase][0],
+                "sum": totals[phase][1],
+            }
+        return result
+
+    def prometheus(self, prefix="qrgate"):
+        """The current numbers in the Prometheus text exposition format."""
+        self.collect()
+        lines = [f"# HELP {prefix}_phase_ms Duration of one refresh phase, recent window quantiles.",
+                 f"# TYPE {prefix}_phase_ms summary"]
+        for phase, stats in sorted(self.phases().items()):
+            label = f'phase="{metric_name(phase)}"'
+            for quantile in ("0.5", "0.95"):
+                value = stats["p50" if quantile == "0.5" else "p95"]
+                lines.append(f'{prefix}_phase_ms{{{label},quantile="{quantile}"}} {value:.3f}')
+            lines.append(f"{prefix}_phase_ms_sum{{{label}}} {stats['sum']:.3f}")
+            lines.append(f"{prefix}_phase_ms_count{{{label}}} {stats['count']}")
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+        for name, value in counters:
+            lines.append(f"# TYPE {prefix}_{metric_name(name)}_total counter")
+            lines.append(f"{prefix}_{metric_name(name)}_total {value}")
+        for name, value in gauges:
+            lines.append(f"# TYPE {prefix}_{metric_name(name)} gauge")
+            lines.append(f"{prefix}_{metric_name(name)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    metrics = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.metrics.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """``GET /metrics`` for ``metrics`` on a daemon thread (localhost unless told otherwise)."""
+
+    def __init__(self, metrics, port, host="127.0.0.1"):
+        handler = type("BoundMetricsHandler", (MetricsHandler,), {"metrics": metrics})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
@@ -0,0 +1,91 @@
+"""When to poll get_visitors.php next.
+
+PollScheduler picks every delay from what the recent fetches showed
+instead of a fixed interval:
+
+* consecutive failures back off exponentially, with jitter so the gate
+  PCs do not retry a recovering server in lockstep;
+* while the push stream is connected, polling is only a safety net;
+* a fetch that returned changes keeps the next few polls short, and so
+  do the configured gate peak hours;
+* a long run of unchanged fetches stretches the interval.
+
+``reason`` names the rule behind the last delay, for the status panel.
+Like visitor_engine, this module does not import tkinter.
+"""
+
+import random
+from datetime import datetime, time as clock_time
+
+BASE_INTERVAL = 15  # seconds; the old fixed UPDATE_INTERVAL
+BUSY_INTERVAL = 3  # after a fetch that returned changes
+BUSY_POLLS = 3  # short polls that follow one change
+PEAK_INTERVAL = 5
+PEAK_HOURS = [("07:00", "09:30"), ("11:30", "13:00"), ("16:30", "18:30")]  # gate rush hours
+IDLE_INTERVAL = 60  # ceiling when nothing has changed for a while
+IDLE_AFTER = 8  # unchanged fetches before the interval starts stretching
+BACKOFF_MAX = 300
+JITTER = 0.1  # +/- share of every healthy interval
+
+
+def parse_clock(text):
+    hours, minutes = text.split(":")
+    return clock_time(int(hours), int(minutes))
+
+
+class PollScheduler:
+    """Adaptive delay between feed polls; fed one FetchSnapshot at a time."""
+
+    def __init__(self, interval=BASE_INTERVAL, peak_hours=PEAK_HOURS, rng=None):
+        self.interval = interval
+        self.peak_hours = [(parse_clock(start), parse_clock(end)) for start, end in peak_hours]
+        self.rng = rng or random.Random()
+        self.failures = 0  # consecutive failed fetches
+        self.last_error = None
+        self.last_error_at = None
+        self.busy = 0  # short polls left since the last change
+        self.unchanged = 0  # consecutive fetches without changes
+        self.delay = interval
+        self.reason = "starting"
+
+    def record(self, snapshot):
+        """Note the outcome of a poll (page loads are not polls)."""
+        if snapshot.error:
+            self.failures += 1
+            self.last_error = snapshot.error
+            self.last_error_at = datetime.now()
+            return
+        self.failures = 0
+        if snapshot.not_modified or (snapshot.delta and not snapshot.visitors and not snapshot.tombstones):
+            self.unchanged += 1
+            self.busy = max(0, self.busy - 1)
+        else:
+            self.unchanged = 0
+            self.busy = BUSY_POLLS
+
+    def in_peak(self, now):
+        moment = now.time()
+        return any(start <= moment < end for start, end in self.peak_hours)
+
+    def next_delay(self, now=None, push_interval=None):
+        """Seconds until the next poll; ``push_interval`` applies while a push stream is connected."""
+        now = now or datetime.now()
+        if self.failures:
+            # "Equal jitter": at least half the backoff, so retries still spread out
+            ceiling = min(BACKOFF_MAX, self.interval * 2 ** (self.failures - 1))
+            self.delay = ceiling / 2 + self.rng.uniform(0, ceiling / 2)
+            self.reason = f"backing off after {self.failures} failure{'s' if self.failures > 1 else ''}"
+            return self.delay
+        if push_interval is not None:
+            delay, self.reason = push_interval, "push stream connected"
+        elif self.busy:
+            delay, self.reason = BUSY_INTERVAL, "busy: recent changes"
+        elif self.in_peak(now):
+            delay, self.reason = PEAK_INTERVAL, "gate peak hours"
+        elif self.unchanged >= IDLE_AFTER:
+            steps = self.unchanged - IDLE_AFTER + 1
+            delay, self.reason = min(IDLE_INTERVAL, self.interval * (1 + steps / IDLE_AFTER)), "idle: no changes"
+        else:
+            delay, self.reason = self.interval, "normal"
+        self.delay = delay * (1 + self.rng.uniform(-JITTER, JITTER))
+        return self.delay
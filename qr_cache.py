@@ -0,0 +1,135 @@
+"""Two-tier cache for QR thumbnails.
+
+``LRUCache`` is a bounded in-memory map (the dashboard keeps Tk PhotoImages
+in it); ``DiskThumbnailStore`` keeps the encoded PNG bytes on disk so a
+restarted dashboard does not have to render or download them again.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Mapping with a fixed capacity that drops the least recently used entry."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+        }
+
+
+class DiskThumbnailStore:
+    """Content-addressed PNG store with a total size cap.
+
+    Files are named after a SHA-256 of the key, so QR tokens never appear
+    in file names.  When the store grows past ``max_bytes`` the least
+    recently used files are deleted.  Safe to call from worker threads.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.index = OrderedDict()  # file name -> size, least recently used first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith(".png"):
+                st = entry.stat()
+                files.append((st.st_atime, entry.name, st.st_size))
+        for _, name, size in sorted(files):
+            self.index[name] = size
+            self.total_bytes += size
+
+    @staticmethod
+    def file_name(key):
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + ".png"
+
+    def get(self, key):
+        name = self.file_name(key)
+        with self.lock:
+            if name not in self.index:
+                self.misses += 1
+                return None
+            self.index.move_to_end(name)
+        try:
+            with open(os.path.join(self.directory, name), "rb") as f:
+                data = f.read()
+        except OSError:
+            with self.lock:
+                self.total_bytes -= self.index.pop(name, 0)
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        name = self.file_name(key)
+        # Write to a temp file first so a crash never leaves a half-written PNG
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+
+        with self.lock:
+            self.total_bytes += len(data) - self.index.pop(name, 0)
+            self.index[name] = len(data)
+            while self.total_bytes > self.max_bytes and len(self.index) > 1:
+                old_name, size = self.index.popitem(last=False)
+                self.total_bytes -= size
+                self.evictions += 1
+                try:
+                    os.remove(os.path.join(self.directory, old_name))
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.index),
+                "bytes": self.total_bytes,
+            }
@@ -0,0 +1,346 @@
+"""Minimal offline QR Code encoder used for the dashboard thumbnails.
+
+Encodes a string in byte mode (versions 1-10, any error correction level)
+and returns the module matrix, so the dashboard can draw visitor QR codes
+without calling a third-party service.  Follows ISO/IEC 18004; the mask is
+chosen with the standard penalty rules.
+"""
+
+import re
+import struct
+import zlib
+
+# Error correction level -> format-info bits
+ECC_FORMAT_BITS = {"L": 1, "M": 0, "Q": 3, "H": 2}
+
+# version -> level -> (ec codewords per block, [(block count, data codewords per block), ...])
+EC_BLOCKS = {
+    1: {"L": (7, [(1, 19)]), "M": (10, [(1, 16)]), "Q": (13, [(1, 13)]), "H": (17, [(1, 9)])},
+    2: {"L": (10, [(1, 34)]), "M": (16, [(1, 28)]), "Q": (22, [(1, 22)]), "H": (28, [(1, 16)])},
+    3: {"L": (15, [(1, 55)]), "M": (26, [(1, 44)]), "Q": (18, [(2, 17)]), "H": (22, [(2, 13)])},
+    4: {"L": (20, [(1, 80)]), "M": (18, [(2, 32)]), "Q": (26, [(2, 24)]), "H": (16, [(4, 9)])},
+    5: {"L": (26, [(1, 108)]), "M": (24, [(2, 43)]), "Q": (18, [(2, 15), (2, 16)]),
+        "H": (22, [(2, 11), (2, 12)])},
+    6: {"L": (18, [(2, 68)]), "M": (16, [(4, 27)]), "Q": (24, [(4, 19)]), "H": (28, [(4, 15)])},
+    7: {"L": (20, [(2, 78)]), "M": (18, [(4, 31)]), "Q": (18, [(2, 14), (4, 15)]),
+        "H": (26, [(4, 13), (1, 14)])},
+    8: {"L": (24, [(2, 97)]), "M": (22, [(2, 38), (2, 39)]), "Q": (22, [(4, 18), (2, 19)]),
+        "H": (26, [(4, 14), (2, 15)])},
+    9: {"L": (30, [(2, 116)]), "M": (22, [(3, 36), (2, 37)]), "Q": (20, [(4, 16), (4, 17)]),
+        "H": (24, [(4, 12), (4, 13)])},
+    10: {"L": (18, [(2, 68), (2, 69)]), "M": (26, [(4, 43), (1, 44)]), "Q": (24, [(6, 19), (2, 20)]),
+         "H": (28, [(6, 15), (2, 16)])},
+}
+
+ALIGNMENT_POSITIONS = {
+    1: [], 2: [6, 18], 3: [6, 22], 4: [6, 26], 5: [6, 30],
+    6: [6, 34], 7: [6, 22, 38], 8: [6, 24, 42], 9: [6, 26, 46], 10: [6, 28, 50],
+}
+
+MASKS = [
+    lambda x, y: (x + y) % 2 == 0,
+    lambda x, y: y % 2 == 0,
+    lambda x, y: x % 3 == 0,
+    lambda x, y: (x + y) % 3 == 0,
+    lambda x, y: (x // 3 + y // 2) % 2 == 0,
+    lambda x, y: x * y % 2 + x * y % 3 == 0,
+    lambda x, y: (x * y % 2 + x * y % 3) % 2 == 0,
+    lambda x, y: ((x + y) % 2 + x * y % 3) % 2 == 0,
+]
+
+_RUN = re.compile(r"0{5,}|1{5,}")
+_FINDER_LIKE = ("10111010000", "00001011101")
+
+# GF(256) arithmetic with the QR polynomial x^8 + x^4 + x^3 + x^2 + 1
+_EXP = [0] * 512
+_LOG = [0] * 256
+_value = 1
+for _i in range(255):
+    _EXP[_i] = _value
+    _LOG[_value] = _i
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= 0x11D
+for _i in range(255, 512):
+    _EXP[_i] = _EXP[_i - 255]
+
+_divisor_cache = {}
+_flip_cache = {}
+
+
+def _gf_mul(x, y):
+    if x == 0 or y == 0:
+        return 0
+    return _EXP[_LOG[x] + _LOG[y]]
+
+
+def _rs_divisor(degree):
+    divisor = _divisor_cache.get(degree)
+    if divisor is None:
+        divisor = [0] * (degree - 1) + [1]
+        root = 1
+        for _ in range(degree):
+            for j in range(degree):
+                divisor[j] = _gf_mul(divisor[j], root)
+                if j + 1 < degree:
+                    divisor[j] ^= divisor[j + 1]
+            root = _gf_mul(root, 0x02)
+        _divisor_cache[degree] = divisor
+    return divisor
+
+
+def _rs_remainder(data, degree):
+    divisor = _rs_divisor(degree)
+    result = [0] * degree
+    for byte in data:
+        factor = byte ^ result.pop(0)
+        result.append(0)
+        if factor:
+            for i, coef in enumerate(divisor):
+                result[i] ^= _gf_mul(coef, factor)
+    return result
+
+
+def _data_capacity(version, ecc):
+    return sum(count * size for count, size in EC_BLOCKS[version][ecc][1])
+
+
+def _encode_codewords(payload, version, ecc):
+    """Byte-mode bit stream, padded, split into blocks and interleaved with EC codewords."""
+    capacity_bits = _data_capacity(version, ecc) * 8
+    count_bits = 8 if version <= 9 else 16
+
+    bits = [0, 1, 0, 0]
+    bits += [(len(payload) >> i) & 1 for i in reversed(range(count_bits))]
+    for byte in payload:
+        bits += [(byte >> i) & 1 for i in reversed(range(8))]
+    bits += [0] * min(4, capacity_bits - len(bits))
+    bits += [0] * (-len(bits) % 8)
+
+    data = [int("".join(map(str, bits[i:i + 8])), 2) for i in range(0, len(bits), 8)]
+    pad = 0xEC
+    while len(data) < capacity_bits // 8:
+        data.append(pad)
+        pad ^= 0xEC ^ 0x11
+
+    ec_len, groups = EC_BLOCKS[version][ecc]
+    blocks = []
+    offset = 0
+    for count, size in groups:
+        for _ in range(count):
+            block = data[offset:offset + size]
+            offset += size
+            blocks.append((block, _rs_remainder(block, ec_len)))
+
+    result = []
+    for i in range(max(len(block) for block, _ in blocks)):
+        result += [block[i] for block, _ in blocks if i < len(block)]
+    for i in range(ec_len):
+        result += [ec[i] for _, ec in blocks]
+    return result
+
+
+class _Matrix:
+    def __init__(self, version):
+        self.version = version
+        self.size = version * 4 + 17
+        self.modules = [[False] * self.size for _ in range(self.size)]
+        self.function = [[False] * self.size for _ in range(self.size)]
+
+    def set_function(self, x, y, dark):
+        self.modules[y][x] = dark
+        self.function[y][x] = True
+
+    def draw_function_patterns(self):
+        size = self.size
+        for i in range(size):
+            self.set_function(6, i, i % 2 == 0)
+            self.set_function(i, 6, i % 2 == 0)
+
+        for cx, cy in ((3, 3), (size - 4, 3), (3, size - 4)):
+            for dy in range(-4, 5):
+                for dx in range(-4, 5):
+                    x, y = cx + dx, cy + dy
+                    if 0 <= x < size and 0 <= y < size:
+                        self.set_function(x, y, max(abs(dx), abs(dy)) not in (2, 4))
+
+        positions = ALIGNMENT_POSITIONS[self.version]
+        last = len(positions) - 1
+        for i, cx in enumerate(positions):
+            for j, cy in enumerate(positions):
+                if (i, j) in ((0, 0), (0, last), (last, 0)):
+                    continue
+                for dy in range(-2, 3):
+                    for dx in range(-2, 3):
+                        self.set_function(cx + dx, cy + dy, max(abs(dx), abs(dy)) != 1)
+
+        # Reserve the format areas now; real bits are written once the mask is known
+        self.draw_format_bits("M", 0)
+
+        if self.version >= 7:
+            rem = self.version
+            for _ in range(12):
+                rem = (rem << 1) ^ ((rem >> 11) * 0x1F25)
+            bits = self.version << 12 | rem
+            for i in range(18):
+                dark = (bits >> i) & 1 == 1
+                a, b = size - 11 + i % 3, i // 3
+                self.set_function(a, b, dark)
+                self.set_function(b, a, dark)
+
+    def draw_format_bits(self, ecc, mask):
+        data = ECC_FORMAT_BITS[ecc] << 3 | mask
+        rem = data
+        for _ in range(10):
+            rem = (rem << 1) ^ ((rem >> 9) * 0x537)
+        bits = (data << 10 | rem) ^ 0x5412
+        bit = [(bits >> i) & 1 == 1 for i in range(15)]
+        size = self.size
+
+        for i in range(6):
+            self.set_function(8, i, bit[i])
+        self.set_function(8, 7, bit[6])
+        self.set_function(8, 8, bit[7])
+        self.set_function(7, 8, bit[8])
+        for i in range(9, 15):
+            self.set_function(14 - i, 8, bit[i])
+
+        for i in range(8):
+            self.set_function(size - 1 - i, 8, bit[i])
+        for i in range(8, 15):
+            self.set_function(8, size - 15 + i, bit[i])
+        self.set_function(8, size - 8, True)  # dark module
+
+    def draw_codewords(self, codewords):
+        size = self.size
+        total_bits = len(codewords) * 8
+        i = 0
+        right = size - 1
+        while right >= 1:
+            if right == 6:
+                right = 5
+            upward = ((right + 1) & 2) == 0
+            for vert in range(size):
+                y = size - 1 - vert if upward else vert
+                for x in (right, right - 1):
+                    if not self.function[y][x] and i < total_bits:
+                        self.modules[y][x] = (codewords[i >> 3] >> (7 - (i & 7))) & 1 == 1
+                        i += 1
+            right -= 2
+
+    def bit_rows(self):
+        """Each row as an int, leftmost module in the most significant bit."""
+        return [int("".join("1" if m else "0" for m in row), 2) for row in self.modules]
+
+    def mask_rows(self, mask):
+        """Per-row XOR masks that flip the data modules selected by ``mask`` (cached per version)."""
+        key = (self.version, mask)
+        flips = _flip_cache.get(key)
+        if flips is None:
+            rule = MASKS[mask]
+            flips = [
+                int("".join("1" if not fixed[x] and rule(x, y) else "0" for x in range(self.size)), 2)
+                for y, fixed in enumerate(self.function)
+            ]
+            _flip_cache[key] = flips
+        return flips
+
+
+def _penalty(rows, size):
+    """Standard mask penalty (rules N1-N4) over rows given as ints."""
+    lines = [format(row, f"0{size}b") for row in rows]
+    cols = ["".join(col) for col in zip(*lines)]
+    score = 0
+
+    for line in lines + cols:
+        # N1: runs of five or more same-colored modules
+        for run in _RUN.findall(line):
+            score += len(run) - 2
+        # N3: finder-like 1:1:3:1:1 patterns with four light modules on one side
+        score += 40 * (line.count(_FINDER_LIKE[0]) + line.count(_FINDER_LIKE[1]))
+
+    # N2: 2x2 blocks of one color
+    full = (1 << size) - 1
+    for top, bottom in zip(rows, rows[1:]):
+        dark = top & bottom
+        light = ~(top | bottom) & full
+        score += 3 * (bin(dark & (dark >> 1)).count("1") + bin(light & (light >> 1)).count("1"))
+
+    # N4: dark/light balance
+    total = size * size
+    dark = sum(line.count("1") for line in lines)
+    score += ((abs(dark * 20 - total * 10) + total - 1) // total - 1) * 10
+    return score
+
+
+def _encode_lines(text, ecc, mask=None):
+    payload = text.encode("utf-8")
+    for version in range(1, 11):
+        count_bits = 8 if version <= 9 else 16
+        if 4 + count_bits + len(payload) * 8 <= _data_capacity(version, ecc) * 8:
+            break
+    else:
+        raise ValueError(f"QR payload too long ({len(payload)} bytes)")
+
+    matrix = _Matrix(version)
+    matrix.draw_function_patterns()
+    matrix.draw_codewords(_encode_codewords(payload, version, ecc))
+
+    best_rows, best_score = None, None
+    for mask in range(8) if mask is None else [mask]:
+        matrix.draw_format_bits(ecc, mask)
+        rows = [row ^ flip for row, flip in zip(matrix.bit_rows(), matrix.mask_rows(mask))]
+        score = _penalty(rows, matrix.size)
+        if best_score is None or score < best_score:
+            best_rows, best_score = rows, score
+    return [format(row, f"0{matrix.size}b") for row in best_rows]
+
+
+def encode(text, ecc="M", mask=None):
+    """Return the QR module matrix for ``text`` as rows of booleans (True = dark), without quiet zone.
+
+    ``mask`` (0-7) forces a mask pattern instead of the lowest-penalty one.
+    """
+    return [[m == "1" for m in line] for line in _encode_lines(text, ecc, mask)]
+
+
+def thumbnail_png(text, size, border=2, ecc="M"):
+    """A ``size`` x ``size`` grayscale PNG of the QR code for ``text``.
+
+    Each module becomes an integer number of pixels (never resampled); the
+    code is centred on a white square with at least ``border`` light modules
+    of quiet zone.  Raises ValueError if that does not fit in ``size`` pixels,
+    since a cropped code would not scan.
+    """
+    modules = _encode_lines(text, ecc)
+    span = len(modules) + 2 * border
+    if span > size:
+        raise ValueError(f"QR code needs {span} px with its quiet zone, thumbnail is {size} px")
+    scale = size // span
+    offset = (size - span * scale) // 2 + border * scale
+
+    blank = b"\xff" * size
+    rows = [blank] * offset
+    for module_row in modules:
+        pixels = bytearray(blank)
+        for x, module in enumerate(module_row):
+            if module == "1":
+                start = offset + x * scale
+                pixels[start:start + scale] = b"\x00" * scale
+        rows += [bytes(pixels)] * scale
+    rows += [blank] * (size - len(rows))
+    return _png(rows, size)
+
+
+def _png(rows, size):
+    """Minimal 8-bit grayscale PNG writer (Tk 8.6 and PIL both read it)."""
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    raw = b"".join(b"\x00" + row for row in rows)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
@@ -0,0 +1,172 @@
+"""Command-line front end to the visitor engine, for gate servers, kiosks and cron.
+
+    python -m qrgate stats [--watch SECONDS]
+    python -m qrgate list [--status Inside] [--search text] [--limit N] [--watch SECONDS]
+    python -m qrgate status ID [ID ...]
+    python -m qrgate export FILE [--from YYYY-MM-DD] [--to YYYY-MM-DD] [--status S]
+
+Every command takes ``--json`` for machine-readable output and
+``--api-url`` to point at another get_visitors.php.  Neither tkinter nor
+PIL is imported.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from datetime import datetime
+
+from visitor_engine import API_URL, DELTA_PAGE_SIZE, FEED_FIELDS, FeedError, VisitorEngine
+from visitor_record import STATUSES
+
+LIST_COLUMNS = ["visitor_id", "full_name", "host", "expiry_at", "last_scan"]
+
+
+def visitor_json(record, now):
+    data = {key: record.get(key) for key in FEED_FIELDS.split(",")}
+    data["status"] = record.status_at(now)
+    data["duration"] = record.duration_text(now)
+    return data
+
+
+def print_stats(engine, args):
+    stats = engine.stats()
+    if args.json:
+        print(json.dumps(dict(stats, at=datetime.now().isoformat(timespec="seconds"))), flush=True)
+    else:
+        counts = "  ".join(f"{status} {stats[status]}" for status in STATUSES)
+        print(f"{datetime.now():%Y-%m-%d %H:%M:%S}  Total {stats['Total']}  {counts}", flush=True)
+
+
+def print_visitors(records, args):
+    now = datetime.now()
+    if args.json:
+        print(json.dumps([visitor_json(r, now) for r in records]), flush=True)
+        return
+    for r in records:
+        print(f"{r.visitor_id:>7}  {r.status_at(now):8} {r.duration_text(now):>10}  "
+              f"{r.get('full_name', '')}  ({r.get('host', '')})")
+    print(f"{len(records)} visitors", flush=True)
+
+
+def watch(engine, args, show):
+    """Run ``show`` now and then after every delta refresh, until Ctrl+C."""
+    show()
+    if not args.watch:
+        return
+    try:
+        while True:
+            time.sleep(args.watch)
+            try:
+                if engine.refresh():
+                    show()
+            except FeedError as e:
+                print(f"refresh failed: {e}", file=sys.stderr, flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+def cmd_stats(engine, args):
+    engine.load_all()
+    watch(engine, args, lambda: print_stats(engine, args))
+
+
+def cmd_list(engine, args):
+    engine.load_all()
+
+    def show():
+        now = datetime.now()
+        records = engine.rows.rows()
+        if args.search:
+            records = engine.search.search(args.search.lower(), records)
+        if args.status:
+            records = [r for r in records if r.status_at(now) == args.status]
+        print_visitors(records[:args.limit] if args.limit else records, args)
+
+    watch(engine, args, show)
+
+
+def cmd_status(engine, args):
+    page = engine.feed.page({'ids': ",".join(args.ids), 'limit': len(args.ids), 'key': None})
+    if page.error:
+        raise FeedError(page.error)
+    found = {r.visitor_id: r for r in page.visitors}
+    code = 0 if all(vid in found for vid in args.ids) else 1  # the same in both output formats
+    now = datetime.now()
+    if args.json:
+        print(json.dumps({vid: visitor_json(found[vid], now) if vid in found else None for vid in args.ids}))
+        return code
+    for vid in args.ids:
+        record = found.get(vid)
+        if record is None:
+            print(f"{vid:>7}  not found")
+        else:
+            print(f"{vid:>7}  {record.status_at(now):8} {record.duration_text(now):>10}  {record.get('full_name', '')}")
+    return code
+
+
+def cmd_export(engine, args):
+    from visitor_export import ExportJob, server_batches
+
+    params = {'fields': FEED_FIELDS}
+    for key, value in (('created_from', args.date_from), ('created_to', args.date_to),
+                       ('status', args.status), ('q', args.search)):
+        if value:
+            params[key] = value
+    job = ExportJob(args.file, server_batches(engine.feed.fetch, params, DELTA_PAGE_SIZE))
+    job.run()  # on this thread; the CLI has nothing else to do
+    if job.error:
+        raise FeedError(job.error)
+    if args.json:
+        print(json.dumps({"file": args.file, "rows": job.rows_written}))
+    else:
+        print(f"Exported {job.rows_written} rows to {args.file}")
+
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--api-url", default=API_URL, help="get_visitors.php URL")
+    common.add_argument("--json", action="store_true", help="print JSON instead of text")
+    common.add_argument("-v", "--verbose", action="store_true", help="log every request to stderr")
+
+    parser = argparse.ArgumentParser(prog="python -m qrgate", description=__doc__.split("\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("stats", parents=[common], help="visitor counts per status")
+    p.add_argument("--watch", type=float, metavar="SECONDS", help="keep printing after every change")
+    p.set_defaults(run=cmd_stats)
+
+    p = commands.add_parser("list", parents=[common], help="visitors, newest first")
+    p.add_argument("--status", choices=STATUSES)
+    p.add_argument("--search", help="substring of name, email, purpose or host")
+    p.add_argument("--limit", type=int, default=0)
+    p.add_argument("--watch", type=float, metavar="SECONDS", help="keep printing after every change")
+    p.set_defaults(run=cmd_list)
+
+    p = commands.add_parser("status", parents=[common], help="current status of some visitors")
+    p.add_argument("ids", nargs="+")
+    p.set_defaults(run=cmd_status)
+
+    p = commands.add_parser("export", parents=[common], help="export from the server (.csv, .csv.gz, .parquet, .arrow)")
+    p.add_argument("file")
+    p.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD", help="registered on or after")
+    p.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD", help="registered on or before")
+    p.add_argument("--status", choices=STATUSES)
+    p.add_argument("--search")
+    p.set_defaults(run=cmd_export)
+
+    args = parser.parse_args(argv)
+    log = (lambda message: print(message, file=sys.stderr)) if args.verbose else (lambda message: None)
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG, stream=sys.stderr, format="%(message)s")
+    engine = VisitorEngine(args.api_url, log=log)
+    try:
+        return args.run(engine, args) or 0
+    except FeedError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+"""The modules live at the repository root and the SQLite stand-in in benchmarks/."""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
@@ -0,0 +1,97 @@
+"""qr_encoder against the reference qrcode package, with the mask fixed.
+
+The two pick masks by the same penalty rules but break near-ties
+differently, so automatic output may legitimately differ; with the mask
+forced every module must match.
+"""
+
+import hashlib
+import struct
+import zlib
+
+import pytest
+
+import qr_encoder
+
+TEXTS = ["a", "hello world", "VIS-000123-abcdef0123456789", "x" * 100, "ünïcode ✓"]
+
+# (text, ecc, mask) -> SHA-256 of the matrix as '0'/'1' rows, checked against qrcode 8.2
+KNOWN = {
+    ("VIS-000123-abcdef0123456789", "M", 2): (29, "7f72ac7a4f54d573e412f6f7cde0f9b11e6fa3f891ef21f9f6f4f7b294917232"),
+    ("hello world", "H", 5): (25, "d5ff3230456f8366339f480921f29e60cde3de9496eb92e271a992eb9c48bc1b"),
+}
+
+
+def bits(rows):
+    return "".join("1" if module else "0" for row in rows for module in row)
+
+
+@pytest.mark.parametrize("key", list(KNOWN))
+def test_known_matrices(key):
+    size, digest = KNOWN[key]
+    rows = qr_encoder.encode(*key)
+    assert len(rows) == size and all(len(row) == size for row in rows)
+    assert hashlib.sha256(bits(rows).encode()).hexdigest() == digest
+
+
+@pytest.mark.parametrize("ecc", "LMQH")
+@pytest.mark.parametrize("text", TEXTS)
+def test_matches_qrcode_with_fixed_mask(text, ecc):
+    qrcode = pytest.importorskip("qrcode")
+    from qrcode.util import MODE_8BIT_BYTE, QRData
+
+    level = getattr(qrcode.constants, f"ERROR_CORRECT_{ecc}")
+    for mask in range(8):
+        reference = qrcode.QRCode(error_correction=level, border=0, mask_pattern=mask)
+        reference.add_data(QRData(text.encode("utf-8"), mode=MODE_8BIT_BYTE))
+        reference.make(fit=True)
+        assert qr_encoder.encode(text, ecc, mask) == reference.get_matrix(), f"mask {mask}"
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_automatic_mask_has_lowest_penalty(text):
+    chosen = qr_encoder.encode(text)
+    size = len(chosen)
+    penalties = {}
+    for mask in range(8):
+        rows = qr_encoder.encode(text, mask=mask)
+        penalties[mask] = qr_encoder._penalty([int(bits([row]), 2) for row in rows], size)
+        if rows == chosen:
+            chosen_mask = mask
+    assert penalties[chosen_mask] == min(penalties.values())
+
+
+def test_payload_too_long():
+    with pytest.raises(ValueError):
+        qr_encoder.encode("x" * 400, "H")
+
+
+def png_rows(png):
+    """The pixel rows of one of thumbnail_png's single-IDAT grayscale PNGs."""
+    size = struct.unpack(">I", png[16:20])[0]
+    idat = png.index(b"IDAT")
+    length = struct.unpack(">I", png[idat - 4:idat])[0]
+    raw = zlib.decompress(png[idat + 4:idat + 4 + length])
+    return [raw[i * (size + 1) + 1:(i + 1) * (size + 1)] for i in range(size)]
+
+
+@pytest.mark.parametrize("size", [29, 80, 97])
+def test_thumbnail_draws_every_module(size):
+    text = "VIS-000123-abcdef0123456789"  # version 3: 29 modules
+    modules = qr_encoder.encode(text)
+    rows = png_rows(qr_encoder.thumbnail_png(text, size, border=0))
+    scale = size // len(modules)
+    offset = (size - len(modules) * scale) // 2
+    assert len(rows) == size and all(len(row) == size for row in rows)
+    drawn = [[rows[offset + y * scale][offset + x * scale] == 0 for x in range(len(modules))]
+             for y in range(len(modules))]
+    assert drawn == modules
+
+
+def test_thumbnail_too_small_for_the_code():
+    text = "VIS-000123-abcdef0123456789"
+    qr_encoder.thumbnail_png(text, 33)  # 29 modules and a quiet zone of 2 just fit
+    with pytest.raises(ValueError):
+        qr_encoder.thumbnail_png(text, 32)
+    with pytest.raises(ValueError):
+        qr_encoder.thumbnail_png("x" * 100, 44, border=4)  # 41 modules + 8
@@ -0,0 +1,172 @@
+"""The events.php stand-in's stream through iter_sse and VisitorStream."""
+
+import threading
+import time
+
+import pytest
+
+from poll_scheduler import BASE_INTERVAL, PollScheduler
+from stub_server import StubHandler, StubServer, VisitorStore
+from visitor_engine import STREAM_POLL_INTERVAL, VisitorStream, events_url, iter_sse
+
+
+class ShortStreamHandler(StubHandler):
+    """events.php ending its stream after a fraction of a second, noting each request's Last-Event-ID."""
+
+    stream_seconds = 0.5
+    ping_seconds = 0.1
+    retry_ms = 200
+    last_event_ids = []
+
+    def stream_events(self, params):
+        self.last_event_ids.append(self.headers.get("Last-Event-ID"))
+        super().stream_events(params)
+
+
+class EmptyStreamHandler(StubHandler):
+    """A proxy or a failing PHP script: 200 and an empty body for events.php."""
+
+    requests = []
+
+    def stream_events(self, params):
+        self.requests.append(time.monotonic())
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class Recorder:
+    def __init__(self):
+        self.snapshots = []
+        self.resyncs = 0
+        self.errors = []
+
+    def on_snapshot(self, snapshot):
+        self.snapshots.append(snapshot)
+
+    def on_resync(self):
+        self.resyncs += 1
+
+    def visitor_ids(self):
+        return [v.visitor_id for snapshot in self.snapshots for v in snapshot.visitors]
+
+
+@pytest.fixture
+def store():
+    store = VisitorStore()
+    store.seed(10)
+    return store
+
+
+@pytest.fixture
+def server(store):
+    ShortStreamHandler.last_event_ids = []
+    with StubServer(handler=ShortStreamHandler, visitors=store) as server:
+        yield server
+
+
+def stream_for(server, recorder):
+    return VisitorStream(events_url(server.base_url + "/get_visitors.php"),
+                         recorder.on_snapshot, recorder.on_resync, log=recorder.errors.append)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_iter_sse_splits_events_across_chunks():
+    body = ("retry: 2000\n\n: ping\n\n"
+            "id: 7\r\nevent: visitors\r\ndata: {\"a\":\r\ndata: \"é\"}\r\n\r\n"
+            "data: no event name\n\n"
+            "event: resync\ndata: {}\n\n"
+            "id: 9\nevent: visitors\ndata: cut off").encode("utf-8")
+    # One byte at a time also splits the two-byte "é"
+    retries = []
+    events = list(iter_sse((body[i:i + 1] for i in range(len(body))), on_retry=retries.append))
+    assert retries == [2000]
+    assert events == [
+        ("visitors", "7", '{"a":\n"é"}'),
+        ("message", "7", "no event name"),
+        ("resync", "7", "{}"),
+    ]
+
+
+def test_stream_events_reach_on_snapshot(server, store):
+    recorder = Recorder()
+    stream = stream_for(server, recorder)
+    timer = threading.Timer(0.1, store.touch, ([3, 4],), {"purpose": "Pushed"})
+    timer.start()
+    stream.listen()  # returns when the server ends the stream
+    timer.join()
+
+    assert recorder.resyncs == 1 and stream.connected
+    assert stream.last_event_id == "2"
+    assert sorted(recorder.visitor_ids()) == ["3", "4"]
+    snapshot = recorder.snapshots[0]
+    assert snapshot.delta and snapshot.visitors[0].get('purpose') == "Pushed"
+
+
+def test_reconnect_resumes_from_last_event_id(server, store):
+    recorder = Recorder()
+    stream = stream_for(server, recorder)
+    store.touch([1])
+    stream.listen()
+    assert stream.last_event_id == "1" and recorder.visitor_ids() == []  # "hello" only
+
+    # Changes made while disconnected are replayed after the id sent back
+    store.touch([5])
+    store.delete([6])
+    stream.listen()
+    assert ShortStreamHandler.last_event_ids == [None, "1"]
+    assert recorder.visitor_ids() == ["5"]
+    assert recorder.snapshots[0].tombstones == [6]
+    assert stream.last_event_id == "3"
+
+
+def test_dropped_stream_falls_back_to_polling(store):
+    recorder = Recorder()
+    scheduler = PollScheduler(peak_hours=[])
+    server = StubServer(handler=ShortStreamHandler, visitors=store)
+    with server:
+        stream = stream_for(server, recorder).start()
+        wait_until(lambda: stream.connected)
+        push_interval = STREAM_POLL_INTERVAL if stream.connected else None
+        scheduler.next_delay(push_interval=push_interval)
+        assert scheduler.reason == "push stream connected"
+    # The server is gone: the stream ends and cannot reconnect
+    wait_until(lambda: recorder.errors)
+
+    assert not stream.connected
+    assert recorder.resyncs >= 2  # once on connecting, again when the stream dropped
+    assert "Event stream error" in recorder.errors[0]
+    push_interval = STREAM_POLL_INTERVAL if stream.connected else None
+    delay = scheduler.next_delay(push_interval=push_interval)
+    assert scheduler.reason == "normal" and delay <= BASE_INTERVAL * 1.1
+
+
+def test_stream_ended_by_the_server_resumes_without_resync(server, store):
+    recorder = Recorder()
+    stream = stream_for(server, recorder).start()
+    wait_until(lambda: len(ShortStreamHandler.last_event_ids) >= 3)
+    store.touch([2])
+    wait_until(lambda: recorder.visitor_ids() == ["2"])
+
+    assert ShortStreamHandler.last_event_ids[:3] == [None, "0", "0"]
+    assert stream.connected and stream.retry == 0.2
+    assert recorder.resyncs == 1 and recorder.errors == []
+
+
+def test_empty_stream_backs_off():
+    EmptyStreamHandler.requests = []
+    recorder = Recorder()
+    with StubServer(handler=EmptyStreamHandler, visitors=VisitorStore()) as server:
+        stream_for(server, recorder).start()
+        time.sleep(2.5)
+    # Attempts at 0 and 2 s (the default retry), then 4 s; not a tight loop
+    assert len(EmptyStreamHandler.requests) == 2
+    assert recorder.resyncs == 0
+    assert "ended before any event" in recorder.errors[0]
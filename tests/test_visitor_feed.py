@@ -0,0 +1,115 @@
+"""VisitorRowModel and VisitorFeed against the SQLite stand-in for get_visitors.php."""
+
+import pytest
+import requests
+
+import visitor_engine
+from stub_server import StubServer, VisitorStore
+from visitor_engine import VisitorEngine, VisitorRowModel
+from visitor_record import VisitorRecord
+
+
+def record(vid, updated_at, **fields):
+    return VisitorRecord({'visitor_id': vid, 'full_name': f"Visitor {vid}", 'updated_at': updated_at, **fields})
+
+
+@pytest.fixture
+def store():
+    store = VisitorStore()
+    store.seed(30)
+    return store
+
+
+@pytest.fixture
+def server(store):
+    with StubServer(visitors=store) as server:
+        yield server
+
+
+@pytest.fixture
+def engine(server):
+    engine = VisitorEngine(server.base_url + "/get_visitors.php", log=lambda message: None)
+    yield engine
+    engine.feed.session.close()
+
+
+def test_sync_reports_inserted_removed_and_changed():
+    rows = VisitorRowModel()
+    rows.sync([record(3, "t1"), record(2, "t1"), record(1, "t1")])
+    diff = rows.sync([record(4, "t2"), record(3, "t2", full_name="Renamed"), record(2, "t1")])
+    assert diff.inserted == {"4"} and diff.removed == {"1"} and diff.changed == {"3"}
+    assert rows.order == ["4", "3", "2"]
+
+    diff = rows.sync([record(2, "t1"), record(3, "t2", full_name="Renamed"), record(4, "t2")])
+    assert not (diff.inserted or diff.removed or diff.changed) and diff.reordered
+
+
+def test_merge_skips_a_row_older_than_the_one_held():
+    rows = VisitorRowModel()
+    rows.sync([record(1, "2026-01-01 00:00:00.002", full_name="Pushed")])
+
+    diff = rows.merge([record(1, "2026-01-01 00:00:00.001", full_name="Stale")])
+    assert not diff and rows.by_id["1"].get('full_name') == "Pushed"
+
+    diff = rows.merge([record(1, "2026-01-01 00:00:00.003", full_name="Newer")])
+    assert diff.changed == {"1"} and rows.by_id["1"].get('full_name') == "Newer"
+
+    diff = rows.merge([record(1, "2026-01-01 00:00:00.001", full_name="Repaired")], replace=True)
+    assert diff.changed == {"1"} and rows.by_id["1"].get('full_name') == "Repaired"
+
+
+def test_merge_removes_tombstones():
+    rows = VisitorRowModel()
+    rows.sync([record(3, "t1"), record(2, "t1"), record(1, "t1")])
+    diff = rows.merge([record(4, "t2")], tombstones=[2, 99])
+    assert diff.inserted == {"4"} and diff.removed == {"2"}
+    assert rows.order == ["4", "3", "1"] and "2" not in rows.by_id
+
+
+def test_full_list_without_parameters(server, store):
+    response = requests.get(server.base_url + "/get_visitors.php", timeout=5)
+    response.raise_for_status()
+    data = response.json()["data"]
+    assert [int(v["visitor_id"]) for v in data] == list(range(30, 0, -1))
+    assert data[0]["full_name"] == "Visitor 30" and "notes" in data[0]
+
+    payload, error = VisitorEngine(server.base_url + "/get_visitors.php").feed.fetch()
+    assert error is None and len(payload["data"]) == 30 and not payload["more"]
+
+
+def test_delta_pages_across_boundaries(engine, store, monkeypatch):
+    engine.refresh()
+    assert len(engine.rows.by_id) == 30
+    assert engine.feed.sync_cursor["visitor_id"] == 30
+
+    changed = [3, 7, 8, 11, 12, 15, 19, 20, 22, 26, 27, 29]
+    store.touch(changed, purpose="Audit")
+    # Several rows share one updated_at across a page boundary: only the
+    # visitor_id half of the cursor tells them apart
+    tied = store.tick()
+    with store.lock:
+        store.db.execute("UPDATE visitors SET updated_at = ? WHERE visitor_id IN (11, 12, 15, 19, 20)", (tied,))
+    store.delete([5])
+
+    monkeypatch.setattr(visitor_engine, "DELTA_PAGE_SIZE", 4)
+    requests_seen = []
+    fetch = engine.feed.fetch
+    monkeypatch.setattr(engine.feed, "fetch",
+                        lambda params=None, conditional=False: requests_seen.append(params) or fetch(params, conditional))
+
+    snapshot = engine.feed.snapshot()
+    assert snapshot.delta and not snapshot.error and not snapshot.more
+    assert len(requests_seen) == 3
+    ids = [int(v.visitor_id) for v in snapshot.visitors]
+    assert sorted(ids) == changed and len(ids) == len(set(ids))
+    assert ids[-5:] == [11, 12, 15, 19, 20]
+    assert 5 in snapshot.tombstones
+    assert engine.feed.sync_cursor == {"updated_at": tied, "visitor_id": 20}
+
+    diff = engine.apply(snapshot)
+    assert diff.changed == set(map(str, changed)) and diff.removed == {"5"}
+    assert all(engine.rows.by_id[str(vid)].get('purpose') == "Audit" for vid in changed)
+
+    store.touch([1])
+    snapshot = engine.feed.snapshot()
+    assert [v.visitor_id for v in snapshot.visitors] == ["1"]
@@ -0,0 +1,366 @@
+"""Occupancy, dwell-time and peak-hour analytics over the scan log, with NumPy.
+
+``LogSource`` reads get_logs.php one day at a time, page by page, straight
+into NumPy column arrays; ``compute_day`` turns a day of pages into a
+DayStats with array operations only (no per-scan Python loop):
+
+* occupancy: visitors inside at the end of every BIN_MINUTES bin, and the
+  most inside at any moment of it.  A Valid scan starts a stay and an
+  Exited scan ends it; repeated scans in between change nothing.
+* dwell time: a histogram of finished stays (entry to exit) per host and
+  per purpose, counted on the day of the exit.
+* scans per kind (Valid, Expired, Invalid, Exited) and hour, which summed
+  by weekday make the peak-hour heatmap.
+
+Stays that cross midnight are carried into the next day (``carry``).
+Finished days are cached as one .npz file each, so after the first run
+only the current day is read and computed again; memory stays bounded
+by the page size however long the log is.  Like visitor_engine, this
+module does not import tkinter.
+"""
+
+import os
+from datetime import date, datetime, time as clock_time, timedelta
+
+import numpy as np
+import requests
+
+KINDS = ["Other", "Valid", "Expired", "Invalid", "Exited"]  # get_logs.php's kind codes
+VALID, EXITED = 1, 4
+GROUPS = ("host", "purpose")
+UNKNOWN = "(unknown)"
+BIN_MINUTES = 15
+BINS_PER_DAY = 24 * 60 // BIN_MINUTES
+DWELL_EDGES = np.array([0, 15, 30, 60, 120, 240, 480])  # minutes; the last bin is open-ended
+DWELL_LABELS = ["<15m", "15-30m", "30m-1h", "1-2h", "2-4h", "4-8h", "8h+"]
+STALE_STAY_HOURS = 24  # a stay with no exit scan is dropped after this long (passes last a day)
+SETTLE_HOURS = 2  # a day is cached once it has been over this long; batched gate scans can arrive late
+LOGS_PAGE = 50000  # scans per get_logs.php request
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".qrgate", "analytics")
+CACHE_VERSION = 1
+DAY_SECONDS = 86400
+
+
+def logs_url(api_url):
+    """get_logs.php next to the given get_visitors.php."""
+    return api_url.rsplit('/', 1)[0] + "/get_logs.php"
+
+
+def day_start(day):
+    """Seconds on the analytics clock (days since 0001-01-01) at midnight of ``day``."""
+    return day.toordinal() * DAY_SECONDS
+
+
+def downsample_max(values, columns):
+    """The largest of each run of ``values`` when squeezed into ``columns`` points (for charts)."""
+    if len(values) <= columns:
+        return np.asarray(values)
+    return np.maximum.reduceat(values, np.linspace(0, len(values), columns, endpoint=False).astype(np.int64))
+
+
+class LogSource:
+    """get_logs.php client: the logged date range, and each day's scans as column arrays."""
+
+    def __init__(self, url, page_size=LOGS_PAGE):
+        self.url = url
+        self.page_size = page_size
+        self.session = requests.Session()
+        self.session.verify = False
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+
+    def get(self, params):
+        response = self.session.get(self.url, params=params, timeout=60)
+        response.raise_for_status()
+        payload = response.json()
+        if not payload.get('ok'):
+            raise ValueError(payload.get('msg', 'get_logs.php failed'))
+        return payload
+
+    def range(self):
+        """(first day, last day) with scans, or None for an empty log."""
+        payload = self.get({'range': 1})
+        if not payload.get('first'):
+            return None
+        return (datetime.fromisoformat(payload['first']).date(), datetime.fromisoformat(payload['last']).date())
+
+    def day_chunks(self, day):
+        """Yield the day's scans page by page, oldest first, as dicts of NumPy arrays.
+
+        ``visitor_id`` is -1 for unknown QR codes, ``t`` is seconds since midnight.
+        """
+        start = datetime.combine(day, clock_time.min)
+        params = {'from': f"{start:%Y-%m-%d %H:%M:%S}", 'to': f"{start + timedelta(days=1):%Y-%m-%d %H:%M:%S}",
+                  'limit': self.page_size}
+        while True:
+            payload = self.get(params)
+            if payload['log_id']:
+                yield {
+                    'visitor_id': np.nan_to_num(np.array(payload['visitor_id'], dtype=float), nan=-1).astype(np.int64),
+                    'kind': np.array(payload['kind'], dtype=np.int8),
+                    't': np.array(payload['t'], dtype=np.int64),
+                    'host': np.array(payload['host'], dtype=object),
+                    'purpose': np.array(payload['purpose'], dtype=object),
+                }
+            if not payload.get('more'):
+                return
+            params['after_t'], params['after_id'] = payload['t'][-1], payload['log_id'][-1]
+
+
+class Stays:
+    """Open stays: analytics-clock start of the stay per visitor_id (NaN when not inside)."""
+
+    def __init__(self, vids=(), since=()):
+        vids = np.asarray(vids, dtype=np.int64)
+        self.since = np.full(int(vids.max()) + 1 if len(vids) else 1024, np.nan)
+        self.since[vids] = since
+
+    def grow(self, top):
+        if top >= len(self.since):
+            grown = np.full(max(top + 1, 2 * len(self.since)), np.nan)
+            grown[:len(self.since)] = self.since
+            self.since = grown
+
+    def get(self, vids):
+        self.grow(int(vids.max()))
+        return self.since[vids]
+
+    def set(self, vids, since):
+        self.grow(int(vids.max()))
+        self.since[vids] = since
+
+    def drop_older_than(self, cutoff):
+        self.since[self.since < cutoff] = np.nan
+
+    def open(self):
+        vids = np.flatnonzero(~np.isnan(self.since))
+        return vids, self.since[vids]
+
+
+class DayStats:
+    """One day's occupancy, scans and dwell histograms, plus the stays still open at midnight."""
+
+    def __init__(self, day):
+        self.day = day
+        self.start_occupancy = 0
+        self.occupancy = np.zeros(BINS_PER_DAY, np.int32)  # inside at the end of each bin
+        self.peak = np.zeros(BINS_PER_DAY, np.int32)  # most inside at any moment of each bin
+        self.scans = np.zeros((len(KINDS), 24), np.int32)  # per kind and hour
+        # group -> name -> (stays per DWELL_EDGES bin, total minutes)
+        self.dwell = {group: {} for group in GROUPS}
+        self.carry_vids = np.zeros(0, np.int64)
+        self.carry_since = np.zeros(0)
+
+    def add_dwell(self, group, names, minutes):
+        names = np.where(names == None, UNKNOWN, names).astype(str)  # noqa: E711 (elementwise)
+        unique, inverse = np.unique(names, return_inverse=True)
+        bins = np.clip(np.searchsorted(DWELL_EDGES, minutes, side="right") - 1, 0, len(DWELL_EDGES) - 1)
+        counts = np.bincount(inverse * len(DWELL_EDGES) + bins,
+                             minlength=len(unique) * len(DWELL_EDGES)).reshape(len(unique), -1)
+        totals = np.bincount(inverse, weights=minutes, minlength=len(unique))
+        table = self.dwell[group]
+        for name, row, total in zip(unique.tolist(), counts, totals):
+            if name in table:
+                table[name] = (table[name][0] + row, table[name][1] + total)
+            else:
+                table[name] = (row, total)
+
+    def save(self, path, source):
+        arrays = {}
+        for group in GROUPS:
+            names = sorted(self.dwell[group])
+            arrays[f"{group}_names"] = np.array(names, dtype=str)
+            arrays[f"{group}_counts"] = np.array([self.dwell[group][n][0] for n in names],
+                                                 dtype=np.int32).reshape(len(names), len(DWELL_EDGES))
+            arrays[f"{group}_minutes"] = np.array([self.dwell[group][n][1] for n in names], dtype=float)
+        tmp_path = path + ".part.npz"
+        np.savez_compressed(tmp_path, version=CACHE_VERSION, source=source, day=self.day.isoformat(),
+                            start_occupancy=self.start_occupancy, occupancy=self.occupancy, peak=self.peak,
+                            scans=self.scans, carry_vids=self.carry_vids, carry_since=self.carry_since, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, source):
+        """The DayStats saved at ``path``, or None if it is missing or from another source or version."""
+        try:
+            with np.load(path) as saved:
+                if int(saved["version"]) != CACHE_VERSION or str(saved["source"]) != source:
+                    return None
+                stats = cls(date.fromisoformat(str(saved["day"])))
+                stats.start_occupancy = int(saved["start_occupancy"])
+                for name in ("occupancy", "peak", "scans", "carry_vids", "carry_since"):
+                    setattr(stats, name, saved[name])
+                for group in GROUPS:
+                    stats.dwell[group] = {
+                        name: (counts, minutes) for name, counts, minutes in
+                        zip(saved[f"{group}_names"].tolist(), saved[f"{group}_counts"], saved[f"{group}_minutes"])}
+                return stats
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def compute_day(day, chunks, carry=None):
+    """DayStats for ``day`` from its scans (time-ordered pages from LogSource.day_chunks).
+
+    ``carry`` is the previous day's DayStats (or None), whose open stays
+    are still inside at midnight.
+    """
+    stats = DayStats(day)
+    base = day_start(day)
+    stays = Stays(carry.carry_vids, carry.carry_since) if carry is not None else Stays()
+    stays.drop_older_than(base - STALE_STAY_HOURS * 3600)
+    occupancy = stats.start_occupancy = len(stays.open()[0])
+    net = np.zeros(BINS_PER_DAY, np.int64)  # change in occupancy per bin
+    peak = np.zeros(BINS_PER_DAY, np.int64)
+
+    for chunk in chunks:
+        vid, kind, t = chunk['visitor_id'], chunk['kind'], chunk['t']
+        hour = np.clip(t // 3600, 0, 23)
+        stats.scans += np.bincount(kind.astype(np.int64) * 24 + hour,
+                                   minlength=len(KINDS) * 24).reshape(len(KINDS), 24).astype(np.int32)
+
+        moves = np.flatnonzero((vid >= 0) & ((kind == VALID) | (kind == EXITED)))
+        if not len(moves):
+            continue
+        # Per visitor, in time order (pages are time-ordered; the row index breaks
+        # ties, which lets NumPy use its faster unstable sort)
+        order = moves[np.argsort(vid[moves] * len(vid) + moves)]
+        v, at = vid[order], (base + t[order]).astype(float)
+        n = len(order)
+        first = np.ones(n, bool)
+        first[1:] = v[1:] != v[:-1]
+        last = np.ones(n, bool)
+        last[:-1] = first[1:]
+
+        inside = kind[order] == VALID  # after each scan
+        was_inside = np.empty(n, bool)  # before it
+        was_inside[1:] = inside[:-1]
+        carried = stays.get(v[first])
+        was_inside[first] = ~np.isnan(carried)
+        delta = inside.astype(np.int8) - was_inside
+
+        # Start of the stay each scan belongs to: set where a stay begins (or
+        # continues from an earlier page or day), then filled forward
+        start = np.where(delta == 1, at, np.nan)
+        starts_inside = np.flatnonzero(first)[was_inside[first]]
+        start[starts_inside] = carried[~np.isnan(carried)]
+        marked = np.where(~np.isnan(start), np.arange(n), 0)
+        np.maximum.accumulate(marked, out=marked)
+        stay_start = start[marked]
+
+        exits = ~inside & was_inside
+        if exits.any():
+            minutes = (at[exits] - stay_start[exits]) / 60
+            for group in GROUPS:
+                stats.add_dwell(group, chunk[group][order[exits]], minutes)
+        stays.set(v[last], np.where(inside[last], stay_start[last], np.nan))
+
+        # Occupancy, back in time order
+        back = np.argsort(order)
+        changes = delta[back].astype(np.int64)
+        times = order[back]
+        bins = np.clip(t[times] // (BIN_MINUTES * 60), 0, BINS_PER_DAY - 1)
+        level = occupancy + np.cumsum(changes)
+        net += np.bincount(bins, weights=changes, minlength=BINS_PER_DAY).astype(np.int64)
+        edges = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        np.maximum.at(peak, bins[edges], np.maximum.reduceat(level, edges))
+        occupancy = int(level[-1])
+
+    stats.occupancy = (stats.start_occupancy + np.cumsum(net)).astype(np.int32)
+    bin_start = np.r_[stats.start_occupancy, stats.occupancy[:-1]]
+    stats.peak = np.maximum(peak, np.maximum(bin_start, stats.occupancy)).astype(np.int32)
+    stats.carry_vids, stats.carry_since = stays.open()
+    return stats
+
+
+class LogAnalytics:
+    """Per-day DayStats for the whole log, cached on disk once a day is final.
+
+    ``update`` brings ``days`` up to date; the query methods combine any
+    range of them.  ``source`` is a LogSource (or anything with ``range``
+    and ``day_chunks``); ``cache_dir`` None keeps everything in memory.
+    """
+
+    def __init__(self, source, cache_dir=CACHE_DIR, source_name=None):
+        self.source = source
+        self.cache_dir = cache_dir
+        self.source_name = source_name or getattr(source, "url", "")
+        self.days = {}  # date -> DayStats
+        self.computed = 0  # days read and computed (not from the cache) by the last update
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def is_final(self, day, now=None):
+        now = now or datetime.now()
+        return now >= datetime.combine(day + timedelta(days=1), clock_time.min) + timedelta(hours=SETTLE_HOURS)
+
+    def cache_path(self, day):
+        return os.path.join(self.cache_dir, f"{day:%Y-%m-%d}.npz")
+
+    def update(self, today=None, progress=None, cancelled=None):
+        """Load or compute every day from the first scan to ``today``; returns the days computed.
+
+        ``progress(done, total)`` is called after each day; ``cancelled()``
+        returning True stops between days.
+        """
+        today = today or date.today()
+        self.computed = 0
+        span = self.source.range()
+        if span is None:
+            return 0
+        first = span[0]
+        total = (max(today, span[1]) - first).days + 1
+        previous = None
+        for i in range(total):
+            if cancelled is not None and cancelled():
+                break
+            day = first + timedelta(days=i)
+            final = self.is_final(day)
+            stats = self.days.get(day) if final else None
+            if stats is None and final and self.cache_dir:
+                stats = DayStats.load(self.cache_path(day), self.source_name)
+            if stats is None:
+                stats = compute_day(day, self.source.day_chunks(day), previous)
+                self.computed += 1
+                if final and self.cache_dir:
+                    stats.save(self.cache_path(day), self.source_name)
+            self.days[day] = stats
+            previous = stats
+            if progress is not None:
+                progress(i + 1, total)
+        return self.computed
+
+    def span(self, first, last):
+        return [self.days[day] for day in sorted(self.days) if first <= day <= last]
+
+    def occupancy(self, first, last):
+        """(bin start datetimes as datetime64[m], inside at bin end, peak within bin) over the range."""
+        days = self.span(first, last)
+        if not days:
+            return np.zeros(0, "datetime64[m]"), np.zeros(0, np.int32), np.zeros(0, np.int32)
+        starts = np.array([np.datetime64(d.day, "m") for d in days])
+        times = (starts[:, None] + np.arange(BINS_PER_DAY) * np.timedelta64(BIN_MINUTES, "m")).ravel()
+        return times, np.concatenate([d.occupancy for d in days]), np.concatenate([d.peak for d in days])
+
+    def heatmap(self, first, last, kind=VALID):
+        """Scans of ``kind`` per weekday (Monday first) and hour, summed over the range."""
+        days = self.span(first, last)
+        heat = np.zeros((7, 24), np.int64)
+        if days:
+            np.add.at(heat, np.array([d.day.weekday() for d in days]), np.stack([d.scans[kind] for d in days]))
+        return heat
+
+    def dwell(self, group, first, last):
+        """(names, stays per DWELL_EDGES bin per name, mean minutes per name), busiest first."""
+        table = {}
+        for stats in self.span(first, last):
+            for name, (counts, minutes) in stats.dwell[group].items():
+                if name in table:
+                    table[name] = (table[name][0] + counts, table[name][1] + minutes)
+                else:
+                    table[name] = (np.array(counts), minutes)
+        if not table:
+            return [], np.zeros((0, len(DWELL_EDGES)), np.int64), np.zeros(0)
+        names = sorted(table, key=lambda name: -table[name][0].sum())
+        counts = np.array([table[name][0] for name in names])
+        mean = np.array([table[name][1] for name in names]) / np.maximum(counts.sum(axis=1), 1)
+        return names, counts, mean
@@ -0,0 +1,121 @@
+"""Range digests of the visitor rows, for finding what a replica missed.
+
+Delta sync only sees changes that bump updated_at and deletions that
+leave a tombstone.  Anything else (a restored server backup, purged
+tombstones, a lost replica write) leaves the local copy silently wrong
+until a full reload.  Each VisitorRecord carries a CRC32 ``digest`` of
+the fields the dashboard shows; ``RangeDigests`` folds them into a
+two-level tree keyed by visitor_id:
+
+* a leaf holds the rows with visitor_id // LEAF_IDS equal, as
+  (row count, XOR of their digests);
+* a branch is FANOUT consecutive leaves, combined the same way;
+* the root is every row from some visitor_id up.
+
+XOR makes every level order-free and incremental: a changed row updates
+one leaf and one branch, so keeping the tree costs O(changed rows).
+digests.php serves the same numbers from a table the triggers of
+migrations/005_visitor_digests.sql keep, and VisitorFeed.verify compares
+root, then branches, then the leaves of differing branches, and fetches
+only the rows of differing leaves.  Like visitor_engine, this module
+does not import tkinter.
+"""
+
+import threading
+
+LEAF_IDS = 64  # visitor ids per leaf; fixed by migrations/005_visitor_digests.sql
+FANOUT = 64  # leaves per branch
+BRANCH_IDS = LEAF_IDS * FANOUT
+
+
+def digests_url(api_url):
+    """digests.php next to the given get_visitors.php."""
+    return api_url.rsplit('/', 1)[0] + "/digests.php"
+
+
+def leaf_start(visitor_id):
+    """The first leaf boundary at or above ``visitor_id``: verification starts there."""
+    return -(-visitor_id // LEAF_IDS) * LEAF_IDS
+
+
+def differing(local, remote):
+    """Bucket numbers whose (count, digest) differ between two {bucket: (count, digest)} maps."""
+    return sorted(bucket for bucket in local.keys() | remote.keys()
+                  if local.get(bucket, (0, 0)) != remote.get(bucket, (0, 0)))
+
+
+class RangeDigests:
+    """Leaf and branch digests of VisitorEngine's rows, kept up to date from RowDiffs.
+
+    Written on the Tk thread and read by the worker's verify, so guarded
+    by one lock.  Buckets are {number: [count, xor]}; empty ones are
+    dropped, as the server never reports them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = {}  # visitor_id (int) -> digest
+        self.leaves = {}
+        self.branches = {}
+
+    def apply(self, diff, by_id):
+        """Fold in a RowDiff; ``by_id`` is the row model after it."""
+        with self.lock:
+            for vid in diff.removed:
+                if vid.isdigit():
+                    self.put(int(vid), None)
+            for vid in diff.inserted | diff.changed:
+                if vid.isdigit():
+                    self.put(int(vid), by_id[vid].digest)
+
+    def put(self, vid, digest):
+        """Set (or with None, drop) one row's digest; call with the lock held."""
+        old = self.rows.pop(vid, None)
+        if digest is not None:
+            self.rows[vid] = digest
+        count = (digest is not None) - (old is not None)
+        change = (old or 0) ^ (digest or 0)
+        if not count and not change:
+            return
+        for buckets, bucket in ((self.leaves, vid // LEAF_IDS), (self.branches, vid // BRANCH_IDS)):
+            entry = buckets.setdefault(bucket, [0, 0])
+            entry[0] += count
+            entry[1] ^= change
+            if not entry[0]:
+                del buckets[bucket]
+
+    def leaf_range(self, first, end):
+        """{leaf: (count, digest)} for the leaves in [first, end) (visitor ids on leaf boundaries)."""
+        with self.lock:
+            return {leaf: tuple(self.leaves[leaf]) for leaf in range(first // LEAF_IDS, end // LEAF_IDS)
+                    if leaf in self.leaves}
+
+    def branches_from(self, first):
+        """{branch: (count, digest)} over visitor_id >= ``first`` (a leaf boundary).
+
+        The branch ``first`` falls inside only counts its leaves from ``first`` on.
+        """
+        partial = first // BRANCH_IDS
+        with self.lock:
+            result = {branch: tuple(entry) for branch, entry in self.branches.items() if branch > partial}
+        count = digest = 0
+        for leaf_count, leaf_digest in self.leaf_range(first, (partial + 1) * BRANCH_IDS).values():
+            count += leaf_count
+            digest ^= leaf_digest
+        if count:
+            result[partial] = (count, digest)
+        return result
+
+    def root_from(self, first):
+        """(count, digest) of every row with visitor_id >= ``first``."""
+        count = digest = 0
+        for branch_count, branch_digest in self.branches_from(first).values():
+            count += branch_count
+            digest ^= branch_digest
+        return count, digest
+
+    def ids_in(self, leaves):
+        """Visitor ids held in these leaves."""
+        with self.lock:
+            return [vid for leaf in leaves for vid in range(leaf * LEAF_IDS, (leaf + 1) * LEAF_IDS)
+                    if vid in self.rows]
@@ -0,0 +1,667 @@
+"""The dashboard's data layer, without Tk.
+
+``VisitorFeed`` talks to get_visitors.php (full listing, keyset pages and
+delta sync) and turns responses into FetchSnapshots of VisitorRecords.
+``VisitorEngine`` keeps the local replica those snapshots are applied to,
+with its status counts, search index and range digests (``verify``
+checks those against the server's).  The Tk dashboard runs the feed
+on a worker thread and renders the engine; ``qrgate.py`` drives the same
+engine from the command line.
+"""
+
+import codecs
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import requests
+import urllib3
+
+try:
+    import orjson  # optional; builds row dicts faster than json does
+    json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+
+from perf_metrics import Metrics
+from qr_cache import LRUCache
+from visitor_digest import BRANCH_IDS, LEAF_IDS, RangeDigests, differing, digests_url, leaf_start
+from visitor_record import StatusCounts, VisitorRecord
+from visitor_search import SearchIndex
+
+# Disable SSL warnings (for testing - remove in production)
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# QRGATE_API_URL points the dashboard at another server (a staging copy, or a
+# benchmarks/stub_server.py instance)
+API_URL = os.environ.get("QRGATE_API_URL") or "https://qrgate-production.up.railway.app/get_visitors.php"
+DELTA_PAGE_SIZE = 1000  # rows per page when catching up through the delta feed
+PAGE_SIZE = 500  # visitors per page of history; more are loaded as the table scrolls
+# Columns the dashboard asks get_visitors.php for (notes is never shown)
+FEED_FIELDS = "visitor_id,full_name,email,phone,purpose,host,qr_code,expiry_at,last_status,last_scan,entry_scan,exit_time,created_at,updated_at"
+FEED_TIMEOUT = 15  # seconds to wait on get_visitors.php / digests.php (per site, see visitor_sites)
+STREAM_READ_TIMEOUT = 40  # events.php pings every 15 s; silence this long means the stream is dead
+STREAM_RETRY_MAX = 60  # seconds between reconnect attempts, at most
+STREAM_RETRY = 2.0  # seconds before reconnecting to a stream that ended, until events.php sends its retry:
+STREAM_POLL_INTERVAL = 300  # safety-net poll while events.php is pushing changes
+VERIFY_MAX_LEAVES = 64  # differing leaves re-read per verify; any others wait for the next one
+LEAVES_PER_FETCH = 500 // LEAF_IDS  # get_visitors.php takes at most 500 ids
+
+# Per-request diagnostics go to DEBUG; with the level above it they cost one
+# isEnabledFor check, not the formatting of every response
+logger = logging.getLogger("qrgate.feed")
+
+
+# Feed layout get_visitors.php sends when asked for it in Accept: column
+# names once, then one value array per visitor (see decode_feed).  Once
+# gzipped it is only ~10% smaller than row dicts, and orjson decodes row
+# dicts faster than Python can zip columnar rows back into dicts, so it is
+# only asked for when decoding with the stdlib (benchmarks/bench_wire.py).
+COLUMNAR_TYPE = "application/vnd.qrgate.columnar+json"
+FEED_ACCEPT = ("application/json, text/javascript;q=0.5, */*;q=0.01" if orjson else
+               f"{COLUMNAR_TYPE}, application/json;q=0.9, text/javascript;q=0.5, */*;q=0.01")
+
+
+class FeedError(Exception):
+    pass
+
+
+def decode_feed(content, content_type):
+    """Parse a get_visitors.php body; columnar responses are turned back into ``data`` dicts."""
+    data = json_loads(content)
+    if content_type.startswith(COLUMNAR_TYPE) and isinstance(data, dict) and 'rows' in data:
+        columns = data.pop('columns')
+        data['data'] = [dict(zip(columns, row)) for row in data.pop('rows')]
+    return data
+
+
+class FetchSnapshot:
+    """One fetch, fully prepared off the Tk thread and ready to render."""
+
+    def __init__(self, visitors, error=None, fetch_ms=0.0,
+                 delta=False, tombstones=(), more=False, page=None,
+                 not_modified=False, fetch_bytes=0, cursor=None, restored=False, repair=False):
+        self.visitors = visitors  # VisitorRecords: parsed, status derived, fingerprinted
+        self.error = error
+        self.fetch_ms = fetch_ms
+        self.fetch_bytes = fetch_bytes  # response headers + body, as received
+        # The server answered 304: nothing changed since the previous poll
+        self.not_modified = not_modified
+        # A delta snapshot holds only rows changed since the last sync (to be
+        # merged into the replica) and the ids deleted since then
+        self.delta = delta
+        self.tombstones = tombstones
+        # The feed's sync cursor once this snapshot is applied (polls only)
+        self.cursor = cursor
+        # Rows read back from the local replica, which need not be written again
+        self.restored = restored
+        # Rows re-read because their digests differed: they replace the held
+        # copies even when those claim a newer updated_at
+        self.repair = repair
+        # Paged listings: ``more`` says older visitors exist beyond this page;
+        # ``page`` is the (status, q) filter a history page was requested for
+        self.more = more
+        self.page = page
+
+
+def visitor_sort_key(visitor_id):
+    """Newest visitor first, like get_visitors.php's full listing."""
+    return -int(visitor_id) if visitor_id.isdigit() else 0
+
+
+class RowDiff:
+    """Visitor ids that differ between two fetches."""
+
+    def __init__(self, inserted, removed, changed, reordered):
+        self.inserted = inserted
+        self.removed = removed
+        self.changed = changed
+        self.reordered = reordered
+
+    @property
+    def structural(self):
+        """True when rows were added, dropped or moved (not just edited)."""
+        return bool(self.inserted or self.removed or self.reordered)
+
+    def __bool__(self):
+        return self.structural or bool(self.changed)
+
+
+class VisitorRowModel:
+    """Visitor rows keyed by ``visitor_id``, in server order.
+
+    ``sync`` diffs a freshly fetched list against the previous one so the
+    caller only has to touch the rows that were inserted, removed or changed.
+    """
+
+    def __init__(self):
+        self.by_id = {}
+        self.fingerprints = {}
+        self.order = []
+
+    def rows(self):
+        return [self.by_id[vid] for vid in self.order]
+
+    def sync(self, visitors):
+        """Replace the rows with ``visitors`` and return what changed.
+
+        Records carry a fingerprint computed off the UI thread, so the
+        comparison is a cheap hash check instead of a dict compare.
+        """
+        new_by_id = {}
+        new_order = []
+        fingerprints = {}
+        for visitor in visitors:
+            vid = visitor.visitor_id
+            new_by_id[vid] = visitor
+            new_order.append(vid)
+            fingerprints[vid] = visitor.fingerprint
+
+        old = self.fingerprints
+        inserted = fingerprints.keys() - old.keys()
+        removed = old.keys() - fingerprints.keys()
+        changed = {vid for vid in fingerprints.keys() & old.keys() if fingerprints[vid] != old[vid]}
+        reordered = not inserted and not removed and new_order != self.order
+
+        self.by_id = new_by_id
+        self.fingerprints = fingerprints
+        self.order = new_order
+        return RowDiff(inserted, removed, changed, reordered)
+
+    def merge(self, visitors, tombstones=(), replace=False):
+        """Apply a delta: upsert ``visitors`` and drop the ``tombstones`` ids.
+
+        Normally a row older than the copy held is ignored; with ``replace``
+        the given rows win regardless.
+        """
+        inserted, removed, changed = set(), set(), set()
+        for visitor in visitors:
+            vid = visitor.visitor_id
+            old = self.fingerprints.get(vid)
+            if old == visitor.fingerprint:
+                continue
+            current = self.by_id.get(vid)
+            if (not replace and current is not None
+                    and (current.get('updated_at') or '') > (visitor.get('updated_at') or '')):
+                continue  # older than the copy held (a pushed event overtook this fetch)
+            (inserted if old is None else changed).add(vid)
+            self.by_id[vid] = visitor
+            self.fingerprints[vid] = visitor.fingerprint
+
+        for vid in map(str, tombstones):
+            if vid in self.by_id:
+                del self.by_id[vid]
+                del self.fingerprints[vid]
+                removed.add(vid)
+
+        if removed:
+            self.order = [vid for vid in self.order if vid not in removed]
+        if inserted:
+            new = sorted(inserted, key=visitor_sort_key)
+            if self.order and visitor_sort_key(new[0]) < visitor_sort_key(self.order[-1]):
+                self.order = sorted(self.by_id, key=visitor_sort_key)
+            else:
+                self.order += new  # an older history page: goes after what is loaded
+        return RowDiff(inserted, removed, changed, False)
+
+
+class VisitorFeed:
+    """Client for get_visitors.php.
+
+    ``sync_cursor`` is the delta-sync high-water mark; once the server has
+    handed one out, ``snapshot`` only asks for rows changed since then.
+    Requests share one keep-alive Session, and polls are conditional: the
+    ETag of the last answer to the same query is sent back, and a 304 means
+    nothing changed.  Not thread-safe: use one feed per thread.
+    """
+
+    def __init__(self, api_url=API_URL, log=print, metrics=None, timeout=FEED_TIMEOUT):
+        self.api_url = api_url
+        self.log = log
+        self.metrics = metrics or Metrics()
+        self.timeout = timeout
+        self.sync_cursor = None
+        self.etags = LRUCache(16)  # query -> ETag of its last 200 response
+        self.last_response_bytes = 0
+        self.session = requests.Session()
+        self.session.verify = False
+        self.session.headers.update({
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+            "Accept": FEED_ACCEPT,
+            "Accept-Encoding": "gzip, deflate",
+            "Referer": api_url
+        })
+
+    def fetch(self, params=None, conditional=False):
+        """Fetch one response of the visitor feed (blocking; call it off the UI thread).
+
+        Returns (payload, error_message) where payload is a dict with at least
+        a ``data`` list, plus ``cursor``/``more``/``tombstones`` when the
+        server supports delta sync.  With ``conditional`` an unchanged answer
+        comes back as ``{'data': [], 'not_modified': True}`` without a body.
+        """
+        debug = logger.isEnabledFor(logging.DEBUG)
+        try:
+            if debug:
+                logger.debug("GET %s %s", self.api_url, params)
+            key = tuple(sorted((params or {}).items()))
+            headers = {}
+            etag = self.etags.get(key) if conditional else None
+            if etag:
+                headers["If-None-Match"] = etag
+            started = time.perf_counter()
+            response = self.session.get(self.api_url, params=params, headers=headers, timeout=self.timeout)
+            self.metrics.observe("network", (time.perf_counter() - started) * 1000)
+            # On the wire: Content-Length is the compressed size when gzipped
+            self.last_response_bytes = int(response.headers.get("Content-Length") or len(response.content)) + sum(
+                len(k) + len(v) + 4 for k, v in response.headers.items())
+            self.metrics.count("feed_requests")
+            self.metrics.count("feed_bytes", self.last_response_bytes)
+            if debug:
+                logger.debug("HTTP %s, %d bytes, headers %s", response.status_code,
+                             self.last_response_bytes, dict(response.headers))
+            if response.status_code == 304:
+                self.metrics.count("feed_not_modified")
+                return {'data': [], 'not_modified': True}, None
+            response.raise_for_status()
+            if conditional and response.headers.get("ETag"):
+                self.etags.put(key, response.headers["ETag"])
+
+            with self.metrics.timed("decode"):
+                data = decode_feed(response.content, response.headers.get("Content-Type", ""))
+
+            if isinstance(data, dict) and 'data' in data:
+                if debug:
+                    logger.debug("Found %d visitors, keys %s", len(data['data']), list(data))
+                return data, None
+            elif isinstance(data, list):
+                if debug:
+                    logger.debug("Found %d visitors (list format)", len(data))
+                return {'data': data}, None
+            else:
+                self.log(f"Unexpected data format: {str(data)[:200]}")
+                return {'data': []}, None
+
+        except requests.exceptions.SSLError as e:
+            self.log(f"SSL Error: {e}")
+            return {'data': []}, f"SSL Certificate Error. Try accessing the website in your browser first."
+        except requests.exceptions.ConnectionError as e:
+            self.log(f"Connection Error: {e}")
+            return {'data': []}, f"Cannot connect to server. Check your internet connection."
+        except requests.exceptions.Timeout as e:
+            self.log(f"Timeout Error: {e}")
+            return {'data': []}, f"Server took too long to respond."
+        except requests.exceptions.HTTPError as e:
+            self.log(f"HTTP Error: {e}")
+            return {'data': []}, f"Server error: {e}"
+        except ValueError as e:
+            self.log(f"JSON Decode Error: {e}")
+            return {'data': []}, f"Invalid response from server."
+        except Exception as e:
+            self.log(f"Unexpected error fetching data: {e}")
+            return {'data': []}, f"Error: {str(e)}"
+
+    def snapshot(self):
+        """Fetch, normalize and pre-compute everything a refresh needs.
+
+        Once the server has handed out a sync cursor only the rows changed
+        since then are requested (page by page); otherwise the whole list.
+        """
+        started = time.perf_counter()
+        cursor = self.sync_cursor
+        visitors, tombstones = [], []
+        fetch_bytes = 0
+
+        while True:
+            if cursor:
+                params = {'since': cursor['updated_at'], 'since_id': cursor['visitor_id'],
+                          'limit': DELTA_PAGE_SIZE, 'fields': FEED_FIELDS}
+            else:
+                # First sync only transfers the newest page; older ones load on scroll
+                params = {'limit': PAGE_SIZE, 'fields': FEED_FIELDS}
+            # Only the first request of a poll repeats a previous query
+            payload, error = self.fetch(params, conditional=not visitors)
+            fetch_bytes += self.last_response_bytes
+            if error:
+                return FetchSnapshot([], error=error, fetch_ms=(time.perf_counter() - started) * 1000)
+            if payload.get('not_modified'):
+                return FetchSnapshot([], fetch_ms=(time.perf_counter() - started) * 1000,
+                                     not_modified=True, fetch_bytes=fetch_bytes)
+
+            visitors += payload['data']
+            tombstones += payload.get('tombstones', [])
+            delta = 'since' in params and 'cursor' in payload
+            cursor = payload.get('cursor')
+            if not (delta and payload.get('more')):
+                break
+
+        # Only advance once every page arrived, so a failed catch-up is retried whole
+        self.sync_cursor = cursor
+
+        now = datetime.now()
+        with self.metrics.timed("normalize"):
+            visitors = [VisitorRecord(v, now) for v in visitors]
+        fetch_ms = (time.perf_counter() - started) * 1000
+        return FetchSnapshot(visitors, fetch_ms=fetch_ms,
+                             delta=delta, tombstones=tombstones, more=payload.get('more', False),
+                             page=None if delta else ("All", ""), fetch_bytes=fetch_bytes, cursor=cursor)
+
+    def page(self, request):
+        """One page of the (optionally server-filtered) visitor listing.
+
+        ``request`` holds the ``status``/``q``/``before_id`` filter and a
+        ``key`` that is passed back as the snapshot's ``page``.
+        """
+        started = time.perf_counter()
+        params = {'limit': PAGE_SIZE, 'fields': FEED_FIELDS}
+        params.update({k: v for k, v in request.items() if v and k != 'key'})
+        payload, error = self.fetch(params)
+        if error:
+            return FetchSnapshot([], error=error, fetch_ms=(time.perf_counter() - started) * 1000,
+                                 delta=True, page=request['key'])
+
+        now = datetime.now()
+        with self.metrics.timed("normalize"):
+            visitors = [VisitorRecord(v, now) for v in payload['data']]
+        fetch_ms = (time.perf_counter() - started) * 1000
+        return FetchSnapshot(visitors, fetch_ms=fetch_ms,
+                             delta=True, more=payload.get('more', False), page=request['key'],
+                             fetch_bytes=self.last_response_bytes)
+
+    def get_digests(self, size, first, end=None):
+        """digests.php: {bucket: (count, digest)} for buckets of ``size`` ids (0: one root) in [first, end)."""
+        params = {'size': size, 'from_id': first}
+        if end is not None:
+            params['to_id'] = end
+        response = self.session.get(digests_url(self.api_url), params=params, timeout=self.timeout)
+        size = int(response.headers.get("Content-Length") or len(response.content))
+        self.last_response_bytes += size
+        self.metrics.count("digest_requests")
+        self.metrics.count("digest_bytes", size)
+        response.raise_for_status()
+        payload = json_loads(response.content)
+        if not payload.get('ok'):
+            raise FeedError(payload.get('msg', 'digests.php failed'))
+        return {bucket: (count, digest) for bucket, count, digest in payload['buckets']}
+
+    def verify(self, digests, from_id=0):
+        """Compare ``digests`` (a RangeDigests) with the server's from ``from_id`` up.
+
+        Returns None when they agree, else a repair snapshot with the rows
+        of (up to VERIFY_MAX_LEAVES) differing leaves and tombstones for the
+        ids held there that the server no longer has.  Rows between
+        ``from_id`` and the next leaf boundary are not checked.
+        """
+        started = time.perf_counter()
+        first = leaf_start(from_id)
+        self.last_response_bytes = 0
+        try:
+            with self.metrics.timed("verify"):
+                if self.get_digests(0, first).get(0, (0, 0)) == digests.root_from(first):
+                    self.metrics.count("verify_clean")
+                    return None
+                leaves = []
+                # Newest ids first: those are the rows on screen
+                for branch in reversed(differing(digests.branches_from(first), self.get_digests(BRANCH_IDS, first))):
+                    start, end = max(first, branch * BRANCH_IDS), (branch + 1) * BRANCH_IDS
+                    leaves += differing(digests.leaf_range(start, end), self.get_digests(LEAF_IDS, start, end))
+                    if len(leaves) >= VERIFY_MAX_LEAVES:
+                        break
+        except (requests.exceptions.RequestException, ValueError, KeyError, FeedError) as e:
+            return FetchSnapshot([], error=f"Verify failed: {e}", fetch_ms=(time.perf_counter() - started) * 1000,
+                                 delta=True, repair=True)
+        leaves = leaves[:VERIFY_MAX_LEAVES]
+        digest_bytes = self.last_response_bytes
+        self.metrics.count("verify_leaves_differing", len(leaves))
+
+        visitors = []
+        fetch_bytes = digest_bytes
+        for i in range(0, len(leaves), LEAVES_PER_FETCH):
+            ids = [vid for leaf in leaves[i:i + LEAVES_PER_FETCH] for vid in range(leaf * LEAF_IDS, (leaf + 1) * LEAF_IDS)]
+            payload, error = self.fetch({'ids': ",".join(map(str, ids)), 'fields': FEED_FIELDS})
+            fetch_bytes += self.last_response_bytes
+            if error:
+                return FetchSnapshot([], error=error, fetch_ms=(time.perf_counter() - started) * 1000,
+                                     delta=True, repair=True)
+            visitors += payload['data']
+        present = {str(v.get('visitor_id')) for v in visitors}
+        tombstones = [vid for vid in digests.ids_in(leaves) if str(vid) not in present]
+
+        now = datetime.now()
+        with self.metrics.timed("normalize"):
+            visitors = [VisitorRecord(v, now) for v in visitors]
+        logger.info("Verify: %d leaves differed, %d rows re-read, %d gone", len(leaves), len(visitors),
+                    len(tombstones))
+        return FetchSnapshot(visitors, fetch_ms=(time.perf_counter() - started) * 1000, delta=True,
+                             tombstones=tombstones, fetch_bytes=fetch_bytes, repair=True)
+
+
+class VisitorEngine:
+    """Local replica of the visitors table: rows, status counts and search index.
+
+    With a ``store`` (a visitor_replica.LocalReplica) every applied change is
+    also written to disk, and ``restore`` starts from what was stored.
+    ``metrics`` (shared with the feed) times each step of ``apply``.
+    With a ``source`` name every record applied is tagged with it, so rows
+    of several engines (visitor_sites) can be told apart once merged.
+    """
+
+    def __init__(self, api_url=API_URL, log=print, store=None, metrics=None, source=None, timeout=FEED_TIMEOUT):
+        self.metrics = metrics or Metrics()
+        self.feed = VisitorFeed(api_url, log, self.metrics, timeout)
+        self.source = source
+        self.rows = VisitorRowModel()
+        self.counts = StatusCounts()
+        self.search = SearchIndex()
+        self.digests = RangeDigests()
+        self.store = store
+
+    def restore(self, limit=None):
+        """Load the stored rows (the newest ``limit``) and resume delta sync from their cursor.
+
+        Returns the RowDiff; the rest can follow as ``store.load`` pages
+        applied as delta snapshots, before the first poll.
+        """
+        now = datetime.now()
+        records = self.store.load(limit, now=now)
+        self.tag(records)
+        diff = self.rows.sync(records)
+        self.counts.reset(self.rows.by_id.values(), now)
+        self.search.apply(diff, self.rows.by_id)
+        self.digests.apply(diff, self.rows.by_id)
+        if self.rows.by_id:
+            self.feed.sync_cursor = self.store.meta.get("cursor")
+        return diff
+
+    def apply(self, snapshot):
+        """Merge a snapshot into the replica and return the RowDiff."""
+        if snapshot.not_modified:
+            return RowDiff(set(), set(), set(), False)
+        metrics = self.metrics
+        self.tag(snapshot.visitors)
+        with metrics.timed("diff"):
+            if snapshot.delta:
+                diff = self.rows.merge(snapshot.visitors, snapshot.tombstones, replace=snapshot.repair)
+            else:
+                diff = self.rows.sync(snapshot.visitors)
+        if diff:
+            with metrics.timed("status"):
+                self.counts.apply(diff, self.rows.by_id, datetime.now())
+            with metrics.timed("index"):
+                self.search.apply(diff, self.rows.by_id)
+            with metrics.timed("digest"):
+                self.digests.apply(diff, self.rows.by_id)
+        if self.store is not None and not snapshot.restored and (diff or snapshot.cursor is not None):
+            self.store.save(diff, self.rows.by_id, snapshot.cursor)
+        return diff
+
+    def tag(self, records):
+        """Tag ``records`` with this engine's source (nothing to do without one)."""
+        if self.source is not None:
+            source = self.source
+            for record in records:
+                record.source = source
+
+    def refresh(self):
+        """Fetch and apply one snapshot (a delta once the server supports it)."""
+        snapshot = self.feed.snapshot()
+        if snapshot.error:
+            raise FeedError(snapshot.error)
+        return self.apply(snapshot)
+
+    def load_all(self):
+        """Fetch every visitor, following the history pages to the end."""
+        self.feed.sync_cursor = None
+        snapshot = self.feed.snapshot()
+        if snapshot.error:
+            raise FeedError(snapshot.error)
+        self.apply(snapshot)
+        page = snapshot
+        while page.more:
+            ids = [int(v.visitor_id) for v in page.visitors if v.visitor_id.isdigit()]
+            if not ids:
+                break
+            page = self.feed.page({'before_id': min(ids), 'limit': DELTA_PAGE_SIZE, 'key': None})
+            if page.error:
+                raise FeedError(page.error)
+            self.apply(page)
+
+    def verify(self, from_id=0):
+        """Check the rows held against the server's digests and apply any repair; returns the RowDiff."""
+        snapshot = self.feed.verify(self.digests, from_id)
+        if snapshot is None:
+            return RowDiff(set(), set(), set(), False)
+        if snapshot.error:
+            raise FeedError(snapshot.error)
+        return self.apply(snapshot)
+
+    def stats(self, now=None):
+        """Visitor count per status, plus ``Total``."""
+        now = now or datetime.now()
+        self.counts.refresh(self.rows.by_id, now)
+        return dict(self.counts.counts, Total=self.counts.total())
+
+
+def events_url(api_url):
+    """events.php next to the given get_visitors.php."""
+    return api_url.rsplit('/', 1)[0] + "/events.php"
+
+
+def iter_sse(chunks, on_retry=None):
+    """Parse a text/event-stream body into (event, id, data) tuples.
+
+    A ``retry:`` field (the reconnection delay, in milliseconds) is passed
+    to ``on_retry``.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    event, event_id, data = "message", None, []
+    for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            line = line.rstrip("\r")
+            if not line:
+                if data:
+                    yield event, event_id, "\n".join(data)
+                event, data = "message", []
+            elif not line.startswith(":"):  # ":" lines are keep-alive comments
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "event":
+                    event = value
+                elif field == "data":
+                    data.append(value)
+                elif field == "id":
+                    event_id = value
+                elif field == "retry" and value.isdigit() and on_retry is not None:
+                    on_retry(int(value))
+
+
+class VisitorStream:
+    """Push subscription to events.php on its own thread, reconnecting forever.
+
+    Pushed changes reach ``on_snapshot`` as delta FetchSnapshots.
+    ``on_resync`` is called whenever pushes may have been missed: when the
+    stream comes up, when the server asks for it, and when the stream drops
+    (so the caller can fall back to polling); the delta feed fills the gap.
+    events.php ends every stream after a while; that is not a drop: the
+    next one starts after the server's ``retry:`` delay and resumes from
+    Last-Event-ID.  A failed connection, or a stream that ends before the
+    server said anything (a proxy's or PHP's empty answer), is retried
+    with backoff.
+    """
+
+    def __init__(self, url, on_snapshot, on_resync, log=print):
+        self.url = url
+        self.on_snapshot = on_snapshot
+        self.on_resync = on_resync
+        self.log = log
+        self.connected = False
+        self.heard = False  # the current stream has sent something (its retry:, an event)
+        self.retry = STREAM_RETRY
+        self.last_event_id = None
+        self.session = requests.Session()
+        self.session.verify = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        retry = 1
+        while True:
+            error = None
+            self.heard = False
+            try:
+                self.listen()  # returns when the server ends the stream (STREAM_SECONDS)
+            except Exception as e:
+                error = e
+            if error is None and self.heard:
+                retry = 1
+                time.sleep(self.retry)
+                continue
+            if self.connected:
+                self.connected = False
+                self.on_resync()
+            self.log(f"Event stream error: {error or 'the stream ended before any event'}")
+            time.sleep(max(retry, self.retry))
+            retry = min(retry * 2, STREAM_RETRY_MAX)
+
+    def alive(self):
+        """The server has said something on this stream; the first time since a drop, resync."""
+        self.heard = True
+        if not self.connected:
+            self.connected = True
+            self.on_resync()
+
+    def set_retry(self, milliseconds):
+        self.retry = milliseconds / 1000
+        self.alive()
+
+    def listen(self):
+        headers = {"Accept": "text/event-stream"}
+        if self.last_event_id:
+            headers["Last-Event-ID"] = self.last_event_id
+        with self.session.get(self.url, params={'fields': FEED_FIELDS}, headers=headers, stream=True,
+                              timeout=(10, STREAM_READ_TIMEOUT)) as response:
+            response.raise_for_status()
+            for event, event_id, data in iter_sse(response.iter_content(chunk_size=None), on_retry=self.set_retry):
+                self.alive()
+                if event_id:
+                    self.last_event_id = event_id
+                if event == "resync":
+                    self.on_resync()
+                elif event == "visitors":
+                    started = time.perf_counter()
+                    payload = json_loads(data)
+                    now = datetime.now()
+                    self.on_snapshot(FetchSnapshot(
+                        [VisitorRecord(v, now) for v in payload.get('data', [])],
+                        fetch_ms=(time.perf_counter() - started) * 1000, delta=True,
+                        tombstones=payload.get('tombstones', []), fetch_bytes=len(data)))
@@ -0,0 +1,182 @@
+"""Streaming visitor export.
+
+An ExportJob writes batches of VisitorRecords to a sink on its own thread,
+so the dashboard stays responsive and can show progress or cancel.  The
+batches come either from the rows already loaded (``snapshot_batches``) or
+straight from get_visitors.php one keyset page at a time
+(``server_batches``), so an export of any size holds one page in memory.
+
+The sink is picked from the file name: ``.csv``, ``.csv.gz``, and, when
+pyarrow is installed, ``.parquet`` and ``.arrow`` (Arrow IPC file).
+"""
+
+import csv
+import gzip
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+from visitor_record import VisitorRecord
+
+EXPORT_HEADER = ["ID", "Name", "Email", "Phone", "Purpose", "Host", "QR Code", "Status", "Expires At",
+                 "Last Scan", "Duration", "Created At"]
+
+EXPORT_FILETYPES = [("CSV files", "*.csv"), ("Gzip-compressed CSV", "*.csv.gz"),
+                    ("Parquet", "*.parquet"), ("Arrow IPC", "*.arrow"), ("All files", "*.*")]
+
+
+class ExportError(Exception):
+    pass
+
+
+def export_row(record, now):
+    """One export line; status and duration come from the record's cached status."""
+    return [
+        record.visitor_id,
+        record.get('full_name', ''),
+        record.get('email', ''),
+        record.get('phone', ''),
+        record.get('purpose', ''),
+        record.get('host', ''),
+        record.get('qr_code', ''),
+        record.status_at(now),
+        record.get('expiry_at', ''),
+        record.get('last_scan', ''),
+        record.duration_text(now),
+        record.get('created_at', ''),
+    ]
+
+
+class CSVSink:
+    def __init__(self, path, compress=False):
+        if compress:
+            self.file = gzip.open(path, 'wt', newline='', encoding='utf-8')
+        else:
+            self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_HEADER)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ArrowSink:
+    """Parquet or Arrow IPC; every batch becomes one row group / record batch.
+
+    pyarrow is optional and slow to import, so it is only imported here.
+    """
+
+    def __init__(self, path, parquet=True):
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        fields = [pa.field(name, pa.string()) for name in EXPORT_HEADER]
+        fields[0] = pa.field("ID", pa.int64())
+        self.schema = pa.schema(fields)
+        if parquet:
+            self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+        else:
+            self.writer = pa.ipc.new_file(path, self.schema)
+
+    def write(self, rows):
+        if not rows:
+            return
+        columns = [list(column) for column in zip(*rows)]
+        columns[0] = [int(vid) if str(vid).isdigit() else None for vid in columns[0]]
+        columns[1:] = [[None if v is None else str(v) for v in column] for column in columns[1:]]
+        self.writer.write_batch(self.pa.record_batch(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def open_sink(path, name=None):
+    """A sink writing to ``path`` in the format ``name`` (default: ``path``) implies."""
+    name = (name or path).lower()
+    if name.endswith('.parquet') or name.endswith('.arrow'):
+        try:
+            return ArrowSink(path, parquet=name.endswith('.parquet'))
+        except ImportError:
+            raise ExportError("Parquet and Arrow export need pyarrow (pip install pyarrow)")
+    return CSVSink(path, compress=name.endswith('.gz'))
+
+
+def snapshot_batches(records, size=1000):
+    for start in range(0, len(records), size):
+        yield records[start:start + size]
+
+
+def server_batches(fetch, params, page_size=1000):
+    """Page through get_visitors.php newest first with the before_id cursor.
+
+    ``fetch(params)`` returns ``(payload, error)`` like VisitorFeed.fetch.
+    """
+    params = dict(params, limit=page_size)
+    while True:
+        payload, error = fetch(params)
+        if error:
+            raise ExportError(error)
+        now = datetime.now()
+        records = [VisitorRecord(v, now) for v in payload['data']]
+        if records:
+            yield records
+        ids = [int(r.visitor_id) for r in records if r.visitor_id.isdigit()]
+        if not payload.get('more') or not ids:
+            return
+        params['before_id'] = min(ids)
+
+
+class ExportJob:
+    """Writes ``batches`` to ``path`` on a worker thread.
+
+    The file is written under a temporary name and only renamed into place
+    once complete, so a cancelled or failed export leaves nothing behind.
+    ``rows_written``, ``done`` and ``error`` are read by the UI thread.
+    """
+
+    def __init__(self, path, batches, total=None):
+        self.path = path
+        self.batches = batches
+        self.total = total  # None when the size is not known up front (server export)
+        self.rows_written = 0
+        self.done = False
+        self.error = None
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".part")
+            os.close(fd)
+            now = datetime.now()
+            sink = open_sink(tmp_path, self.path)
+            try:
+                for records in self.batches:
+                    if self.cancelled.is_set():
+                        break
+                    sink.write([export_row(r, now) for r in records])
+                    self.rows_written += len(records)
+            finally:
+                sink.close()
+            if not self.cancelled.is_set():
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self.done = True
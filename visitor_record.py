@@ -0,0 +1,254 @@
+"""Normalized visitor rows.
+
+The API sends every visitor as a dict of strings.  VisitorRecord parses
+the timestamps once per fetch and caches the derived status together with
+the instant it can next change on its own (the expiry), so checking a
+status between fetches is a comparison instead of a strptime.
+"""
+
+import heapq
+import re
+import zlib
+from datetime import datetime, timedelta
+
+EXIT_STATUSES = ('exited', 'exit', 'left', 'out', 'exited_by')
+STATUSES = ("Valid", "Expired", "Inside", "Exited", "Invalid")
+WORD_RE = re.compile(r"\w+")
+# Fields the row digest covers: everything the dashboard shows, not updated_at
+DIGEST_FIELDS = ("visitor_id", "full_name", "email", "phone", "purpose", "host", "qr_code", "expiry_at",
+                 "last_status", "last_scan", "entry_scan", "exit_time", "created_at")
+
+
+def parse_timestamp(value):
+    """'YYYY-MM-DD HH:MM:SS[.fff]' -> datetime, or None for empty or malformed values."""
+    if not value or value == "None":
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_timestamp(value):
+    """Display form used in the table: MM/DD/YYYY HH:MM (unparseable values pass through)."""
+    if not value or value == "None":
+        return ""
+    dt = parse_timestamp(value)
+    return dt.strftime("%m/%d/%Y %H:%M") if dt else value
+
+
+def format_elapsed(delta):
+    if delta.total_seconds() < 0:
+        return "-"
+    days = delta.days
+    hours = delta.seconds // 3600
+    mins = (delta.seconds % 3600) // 60
+    if days > 0:
+        return f"{days}d {hours}h {mins}m"
+    if hours > 0:
+        return f"{hours}h {mins}m"
+    if mins > 0:
+        return f"{mins}m"
+    return "just now"
+
+
+def row_digest(fields):
+    """CRC32 of the DIGEST_FIELDS, the way migrations/005 computes it in MySQL:
+    CRC32(CONCAT_WS(CHAR(31), visitor_id, IFNULL(full_name, ''), ...))."""
+    text = "\x1f".join("" if fields.get(name) is None else str(fields[name]) for name in DIGEST_FIELDS)
+    return zlib.crc32(text.encode("utf-8"))
+
+
+def derive_status(last_status, expiry, scanned, now):
+    """Determine visitor status based on last_status and expiry.
+
+    Returns (status, until): ``until`` is the instant after which the status
+    would change without any new scan (the expiry), or None if it cannot.
+    """
+    is_expired = expiry is not None and expiry < now
+    until = expiry if expiry is not None and not is_expired else None
+
+    # PRIORITY 1: Check last_status first (most reliable)
+    if last_status == "invalid":
+        return "Invalid", None
+
+    if last_status in EXIT_STATUSES:
+        return "Exited", None
+
+    if last_status == "inside":
+        # Only show Inside if not expired and has a scan time
+        if is_expired:
+            return "Expired", None
+        if scanned:
+            return "Inside", until
+
+    if last_status == "expired":
+        return "Expired", None
+
+    # PRIORITY 2: Check expiry date
+    if is_expired:
+        return "Expired", None
+
+    # PRIORITY 3: Check if they have scanned in (but status is not explicitly set)
+    if scanned:
+        return "Inside", until
+
+    # Default: Valid (not scanned yet, not expired)
+    return "Valid", until
+
+
+class VisitorRecord:
+    """One visitor, parsed once per fetch.
+
+    ``fields`` is the row as the API sent it (``get`` reads from it, so code
+    that used the raw dicts keeps working).  ``status_at(now)`` only
+    re-derives the status once ``status_until`` has passed.
+    """
+
+    __slots__ = ("fields", "visitor_id", "last_status", "scanned", "expiry", "entry", "exit_time",
+                 "status", "status_until", "fingerprint", "digest", "haystack", "words", "source", "_display")
+
+    def __init__(self, fields, now=None):
+        fields['visitor_id'] = str(fields.get('visitor_id', ''))
+        self.fields = fields
+        self.visitor_id = fields['visitor_id']
+        self.fingerprint = hash(tuple(fields.items()))
+        self.digest = row_digest(fields)  # comparable with the server's (visitor_digest.py)
+        # What the search box matches against (see visitor_search.py)
+        self.haystack = f"{fields.get('full_name', '')} {fields.get('email', '')} {fields.get('purpose', '')} {fields.get('host', '')}".lower()
+        self.words = tuple(set(WORD_RE.findall(self.haystack)))
+        self.source = None  # the site it came from, set by VisitorEngine (see visitor_sites.py)
+
+        last_scan = fields.get('last_scan')
+        self.last_status = str(fields.get('last_status') or "").strip().lower()
+        self.scanned = bool(last_scan) and last_scan != "None"
+        self.expiry = parse_timestamp(fields.get('expiry_at'))
+        # Duration = time inside, from the first scan-in (entry_scan) if known
+        self.entry = parse_timestamp(fields.get('entry_scan') or last_scan)
+        self.exit_time = parse_timestamp(fields.get('exit_time'))
+
+        self.status, self.status_until = derive_status(
+            self.last_status, self.expiry, self.scanned, now or datetime.now())
+        self._display = None
+
+    def get(self, key, default=None):
+        return self.fields.get(key, default)
+
+    def status_at(self, now):
+        if self.status_until is not None and now > self.status_until:
+            self.status, self.status_until = derive_status(self.last_status, self.expiry, self.scanned, now)
+        return self.status
+
+    def duration_text(self, now):
+        """Duration = time spent INSIDE only.
+        - Valid/Expired/Invalid -> "-"  (never entered)
+        - Inside  -> entry_scan to now  (live ticking)
+        - Exited  -> entry_scan to exit_time (fixed)
+        """
+        status = self.status_at(now)
+        if self.entry is None:
+            return "-"
+        if status == "Inside":
+            return format_elapsed(now - self.entry)
+        if status == "Exited" and self.exit_time is not None:
+            return format_elapsed(self.exit_time - self.entry)
+        return "-"
+
+    def next_duration_tick(self, now):
+        """When ``duration_text`` next shows a different minute (None unless Inside)."""
+        if self.entry is None or self.status_at(now) != "Inside":
+            return None
+        elapsed = now - self.entry
+        if elapsed < timedelta(0):
+            return self.entry
+        return self.entry + timedelta(minutes=elapsed // timedelta(minutes=1) + 1)
+
+    def display_times(self):
+        """(expires, last scan, created) as shown in the table; formatted on first use."""
+        if self._display is None:
+            fields = self.fields
+            self._display = (
+                format_timestamp(fields.get('expiry_at', '')),
+                format_timestamp(fields.get('last_scan', '')) or "Never",
+                format_timestamp(fields.get('created_at', '')),
+            )
+        return self._display
+
+
+class StatusCounts:
+    """Visitor counts per status, kept up to date from row diffs.
+
+    ``reset`` counts every record in one pass; ``apply`` only looks at the
+    ids a diff names, so a small change costs the same at any table size.
+    Statuses that change on their own (a pass expiring) sit in a heap keyed
+    by the instant they change; ``refresh`` pops the ones that are due and
+    re-derives only those.
+    """
+
+    def __init__(self):
+        self.counts = dict.fromkeys(STATUSES, 0)
+        self.status_of = {}  # visitor_id -> status it is counted under
+        self.due = []  # heap of (status_until, visitor_id); stale entries are skipped when popped
+
+    @property
+    def next_change(self):
+        """The earliest instant a counted status may change on its own, or None."""
+        return self.due[0][0] if self.due else None
+
+    def total(self):
+        return len(self.status_of)
+
+    def reset(self, records, now):
+        counts = dict.fromkeys(STATUSES, 0)
+        status_of = {}
+        due = []
+        for record in records:
+            status = record.status_at(now)
+            counts[status] += 1
+            status_of[record.visitor_id] = status
+            if record.status_until is not None:
+                due.append((record.status_until, record.visitor_id))
+        heapq.heapify(due)
+        self.counts, self.status_of, self.due = counts, status_of, due
+
+    def apply(self, diff, by_id, now):
+        """Update the counts for the ids in ``diff`` (``by_id`` is the model after it)."""
+        counts, status_of = self.counts, self.status_of
+        for vid in diff.removed:
+            status = status_of.pop(vid, None)
+            if status is not None:
+                counts[status] -= 1
+        for vid in diff.inserted | diff.changed:
+            record = by_id[vid]
+            old = status_of.get(vid)
+            if old is not None:
+                counts[old] -= 1
+            status = record.status_at(now)
+            counts[status] += 1
+            status_of[vid] = status
+            if record.status_until is not None:
+                heapq.heappush(self.due, (record.status_until, vid))
+        if len(self.due) > 2 * len(status_of) + 1024:
+            # Rows that keep changing leave stale entries behind; drop them
+            self.due = [(until, vid) for until, vid in self.due
+                        if vid in by_id and by_id[vid].status_until == until]
+            heapq.heapify(self.due)
+
+    def refresh(self, by_id, now):
+        """Re-derive the statuses whose instant has passed; returns the visitor_ids that changed."""
+        changed = set()
+        counts, status_of, due = self.counts, self.status_of, self.due
+        while due and due[0][0] < now:
+            until, vid = heapq.heappop(due)
+            record = by_id.get(vid)
+            if record is None or record.status_until != until:
+                continue  # removed, or replaced by a record with its own entry
+            status = record.status_at(now)
+            if status != status_of[vid]:
+                counts[status_of[vid]] -= 1
+                counts[status] += 1
+                status_of[vid] = status
+                changed.add(vid)
+            if record.status_until is not None:
+                heapq.heappush(due, (record.status_until, vid))
+        return changed
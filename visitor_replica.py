@@ -0,0 +1,156 @@
+"""On-disk copy of the visitor replica (SQLite).
+
+The engine's rows live in memory and used to start out empty, so every
+launch showed a blank table until the first fetch came back, and a
+launch without network showed nothing at all.  LocalReplica keeps the
+same rows in a SQLite file next to the QR thumbnail cache, together with
+the delta-sync cursor they are current to.  On startup the dashboard
+renders straight from it and the first poll is a delta from that cursor,
+so the server only sends what changed while the dashboard was closed.
+
+Writes are queued to one writer thread, which owns its own connection;
+the Tk thread only builds the row tuples.  The file belongs to one
+get_visitors.php URL and is emptied if opened for another.
+"""
+
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+
+from visitor_engine import FEED_FIELDS
+from visitor_record import VisitorRecord
+
+COLUMNS = FEED_FIELDS.split(",")  # visitor_id first
+SCHEMA_VERSION = 1
+
+log = logging.getLogger(__name__)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS visitors (
+    visitor_id INTEGER PRIMARY KEY,
+    {", ".join(f"{column} TEXT" for column in COLUMNS[1:])},
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_visitors_status ON visitors (status);
+CREATE INDEX IF NOT EXISTS idx_visitors_expiry_at ON visitors (expiry_at);
+CREATE INDEX IF NOT EXISTS idx_visitors_qr_code ON visitors (qr_code);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class LocalReplica:
+    """SQLite mirror of VisitorEngine's rows plus a small key/value ``meta``.
+
+    ``load`` reads rows back as VisitorRecords, newest first and paged by
+    ``before_id`` like get_visitors.php; ``save`` queues the rows a RowDiff
+    names.  ``meta`` holds the sync cursor and whatever the
+    caller stores with ``set_meta`` (JSON values).
+    """
+
+    def __init__(self, path, api_url):
+        self.path = path
+        self.api_url = api_url
+        self.meta = {}
+        self.writes = queue.Queue()
+        self.thread = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        db = self.connect()
+        try:
+            with db:
+                db.executescript(SCHEMA)
+                self.meta = {key: json.loads(value) for key, value in db.execute("SELECT key, value FROM meta")}
+                if self.meta.get("api_url") != api_url or self.meta.get("schema") != SCHEMA_VERSION:
+                    db.execute("DELETE FROM visitors")
+                    db.execute("DELETE FROM meta")
+                    self.meta = {"api_url": api_url, "schema": SCHEMA_VERSION}
+                    db.executemany("INSERT INTO meta VALUES (?, ?)",
+                                   [(key, json.dumps(value)) for key, value in self.meta.items()])
+        finally:
+            db.close()
+
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")  # a lost last write is refetched by the next delta
+        return db
+
+    def load(self, limit=None, before_id=None, now=None):
+        """Stored visitors as VisitorRecords, newest first (all of them without ``limit``)."""
+        now = now or datetime.now()
+        sql = f"SELECT {', '.join(COLUMNS)} FROM visitors"
+        args = []
+        if before_id is not None:
+            sql += " WHERE visitor_id < ?"
+            args.append(before_id)
+        sql += " ORDER BY visitor_id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(limit)
+        db = self.connect()
+        try:
+            rows = db.execute(sql, args).fetchall()
+        finally:
+            db.close()
+        return [VisitorRecord(dict(zip(COLUMNS, row)), now) for row in rows]
+
+    def save(self, diff, by_id, cursor=None, now=None):
+        """Queue the rows ``diff`` names (``by_id`` is the row model after it) and the new cursor.
+
+        A cursor means a successful poll, so ``synced_at`` is stamped with it.
+        """
+        now = now or datetime.now()
+        upserts = []
+        for vid in diff.inserted | diff.changed:
+            record = by_id[vid]
+            upserts.append(tuple(record.get(column) for column in COLUMNS) + (record.status_at(now),))
+        deletes = [(vid,) for vid in diff.removed]
+        meta = {}
+        if cursor is not None:
+            meta = {"cursor": cursor, "synced_at": now.strftime("%Y-%m-%d %H:%M:%S")}
+            self.meta.update(meta)
+        if upserts or deletes or meta:
+            self.queue_write(upserts, deletes, meta)
+
+    def set_meta(self, **values):
+        self.meta.update(values)
+        self.queue_write([], [], values)
+
+    def queue_write(self, upserts, deletes, meta):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        self.writes.put((upserts, deletes, meta))
+
+    def run(self):
+        """Writer thread: apply queued writes, batching whatever has piled up into one transaction."""
+        db = self.connect()
+        insert = (f"INSERT OR REPLACE INTO visitors ({', '.join(COLUMNS)}, status) "
+                  f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))})")
+        while True:
+            batch = [self.writes.get()]
+            while True:
+                try:
+                    batch.append(self.writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with db:
+                    for upserts, deletes, meta in batch:
+                        db.executemany("DELETE FROM visitors WHERE visitor_id = ?", deletes)
+                        db.executemany(insert, upserts)
+                        db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                       [(key, json.dumps(value)) for key, value in meta.items()])
+            except sqlite3.Error as e:
+                log.warning("Local replica write failed: %s", e)
+            finally:
+                for _ in batch:
+                    self.writes.task_done()
+
+    def flush(self):
+        """Block until every queued write is on disk."""
+        self.writes.join()
@@ -0,0 +1,107 @@
+"""Substring search over the visitor list without a full scan per keystroke.
+
+Each VisitorRecord carries a lowercase ``haystack`` (name, email, purpose,
+host) and the distinct ``words`` in it.  The index maps every word to the
+visitors that contain it, and every trigram to the words that contain it;
+both are patched from row diffs, never rebuilt.
+
+A query is first narrowed to candidates: every run of word characters in
+the query must lie inside a single word of a matching haystack, so the
+candidates are the visitors that have, for each such run, some word
+containing it.  The candidates are then checked with a plain ``in`` on
+the haystack, so results are exactly those of a linear substring scan.
+Queries too short to index narrow the previous result when they extend
+the previous query, and scan the haystacks otherwise.
+Indexing words rather than visitors keeps the trigram table small: names,
+hosts and purposes repeat across many visitors.
+"""
+
+from visitor_record import WORD_RE
+
+
+def trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class SearchIndex:
+    """Word and trigram index over VisitorRecord words, keyed by visitor_id."""
+
+    def __init__(self):
+        self.words_of = {}    # visitor_id -> words indexed for it
+        self.word_ids = {}    # word -> visitor_ids containing it
+        self.gram_words = {}  # trigram -> words containing it
+        self.version = 0
+        self.last = None      # (query, version, matching records) of the previous search
+
+    def apply(self, diff, by_id):
+        """Patch the index with a RowDiff (``by_id`` is the row model after it)."""
+        for vid in diff.removed:
+            self._remove(vid)
+        for vid in diff.inserted | diff.changed:
+            self._remove(vid)
+            record = by_id[vid]
+            self.words_of[vid] = record.words
+            for word in record.words:
+                ids = self.word_ids.get(word)
+                if ids is None:
+                    ids = self.word_ids[word] = set()
+                    for gram in trigrams(word):
+                        self.gram_words.setdefault(gram, set()).add(word)
+                ids.add(vid)
+        if diff:
+            self.version += 1
+
+    def _remove(self, vid):
+        for word in self.words_of.pop(vid, ()):
+            ids = self.word_ids[word]
+            ids.discard(vid)
+            if not ids:
+                del self.word_ids[word]
+                for gram in trigrams(word):
+                    words = self.gram_words[gram]
+                    words.discard(word)
+                    if not words:
+                        del self.gram_words[gram]
+
+    def ids_with_term(self, term):
+        """Visitors having a word that contains ``term`` (at least 3 characters)."""
+        postings = []
+        for gram in trigrams(term):
+            words = self.gram_words.get(gram)
+            if not words:
+                return set()
+            postings.append(words)
+        postings.sort(key=len)
+        ids = set()
+        for word in postings[0].intersection(*postings[1:]):
+            if term in word:
+                ids |= self.word_ids[word]
+        return ids
+
+    def search(self, query, records):
+        """The VisitorRecords in ``records`` whose haystack contains ``query`` (lowercase).
+
+        ``records`` must be the rows this index was last patched with; the
+        result keeps their order.
+        """
+        last = self.last
+        if last is not None and last[1] == self.version and last[0] in query:
+            # Typing further only ever narrows the previous result
+            result = [v for v in last[2] if query in v.haystack]
+        else:
+            candidates = None
+            for term in WORD_RE.findall(query):
+                if len(term) < 3:
+                    continue
+                ids = self.ids_with_term(term)
+                candidates = ids if candidates is None else candidates & ids
+                if not candidates:
+                    break
+            if candidates is None:
+                result = [v for v in records if query in v.haystack]
+            elif candidates:
+                result = [v for v in records if v.visitor_id in candidates and query in v.haystack]
+            else:
+                result = []
+        self.last = (query, self.version, result)
+        return result
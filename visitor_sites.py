@@ -0,0 +1,161 @@
+"""Several visitor endpoints (buildings, gates) watched from one dashboard.
+
+QRGATE_SOURCES lists them, comma-separated, as ``name=url`` with an
+optional ``;timeout=SECONDS``:
+
+    QRGATE_SOURCES="North=https://north.example/get_visitors.php;timeout=5,South=https://south.example/get_visitors.php"
+
+A ``Site`` is one of them with everything that used to be global: a
+VisitorEngine (rows, status counts, search index, digests, replica file),
+a PollScheduler (so failures and backoff are per site), the paging
+position and a push stream.  ``SitePool`` runs each site's requests as
+one job on a thread pool, never two jobs for the same site, so a round
+of polls takes as long as the slowest site instead of the sum of all of
+them, and a site that hangs until its timeout only holds up itself.
+``merge_rows`` interleaves the sites' rows into one newest-first list.
+Like visitor_engine, this module does not import tkinter.
+"""
+
+import os
+import queue
+import re
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from urllib.parse import urlparse
+
+from poll_scheduler import BASE_INTERVAL, PollScheduler
+from visitor_engine import API_URL, FEED_TIMEOUT, VisitorEngine
+
+DEFAULT_SOURCE = "Main"  # name of the one site when QRGATE_SOURCES is not set
+SITE_MAX_WORKERS = 8  # sites fetched at once; any more wait for a free thread
+SITE_DOWN_AFTER = 3  # consecutive failed polls before a site counts as down
+
+
+class Source:
+    """Where one site's get_visitors.php is, and how long to wait for it."""
+
+    def __init__(self, name, api_url, timeout=FEED_TIMEOUT):
+        self.name = name
+        self.api_url = api_url
+        self.timeout = timeout
+
+    def __repr__(self):
+        return f"Source({self.name!r}, {self.api_url!r}, timeout={self.timeout})"
+
+
+def parse_sources(text):
+    """Sources from a QRGATE_SOURCES value (empty for None or "").
+
+    Without ``name=`` a source is named after its URL's host.  Raises
+    ValueError for an unknown option or a name used twice.
+    """
+    sources = []
+    for entry in filter(None, (part.strip() for part in (text or "").split(","))):
+        spec, *options = entry.split(";")
+        name, sep, url = spec.partition("=")
+        if not sep or "://" in name:
+            name, url = urlparse(spec).hostname or spec, spec
+        source = Source(name.strip(), url.strip())
+        for option in options:
+            key, _, value = option.partition("=")
+            if key.strip() != "timeout":
+                raise ValueError(f"Unknown option {option.strip()!r} for source {source.name!r}")
+            source.timeout = float(value)
+        if not source.api_url:
+            raise ValueError(f"Source {source.name!r} has no URL")
+        if any(other.name == source.name for other in sources):
+            raise ValueError(f"Source name {source.name!r} is used twice")
+        sources.append(source)
+    return sources
+
+
+def default_sources():
+    """QRGATE_SOURCES if set, otherwise the one site at API_URL."""
+    return parse_sources(os.environ.get("QRGATE_SOURCES")) or [Source(DEFAULT_SOURCE, API_URL)]
+
+
+def created_key(record):
+    return record.fields.get('created_at') or ""
+
+
+def merge_rows(row_lists):
+    """Several sites' rows (each newest first) as one list, newest created_at first.
+
+    A single list is returned as it is.  Otherwise this is one sort over
+    already-sorted runs, which Timsort merges in about linear time.
+    """
+    if len(row_lists) == 1:
+        return row_lists[0]
+    return sorted(chain.from_iterable(row_lists), key=created_key, reverse=True)
+
+
+class Site:
+    """One source's replica, poll schedule and paging state.
+
+    The Tk thread applies snapshots to ``engine`` and reads the rest;
+    ``engine.feed`` belongs to the SitePool job running for the site while
+    ``busy`` is set.
+    """
+
+    def __init__(self, source, store=None, metrics=None, log=print, interval=BASE_INTERVAL):
+        self.source = source
+        self.name = source.name
+        self.api_url = source.api_url
+        self.slug = re.sub(r"\W+", "_", source.name.lower()).strip("_") or "site"
+        self.engine = VisitorEngine(source.api_url, log=log, store=store, metrics=metrics,
+                                    source=source.name, timeout=source.timeout)
+        self.scheduler = PollScheduler(interval)
+        self.stream = None  # the site's VisitorStream, if it has one
+        self.rows = []  # engine.rows.rows(), renewed whenever a snapshot changes them
+        self.busy = False
+        self.refresh_requested = False
+        self.next_poll = 0.0  # monotonic time of the next scheduled poll
+        self.next_verify = 0.0
+        self.last_fetch_ms = None
+        self.error_count = 0  # failed snapshots in a row, polls and pages alike
+        # Server-side paging, per (status, q) filter: the lowest visitor_id
+        # the listing returned and whether older matches exist
+        self.page_requests = queue.Queue()
+        self.page_loading = False
+        self.page_floor = {}
+        self.more_pages = {}
+        self.restore_floor = None  # lowest visitor_id restored so far, while older ones remain
+
+    @property
+    def health(self):
+        """'ok', 'retrying' after a failed poll, or 'down' after SITE_DOWN_AFTER in a row."""
+        failures = self.scheduler.failures
+        if not failures:
+            return "ok"
+        return "down" if failures >= SITE_DOWN_AFTER else "retrying"
+
+
+class SitePool:
+    """Runs site jobs on a thread pool, at most one per site at a time."""
+
+    def __init__(self, sites, max_workers=SITE_MAX_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sites))),
+                                           thread_name_prefix="qrgate-site")
+
+    def submit(self, site, job, *args, done=None):
+        """Start ``job(site, *args)`` unless one is already running for ``site``.
+
+        Returns the Future, or None if the site was busy.  ``done(site)``
+        is called on the pool thread once the job has finished.
+        """
+        if site.busy:
+            return None
+        site.busy = True
+
+        def run():
+            try:
+                return job(site, *args)
+            finally:
+                site.busy = False
+                if done is not None:
+                    done(site)
+
+        return self.executor.submit(run)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)